@@ -1,24 +1,98 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pymongo.collection import Collection
+from motor.motor_asyncio import AsyncIOMotorCollection
 from models import User
+from database import get_db
+from cache import make_cache
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
 
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1000
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# bcrypt costs 100-300 ms of CPU per call and releases the GIL while hashing, so it
+# runs on its own thread pool instead of the event loop. At most
+# PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE calls are admitted at once; beyond
+# that requests are shed with 503 instead of queueing without bound.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+# Resolved principals keyed by token subject (username). Only PRINCIPAL_FIELDS
+# are cached: never the password hash, which would otherwise be copied into Redis
+PRINCIPAL_FIELDS = ("_id", "username", "email", "role", "wallet_address", "created_at")
+
+user_cache = make_cache(
+    "user",
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60"))
+)
+
+async def invalidate_user(username: str):
+    """Drop a cached principal; call after any change to the user's document"""
+    await user_cache.delete(username)
+
+async def update_user(users: AsyncIOMotorCollection, username: str, update: dict):
+    """Apply `update` to a user's document and drop its cached principal"""
+    result = await users.update_one({"username": username}, update)
+    await invalidate_user(username)
+    return result
+
+def _principal(user: dict) -> dict:
+    """The cacheable part of a user document"""
+    principal = {field: user[field] for field in PRINCIPAL_FIELDS if field in user}
+    principal["_id"] = str(principal["_id"])
+    return principal
+
+@functools.lru_cache(maxsize=None)
+def pwd_context():
+    """The bcrypt context, built on first use (on the hashing pool) rather than at import"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
+
+async def _run_hashing(fn, *args):
+    if _hash_slots.locked():
+        metrics.PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    async with _hash_slots:
+        metrics.PASSWORD_HASH_IN_FLIGHT.inc()
+        try:
+            with tracing.span("password_hash", operation=fn.__name__):
+                return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+        finally:
+            metrics.PASSWORD_HASH_IN_FLIGHT.dec()
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_hashing(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -30,23 +104,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Collection, username_or_email: str, password: str):
+async def authenticate_user(db: AsyncIOMotorCollection, username_or_email: str, password: str):
     from passlib.exc import UnknownHashError
     # Try to find user by username first, then by email
-    user = db.find_one({"$or": [{"username": username_or_email}, {"email": username_or_email}]})
-    print(f"Found user: {user}")
+    with tracing.span("auth.user_lookup"):
+        user = await db.find_one({"$or": [{"username": username_or_email}, {"email": username_or_email}]})
+    tracing.log_event(logger, "auth.user_lookup", found=user is not None, user_id=str(user["_id"]) if user else None)
     if not user:
         return False
 
     password_verified = False
     try:
-        password_verified = verify_password(password, user["password"])
+        password_verified = await verify_password_async(password, user["password"])
     except UnknownHashError:
         # This likely means the password is plain text.
         # Verify directly and update the hash if it matches.
         if password == user["password"]:
-            hashed_password = get_password_hash(password)
-            db.update_one({"_id": user["_id"]}, {"$set": {"password": hashed_password}})
+            hashed_password = await get_password_hash_async(password)
+            await update_user(db, user["username"], {"$set": {"password": hashed_password}})
             password_verified = True
 
     if not password_verified:
@@ -56,25 +131,42 @@ def authenticate_user(db: Collection, username_or_email: str, password: str):
     user["_id"] = str(user["_id"])
     return User(**user)
 
-def get_current_user(token: HTTPAuthorizationCredentials = Depends(security)):
-    from database import get_database
-    db = get_database()
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def _resolve_user(token: str, db) -> User:
+    credentials_exception = _credentials_exception()
     try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db["users"].find_one({"username": username})
-    if user is None:
-        raise credentials_exception
-    # Convert ObjectId to string for Pydantic
-    user["_id"] = str(user["_id"])
+    with tracing.span("auth.lookup") as span:
+        user = await user_cache.get(username)
+        span.set_attribute("cache_hit", user is not None)
+        if user is None:
+            user = await db["users"].find_one({"username": username})
+            if user is None:
+                raise credentials_exception
+            user = _principal(user)
+            await user_cache.set(username, user)
     return User(**user)
+
+async def get_current_user(token: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_db)):
+    return await _resolve_user(token.credentials, db)
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db=Depends(get_db)
+) -> Optional[User]:
+    """The user of the Authorization header, or None when the request has none"""
+    if credentials is None:
+        return None
+    return await _resolve_user(credentials.credentials, db)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the async (Motor) data layer.
+
+Fires concurrent GET /tenders/{id} requests at the FastAPI app in-process and
+reports requests per second for two variants of the same handler:
+
+  blocking  the previous behaviour: synchronous pymongo calls inside async def
+  async     the current routes, backed by the shared Motor client
+
+Usage (from backend/):
+    python benchmarks/bench_async_db.py                 # local mongod at MONGODB_URI
+    python benchmarks/bench_async_db.py --mongomock     # in-memory stand-in
+
+mongomock answers in-process without any network wait, so with --mongomock the
+two variants only differ by driver overhead; the event-loop stall the async
+layer removes shows up against a real mongod.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException
+
+import database
+
+def build_blocking_app(sync_db):
+    """Replica of the pre-Motor get_tender handler"""
+    app = FastAPI()
+
+    @app.get("/tenders/{tender_id}")
+    async def get_tender(tender_id: str):
+        tender = sync_db["tenders"].find_one({"_id": ObjectId(tender_id)})
+        if not tender:
+            raise HTTPException(status_code=404, detail="Tender not found")
+        tender["_id"] = str(tender["_id"])
+        return tender
+
+    return app
+
+async def run_load(app, tender_ids, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(tender_ids[i % len(tender_ids)])
+
+    async def worker(client):
+        while True:
+            try:
+                tender_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            response = await client.get(f"/tenders/{tender_id}")
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a real mongod")
+    parser.add_argument("--tenders", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        from mongomock_motor import AsyncMongoMockClient
+        sync_client = mongomock.MongoClient()
+        # Both stand-ins must see the same data
+        async_client = AsyncMongoMockClient(mock_mongo_client=sync_client)
+    else:
+        from pymongo import MongoClient
+        sync_client = MongoClient(os.getenv("MONGODB_URI"))
+        async_client = None
+
+    database.DATABASE_NAME = "e_tendering_bench"
+    sync_db = sync_client[database.DATABASE_NAME]
+    sync_db["tenders"].drop()
+    tender_ids = [
+        str(sync_db["tenders"].insert_one({"title": f"Tender {i}", "budget": i, "status": "published"}).inserted_id)
+        for i in range(args.tenders)
+    ]
+
+    from main import app
+    database._client = async_client
+
+    async def bench():
+        database.connect()
+        blocking = await run_load(build_blocking_app(sync_db), tender_ids, args.requests, args.concurrency)
+        non_blocking = await run_load(app, tender_ids, args.requests, args.concurrency)
+        return blocking, non_blocking
+
+    try:
+        blocking, non_blocking = asyncio.run(bench())
+    finally:
+        sync_db["tenders"].drop()
+        database.close()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} backend={'mongomock' if args.mongomock else 'mongod'}")
+    print(f"blocking pymongo : {blocking:10.1f} req/s")
+    print(f"async motor      : {non_blocking:10.1f} req/s")
+    print(f"speedup          : {non_blocking / blocking:10.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Bid submission throughput against a local chain.
+
+Deploys a fresh TenderContract, opens a tender and submits bids from a single
+bidder wallet in three modes:
+
+  serial     node-assigned nonces, wait for each receipt before the next bid
+  pipelined  local nonces, `--concurrency` bids in flight, each waiting for its own receipt
+  batched    local nonces, send every bid then confirm them all with one receipt wait
+
+Usage (from backend/):
+    python benchmarks/bench_chain_bids.py                               # in-process eth-tester
+    python benchmarks/bench_chain_bids.py --rpc-url http://127.0.0.1:8545  # Anvil/Ganache
+
+eth-tester mines every transaction instantly, so the difference between the
+modes is small there; run Anvil with `--block-time 1` (or Ganache with a block
+time) to see the effect of not waiting one block per bid.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from web3 import Web3
+
+from blockchain import BlockchainManager
+
+COMPILED_CONTRACT = os.path.join(os.path.dirname(__file__), "../../contracts/compiled_contract.json")
+
+def make_manager(rpc_url, local_nonces):
+    os.environ["BLOCKCHAIN_LOCAL_NONCES"] = "true" if local_nonces else "false"
+    if rpc_url:
+        manager = BlockchainManager(provider=Web3.HTTPProvider(rpc_url), deployment_file=None)
+    else:
+        from web3 import EthereumTesterProvider
+        manager = BlockchainManager(provider=EthereumTesterProvider(), deployment_file=None, max_concurrency=1)
+        manager.poll_interval = 0.01
+
+    with open(COMPILED_CONTRACT) as f:
+        compiled = json.load(f)["contracts"]["TenderContract.sol"]["TenderContract"]
+    factory = manager.w3.eth.contract(abi=compiled["abi"], bytecode=compiled["evm"]["bytecode"]["object"])
+    tx_hash = factory.constructor().transact({"from": manager.w3.eth.accounts[0]})
+    receipt = manager.w3.eth.wait_for_transaction_receipt(tx_hash)
+    manager.set_contract(receipt.contractAddress, compiled["abi"])
+    return manager
+
+async def open_tender(manager):
+    admin = manager.w3.eth.accounts[0]
+    result = await manager.submit_tender_to_blockchain(
+        {"title": "Benchmark", "budget": 10 ** 6, "deadline_timestamp": int(time.time()) + 86400}, admin
+    )
+    return result["blockchain_tender_id"]
+
+def bid_call(manager, tender_id, i):
+    return manager.contract.functions.submitBid(tender_id, 1000 + i, Web3.keccak(text=f"bid-{i}"))
+
+async def run_serial(manager, tender_id, bidder, bids, concurrency):
+    for i in range(bids):
+        tx_hash = await manager.send_transaction(bid_call(manager, tender_id, i), bidder)
+        await manager.wait_for_receipt(tx_hash)
+
+async def run_pipelined(manager, tender_id, bidder, bids, concurrency):
+    queue = list(range(bids))
+
+    async def worker():
+        while queue:
+            i = queue.pop()
+            tx_hash = await manager.send_transaction(bid_call(manager, tender_id, i), bidder)
+            await manager.wait_for_receipt(tx_hash)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def run_batched(manager, tender_id, bidder, bids, concurrency):
+    from_block = await manager.block_number()
+    tx_hashes = await asyncio.gather(*(
+        manager.send_transaction(bid_call(manager, tender_id, i), bidder) for i in range(bids)
+    ))
+    receipts = await manager.wait_for_receipts(tx_hashes, from_block)
+    assert len(receipts) == bids, f"only {len(receipts)}/{bids} bids mined"
+
+MODES = {
+    "serial": (run_serial, False),
+    "pipelined": (run_pipelined, True),
+    "batched": (run_batched, True),
+}
+
+async def bench(mode, rpc_url, bids, concurrency):
+    run, local_nonces = MODES[mode]
+    manager = make_manager(rpc_url, local_nonces)
+    tender_id = await open_tender(manager)
+    bidder = manager.w3.eth.accounts[1]
+    start = time.perf_counter()
+    await run(manager, tender_id, bidder, bids, concurrency)
+    return bids / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpc-url", help="JSON-RPC endpoint of a local Anvil/Ganache node (default: eth-tester)")
+    parser.add_argument("--bids", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    print(f"bids={args.bids} concurrency={args.concurrency} chain={args.rpc_url or 'eth-tester'}")
+    for mode in args.modes.split(","):
+        rate = asyncio.run(bench(mode, args.rpc_url, args.bids, args.concurrency))
+        print(f"{mode:10s}: {rate:10.1f} bids/s")
+
+if __name__ == "__main__":
+    main()
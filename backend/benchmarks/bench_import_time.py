@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of importing the API (or the worker), from `python -X importtime`.
+
+Imports `--module` in `--runs` fresh interpreters. For each run it reads the
+importtime report and records the module's cumulative import time and the
+wall time of the whole process. The median is reported, along with the
+packages that spend the most import time (self time summed per top-level
+package).
+
+web3, eth_account, ens and passlib are deferred until first use (see
+blockchain.get_blockchain_manager and auth.pwd_context). If any of them is
+imported by `main` itself, the run reports it.
+
+--save-baseline stores the median in baselines.json (next to the harness
+baselines). --check exits 1 when the import time is more than --tolerance
+above the baseline, or when a deferred package is imported eagerly.
+Baselines are only comparable on the machine that recorded them.
+
+Usage (from backend/):
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --module worker --runs 10
+    python benchmarks/bench_import_time.py --save-baseline
+    python benchmarks/bench_import_time.py --check --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..")
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFERRED = ("web3", "eth_account", "ens", "passlib")
+
+def run_once(module):
+    """One `-X importtime` run: ({module name: (self_us, cumulative_us)}, wall seconds)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, wall
+
+def measure(module, runs):
+    totals, walls, by_package = [], [], {}
+    deferred_loaded = set()
+    for _ in range(runs):
+        modules, wall = run_once(module)
+        totals.append(modules[module][1] / 1000)
+        walls.append(wall * 1000)
+        run_packages = {}
+        for name, (self_us, _cumulative) in modules.items():
+            package = name.split(".")[0]
+            run_packages[package] = run_packages.get(package, 0) + self_us
+        for package, self_us in run_packages.items():
+            by_package.setdefault(package, []).append(self_us)
+        deferred_loaded.update(package for package in run_packages if package in DEFERRED)
+    packages = {package: statistics.median(samples) / 1000 for package, samples in by_package.items()}
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": statistics.median(totals),
+        "import_min_ms": min(totals),
+        "process_ms": statistics.median(walls),
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: -item[1])),
+        "deferred_loaded": sorted(deferred_loaded),
+    }
+
+def load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES) as f:
+        return json.load(f)
+
+def save_baseline(result):
+    baselines = load_baselines()
+    baselines.setdefault("import_time", {})[result["module"]] = {
+        "import_ms": result["import_ms"],
+        "process_ms": result["process_ms"],
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(BASELINES, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+def regressions(result, tolerance):
+    found = []
+    if result["module"] == "main" and result["deferred_loaded"]:
+        found.append(f"imported at startup: {', '.join(result['deferred_loaded'])}")
+    base = load_baselines().get("import_time", {}).get(result["module"])
+    if base is None:
+        print(f"No baseline for {result['module']}")
+    elif result["import_ms"] > base["import_ms"] * (1 + tolerance):
+        found.append(f"import {result['module']}: {result['import_ms']:.0f} ms vs baseline {base['import_ms']:.0f} ms")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (main or worker)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="heaviest packages to list")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the result in {os.path.basename(BASELINES)}")
+    parser.add_argument("--check", action="store_true", help="exit 1 if import time regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs)
+    print(f"import {args.module}: {result['import_ms']:.0f} ms median "
+          f"(min {result['import_min_ms']:.0f} ms), process {result['process_ms']:.0f} ms, {args.runs} runs")
+    print(f"{'package':<24}{'self ms':>10}")
+    for package, ms in list(result["packages_ms"].items())[:args.top]:
+        print(f"{package:<24}{ms:>10.1f}")
+    if result["deferred_loaded"]:
+        print(f"Deferred packages imported: {', '.join(result['deferred_loaded'])}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        save_baseline(result)
+        print(f"Saved baseline for {args.module} to {BASELINES}")
+    if args.check:
+        found = regressions(result, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
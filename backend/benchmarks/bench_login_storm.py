@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Latency of unrelated endpoints during a login storm.
+
+Starts `--logins` concurrent POST /auth/login requests against the FastAPI
+app in-process and, while they run, probes GET / every `--probe-interval`
+seconds. Reports p50/p99 probe latency for two variants:
+
+  inline  the previous behaviour: bcrypt runs on the event loop inside the handler
+  pool    the current auth module: bcrypt runs on the bounded hashing pool
+
+Login throttling is relaxed for the run so that every attempt reaches bcrypt.
+
+Usage (from backend/):
+    python benchmarks/bench_login_storm.py                 # local mongod at MONGODB_URI
+    python benchmarks/bench_login_storm.py --mongomock     # in-memory stand-in
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOGIN_MAX_ATTEMPTS_PER_IP", "1000000")
+os.environ.setdefault("LOGIN_MAX_FAILURES_PER_ACCOUNT", "1000000")
+
+import httpx
+
+import auth
+import database
+
+PASSWORD = "storm-password"
+
+async def _inline_hashing(fn, *args):
+    return fn(*args)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run_storm(app, users, logins, probe_interval):
+    transport = httpx.ASGITransport(app=app)
+    probes = []
+    statuses = {}
+    done = asyncio.Event()
+
+    async def login(client, i):
+        response = await client.post("/auth/login", data={"username": users[i % len(users)], "password": PASSWORD})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def probe(client, interval):
+        # Latency is measured from when the probe was due, so time spent waiting
+        # for a blocked event loop counts against it (no coordinated omission)
+        due = time.perf_counter()
+        while not done.is_set():
+            response = await client.get("/")
+            response.raise_for_status()
+            probes.append(time.perf_counter() - due)
+            due += interval
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        prober = asyncio.create_task(probe(client, probe_interval))
+        start = time.perf_counter()
+        await asyncio.gather(*(login(client, i) for i in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+    return probes, statuses, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a real mongod")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    database.DATABASE_NAME = "e_tendering_bench"
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        database._client = AsyncMongoMockClient()
+
+    from main import app
+
+    async def bench():
+        db = database.connect()[database.DATABASE_NAME]
+        await db["users"].drop()
+        hashed = auth.get_password_hash(PASSWORD)
+        users = [f"storm{i}" for i in range(args.users)]
+        await db["users"].insert_many([
+            {"username": name, "email": f"{name}@bench", "password": hashed, "role": "bidder"} for name in users
+        ])
+
+        results = {}
+        pooled = auth._run_hashing
+        for mode, hashing in (("inline", _inline_hashing), ("pool", pooled)):
+            auth._run_hashing = hashing
+            results[mode] = await run_storm(app, users, args.logins, args.probe_interval)
+        auth._run_hashing = pooled
+        await db["users"].drop()
+        return results
+
+    try:
+        results = asyncio.run(bench())
+    finally:
+        database.close()
+
+    print(f"logins={args.logins} hash_workers={auth.PASSWORD_HASH_WORKERS} "
+          f"hash_queue={auth.PASSWORD_HASH_QUEUE} backend={'mongomock' if args.mongomock else 'mongod'}")
+    for mode, (probes, statuses, elapsed) in results.items():
+        print(f"{mode:7s}: probe p50 {statistics.median(probes) * 1000:8.1f} ms  "
+              f"p99 {percentile(probes, 99) * 1000:8.1f} ms  probes {len(probes):4d}  "
+              f"storm {elapsed:6.2f} s  statuses {statuses}")
+
+if __name__ == "__main__":
+    main()
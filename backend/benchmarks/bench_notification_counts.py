@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Notification counts: count_documents vs the materialized counter.
+
+Seeds one user with N notifications (a quarter of them unread), applies the
+declared indexes, then times --requests calls of each variant:
+
+  count    the previous /notifications/count: two count_documents calls
+  counter  notification_counters.get_counts, a single _id lookup
+
+Usage (from backend/):
+    python benchmarks/bench_notification_counts.py                    # local mongod at MONGODB_URI
+    python benchmarks/bench_notification_counts.py --sizes 10000 --mongomock
+
+count_documents has to walk every matching index entry, so its cost follows
+the user's history; the counter read stays flat. mongomock scans documents in
+Python, so keep --sizes small with it.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import database
+import indexes
+import notification_counters
+
+USER_ID = "bench-user"
+BATCH = 10000
+
+async def seed(db, size: int):
+    await db["notifications"].drop()
+    await db[notification_counters.COUNTERS_COLLECTION].drop()
+    await indexes.ensure_indexes(db)
+    now = datetime.utcnow()
+    for start in range(0, size, BATCH):
+        await db["notifications"].insert_many([
+            {
+                "user_id": USER_ID,
+                "title": "bench",
+                "message": "bench",
+                "type": "system",
+                "is_read": i % 4 != 0,
+                "created_at": now
+            }
+            for i in range(start, min(start + BATCH, size))
+        ], ordered=False)
+    await notification_counters.reconcile(db)
+
+async def count_documents(db):
+    total = await db["notifications"].count_documents({"user_id": USER_ID})
+    unread = await db["notifications"].count_documents({"user_id": USER_ID, "is_read": False})
+    return {"total": total, "unread": unread}
+
+async def time_calls(fn, db, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await fn(db)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return f"p50 {statistics.median(latencies):9.3f} ms  p99 {p99:9.3f} ms"
+
+async def bench(args):
+    db = database.get_database()
+    results = []
+    for size in args.sizes:
+        await seed(db, size)
+        expected = await count_documents(db)
+        assert await notification_counters.get_counts(db, USER_ID) == expected
+        results.append((
+            size,
+            await time_calls(count_documents, db, args.requests),
+            await time_calls(lambda db: notification_counters.get_counts(db, USER_ID), db, args.requests)
+        ))
+    await db["notifications"].drop()
+    await db[notification_counters.COUNTERS_COLLECTION].drop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a real mongod")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[10000, 1000000],
+                        help="comma-separated notification counts for the user")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    database.DATABASE_NAME = "e_tendering_bench"
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        database._client = AsyncMongoMockClient()
+
+    try:
+        results = asyncio.run(bench(args))
+    finally:
+        database.close()
+
+    print(f"backend={'mongomock' if args.mongomock else 'mongod'} requests={args.requests}")
+    for size, counted, counter in results:
+        print(f"{size:>9} notifications  count   : {summary(counted)}")
+        print(f"{'':>9}                counter : {summary(counter)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Idle notification streams vs polling.
+
+Runs the API under uvicorn in-process and compares, for `--clients` users:
+
+  poll    one round of GET /notifications/unread + /notifications/count per
+          client (what a polling frontend repeats every few seconds)
+  stream  clients holding GET /notifications/stream open; reports the memory
+          cost per idle connection and how long one notification per user
+          takes to reach every stream
+
+Usage (from backend/):
+    python benchmarks/bench_notification_stream.py --mongomock --clients 1000
+
+Client and server share the process, so the CPU and memory figures include
+the client side as well and are upper bounds.
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+import uvicorn
+
+import auth
+import database
+import notification_hub
+
+PORT = 8799
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def bench(args):
+    from main import app
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning", backlog=4096))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    db = database.get_database()
+    user_ids = [f"bench-user-{i}" for i in range(args.clients)]
+    tokens = [auth.create_access_token({"sub": user_id}) for user_id in user_ids]
+    await db["users"].insert_many([
+        {"username": user_id, "email": f"{user_id}@bench", "password": "-", "role": "bidder"} for user_id in user_ids
+    ])
+    users = {user["username"]: str(user["_id"]) async for user in db["users"].find({"username": {"$in": user_ids}})}
+
+    limits = httpx.Limits(max_connections=args.clients + 10, max_keepalive_connections=args.clients + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=None) as client:
+        # Polling: one round for every client, `--concurrency` requests in flight
+        polls = [(token, path) for token in tokens for path in ("/notifications/unread", "/notifications/count")]
+
+        async def poller():
+            while polls:
+                token, path = polls.pop()
+                response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+                response.raise_for_status()
+
+        start = time.process_time()
+        await asyncio.gather(*(poller() for _ in range(args.concurrency)))
+        poll_round = time.process_time() - start
+
+        # Streaming: open every stream, then push one event per user
+        rss_before = rss_mb()
+        received = asyncio.Queue()
+        ready = asyncio.Event()
+        opened = 0
+
+        async def listen(token):
+            nonlocal opened
+            async with client.stream("GET", "/notifications/stream", headers={"Authorization": f"Bearer {token}"}) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: unread"):
+                        opened += 1
+                        if opened == args.clients:
+                            ready.set()
+                    elif line.startswith("event: notification"):
+                        received.put_nowait(time.perf_counter())
+
+        listeners = [asyncio.create_task(listen(token)) for token in tokens]
+        await ready.wait()
+        await asyncio.sleep(args.idle)
+        rss_after = rss_mb()
+
+        start = time.perf_counter()
+        for user_id in users.values():
+            await notification_hub.publish(user_id, {"type": "notification", "notification": {"title": "bench"}})
+        for _ in range(args.clients):
+            await received.get()
+        fan_out = time.perf_counter() - start
+
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    await db["users"].drop()
+    server.should_exit = True
+    await serve
+    return poll_round, (rss_after - rss_before) * 1024 / args.clients, fan_out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a real mongod")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50, help="polling requests in flight")
+    parser.add_argument("--idle", type=float, default=2.0, help="seconds to hold the streams idle")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="polling period the frontend would use")
+    args = parser.parse_args()
+
+    database.DATABASE_NAME = "e_tendering_bench"
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        database._client = AsyncMongoMockClient()
+
+    try:
+        poll_round, kb_per_stream, fan_out = asyncio.run(bench(args))
+    finally:
+        database.close()
+
+    print(f"clients={args.clients} backend={'mongomock' if args.mongomock else 'mongod'}")
+    print(f"poll   : {poll_round:8.3f} CPU s per round = {poll_round / args.poll_interval * 100:6.1f}% of a core "
+          f"at one round every {args.poll_interval:g}s ({2 * args.clients / args.poll_interval:.0f} req/s)")
+    print(f"stream : {kb_per_stream:8.1f} KiB per idle connection, 0 req/s while idle, "
+          f"fan-out of one event per user in {fan_out * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
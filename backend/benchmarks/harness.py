@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Scripted load scenarios against the FastAPI app, with stored baselines.
+
+Each scenario seeds its own data into a scratch database, drives the app
+in-process with `--concurrency` clients and reports throughput, p50/p95/p99
+latency and process memory:
+
+  tender_browse         anonymous clients paging through tender lists and opening tenders
+  login_storm           concurrent logins (bcrypt on the hashing pool)
+  bid_burst             every bidder submits in the last minute before the deadline
+  notification_polling  clients polling their unread count and first unread page
+  evaluate_10k          evaluating tenders that each received 10,000 bids
+  bid_anchoring         draining queued bids to a local chain through the outbox worker
+
+A request's latency ends when its last response byte is sent, as with a real
+server; background tasks it started (notification fan-out) finish untimed
+before the next scenario. bid_anchoring uses eth-tester in-process, or Anvil
+with --rpc-url; the other scenarios need no chain.
+
+--save-baseline stores the results in baselines.json (per database backend);
+--check compares a run with them and exits 1 when a scenario's p95 latency
+or throughput is more than --tolerance worse, so a slowdown in routes/*.py
+or blockchain.py shows up before it ships. Baselines are only comparable on
+the machine that recorded them.
+
+Usage (from backend/):
+    python benchmarks/harness.py --mongomock                      # every scenario, in-memory stand-in
+    python benchmarks/harness.py --scenarios tender_browse,bid_burst
+    python benchmarks/harness.py --save-baseline                  # local mongod at MONGODB_URI
+    python benchmarks/harness.py --check --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOGIN_MAX_ATTEMPTS_PER_IP", "1000000")
+os.environ.setdefault("LOGIN_MAX_FAILURES_PER_ACCOUNT", "1000000")
+
+import httpx
+from bson import ObjectId
+
+import auth
+import blockchain
+import database
+import indexes
+import outbox
+from models import Bid, BidStatus, Notification, NotificationType, Tender, TenderStatus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+PASSWORD = "bench-password"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def rss_mb():
+    """Current resident set size (Linux), else the peak"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+class AppClient:
+    """
+    Drives the ASGI app in-process. A request completes with its last body
+    chunk and the app keeps running its background tasks, as under uvicorn;
+    drain() waits for them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._running = set()
+
+    async def request(self, method, path, headers=None, **kwargs):
+        request = httpx.Request(method, f"http://bench{path}", headers=headers, **kwargs)
+        body = request.read()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": request.url.path,
+            "raw_path": request.url.path.encode(),
+            "query_string": request.url.query,
+            "root_path": "",
+            "headers": [(key.lower(), value) for key, value in request.headers.raw],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+        response = {"status": None, "body": []}
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.shield(finished)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if not message.get("more_body") and not finished.done():
+                    finished.set_result(None)
+
+        task = asyncio.create_task(self.app(scope, receive, send))
+        self._running.add(task)
+        task.add_done_callback(self._done)
+        await asyncio.wait({finished, task}, return_when=asyncio.FIRST_COMPLETED)
+        if not finished.done():
+            # The app raised before responding
+            task.result()
+        return response["status"], b"".join(response["body"])
+
+    def _done(self, task):
+        self._running.discard(task)
+        if not task.cancelled():
+            # Errors after the response (ServerErrorMiddleware re-raises) are already counted as 500s
+            task.exception()
+
+    async def drain(self):
+        await asyncio.gather(*self._running, return_exceptions=True)
+
+async def drive(total, concurrency, make_request):
+    """Run `total` requests from `concurrency` clients; returns latencies, statuses and elapsed seconds"""
+    latencies = []
+    statuses = {}
+    next_index = iter(range(total))
+
+    async def client():
+        for i in next_index:
+            start = time.perf_counter()
+            status = await make_request(i)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+def bearer(username):
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+
+async def seed_users(db, prefix, count, role="bidder", hashed=None, wallets=None):
+    users = [{
+        "_id": ObjectId(),
+        "username": f"{prefix}{i}",
+        "email": f"{prefix}{i}@bench",
+        "password": hashed or "not-a-login-user",
+        "role": role,
+        "wallet_address": wallets[i % len(wallets)] if wallets else None,
+        "created_at": datetime.utcnow(),
+    } for i in range(count)]
+    if users:
+        await db["users"].insert_many(users)
+    return users
+
+async def seed_tenders(db, admin, count, status=TenderStatus.PUBLISHED, deadline=None):
+    tenders = []
+    for i in range(count):
+        tender = Tender(
+            title=f"Tender {i}",
+            description="Supply and installation of benchmark equipment. " * 10,
+            budget=random.randint(10_000, 1_000_000),
+            deadline=deadline or datetime.utcnow() + timedelta(days=random.randint(1, 60)),
+            requirements="ISO 9001, three years of audited accounts",
+            admin_id=str(admin["_id"]),
+            status=status
+        ).dict(by_alias=True)
+        tender["_id"] = ObjectId()
+        tenders.append(tender)
+    await db["tenders"].insert_many(tenders)
+    return tenders
+
+async def tender_browse(ctx):
+    admin = (await seed_users(ctx.db, "admin", 1, role="admin"))[0]
+    tenders = await seed_tenders(ctx.db, admin, ctx.scaled(300))
+    tender_ids = [str(tender["_id"]) for tender in tenders]
+    cursors = [None]
+
+    async def request(i):
+        if i % 10 < 7:
+            # Page through the list; each client starts over after the last page
+            cursor = random.choice(cursors)
+            path = "/tenders/?view=summary&limit=20" + (f"&cursor={cursor}" if cursor else "")
+            status, body = await ctx.client.request("GET", path)
+            next_cursor = json.loads(body).get("next_cursor") if status == 200 else None
+            if next_cursor and next_cursor not in cursors:
+                cursors.append(next_cursor)
+            return status
+        status, _ = await ctx.client.request("GET", f"/tenders/{random.choice(tender_ids)}")
+        return status
+
+    return await drive(ctx.scaled(2000), ctx.concurrency, request)
+
+async def login_storm(ctx):
+    users = await seed_users(ctx.db, "login", 20, hashed=auth.get_password_hash(PASSWORD))
+
+    async def request(i):
+        status, _ = await ctx.client.request(
+            "POST", "/auth/login", data={"username": users[i % len(users)]["username"], "password": PASSWORD}
+        )
+        return status
+
+    return await drive(ctx.scaled(100), ctx.concurrency, request)
+
+async def bid_burst(ctx):
+    admin = (await seed_users(ctx.db, "admin", 1, role="admin"))[0]
+    tender = (await seed_tenders(ctx.db, admin, 1, deadline=datetime.utcnow() + timedelta(minutes=1)))[0]
+    bidders = await seed_users(ctx.db, "bidder", ctx.scaled(500))
+    # One bidder in five anchors its bid from a wallet (bid + outbox job in one transaction)
+    await ctx.db["users"].update_many(
+        {"_id": {"$in": [bidder["_id"] for bidder in bidders[::5]]}}, {"$set": {"wallet_address": "0x" + "5" * 40}}
+    )
+    headers = [bearer(bidder["username"]) for bidder in bidders]
+    path = f"/bids/{tender['_id']}"
+
+    async def request(i):
+        status, _ = await ctx.client.request(
+            "POST", path,
+            headers={**headers[i], "Idempotency-Key": uuid.uuid4().hex},
+            data={"bid_data": json.dumps({"amount": random.randint(10_000, 1_000_000)})}
+        )
+        return status
+
+    return await drive(len(bidders), ctx.concurrency, request)
+
+async def notification_polling(ctx):
+    users = await seed_users(ctx.db, "reader", ctx.scaled(200))
+    per_user = 50
+    now = datetime.utcnow()
+    docs = []
+    for user in users:
+        for i in range(per_user):
+            doc = Notification(
+                user_id=str(user["_id"]),
+                title="Tender published",
+                message="A new tender is open for bids.",
+                type=NotificationType.TENDER_PUBLISHED,
+                is_read=i % 3 == 0,
+                created_at=now - timedelta(minutes=i)
+            ).dict(by_alias=True, exclude={"id"})
+            docs.append(doc)
+    await ctx.db["notifications"].insert_many(docs)
+    headers = [bearer(user["username"]) for user in users]
+
+    async def request(i):
+        path = "/notifications/count" if i % 2 == 0 else "/notifications/unread?limit=20"
+        status, _ = await ctx.client.request("GET", path, headers=headers[i % len(headers)])
+        return status
+
+    return await drive(ctx.scaled(2000), ctx.concurrency, request)
+
+async def evaluate_10k(ctx):
+    admin = (await seed_users(ctx.db, "admin", 1, role="admin"))[0]
+    bidders = await seed_users(ctx.db, "bidder", 1000)
+    tenders = await seed_tenders(ctx.db, admin, 3, status=TenderStatus.CLOSED)
+    bids_per_tender = ctx.scaled(10_000)
+    for tender in tenders:
+        bids = []
+        for i in range(bids_per_tender):
+            bid = Bid(
+                tender_id=str(tender["_id"]),
+                bidder_id=str(bidders[i % len(bidders)]["_id"]),
+                amount=random.randint(10_000, 1_000_000),
+                status=BidStatus.PENDING
+            ).dict(by_alias=True)
+            bid["_id"] = ObjectId()
+            bids.append(bid)
+        await ctx.db["bids"].insert_many(bids)
+    headers = bearer(admin["username"])
+
+    async def request(i):
+        status, _ = await ctx.client.request("PUT", f"/tenders/{tenders[i]['_id']}/evaluate", headers=headers, json={})
+        return status
+
+    # One evaluation per tender: evaluating again is a 409
+    return await drive(len(tenders), 1, request)
+
+async def bid_anchoring(ctx):
+    from bench_chain_bids import make_manager, open_tender
+
+    manager = make_manager(ctx.args.rpc_url, local_nonces=True)
+    chain_tender_id = await open_tender(manager)
+    admin = (await seed_users(ctx.db, "admin", 1, role="admin"))[0]
+    tender = (await seed_tenders(ctx.db, admin, 1))[0]
+    await ctx.db["tenders"].update_one({"_id": tender["_id"]}, {"$set": {"blockchain_tender_id": chain_tender_id}})
+    bidders = await seed_users(ctx.db, "bidder", ctx.scaled(100), wallets=manager.w3.eth.accounts[1:])
+
+    # Queue the bids through the API (untimed), then time the worker draining them
+    for i, bidder in enumerate(bidders):
+        status, body = await ctx.client.request(
+            "POST", f"/bids/{tender['_id']}", headers=bearer(bidder["username"]),
+            data={"bid_data": json.dumps({"amount": 1000 + i})}
+        )
+        assert status == 200, body
+
+    original = blockchain.set_blockchain_manager(manager)
+    stop = asyncio.Event()
+    start = time.perf_counter()
+    started_at = datetime.utcnow()
+    worker = asyncio.create_task(outbox.run_worker(ctx.db, stop, concurrency=1, batch_size=ctx.args.outbox_batch))
+    try:
+        while await ctx.db[outbox.OUTBOX_COLLECTION].count_documents({"status": {"$in": [outbox.PENDING, outbox.PROCESSING]}}):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        await worker
+        blockchain.set_blockchain_manager(original)
+
+    jobs = await ctx.db[outbox.OUTBOX_COLLECTION].find({}, {"status": 1, "updated_at": 1}).to_list(length=None)
+    statuses = {}
+    for job in jobs:
+        statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+    latencies = [(job["updated_at"] - started_at).total_seconds() for job in jobs if job["status"] == outbox.DONE]
+    return latencies, statuses, elapsed
+
+SCENARIOS = {
+    "tender_browse": tender_browse,
+    "login_storm": login_storm,
+    "bid_burst": bid_burst,
+    "notification_polling": notification_polling,
+    "evaluate_10k": evaluate_10k,
+    "bid_anchoring": bid_anchoring,
+}
+
+class Context:
+    def __init__(self, args, app, db):
+        self.args = args
+        self.db = db
+        self.client = AppClient(app)
+        self.concurrency = args.concurrency
+
+    def scaled(self, count):
+        return max(1, int(count * self.args.scale))
+
+def summarize(latencies, statuses, elapsed, rss_before):
+    ok = sum(count for status, count in statuses.items() if status in (200, 304, outbox.DONE))
+    rss_after = rss_mb()
+    return {
+        "requests": sum(statuses.values()),
+        "errors": sum(statuses.values()) - ok,
+        "throughput": ok / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "rss_mb": rss_after,
+        "rss_growth_mb": rss_after - rss_before if rss_after is not None and rss_before is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+async def run_scenarios(args, app, names):
+    results = {}
+    client = database.connect()
+    for name in names:
+        await client.drop_database(database.DATABASE_NAME)
+        db = client[database.DATABASE_NAME]
+        if not args.mongomock:
+            # mongomock gains nothing from indexes and checks unique ones with a scan per write
+            await indexes.ensure_indexes(db)
+        ctx = Context(args, app, db)
+        random.seed(name)
+        before = rss_mb()
+        latencies, statuses, elapsed = await SCENARIOS[name](ctx)
+        results[name] = summarize(latencies, statuses, elapsed, before)
+        await ctx.client.drain()
+        print_result(name, results[name])
+    await client.drop_database(database.DATABASE_NAME)
+    return results
+
+def fmt(value, spec):
+    return format(value, spec) if value is not None else "-".rjust(len(format(0.0, spec)))
+
+def print_result(name, result):
+    print(f"{name:21s} {result['requests']:6d} req  {result['errors']:4d} err  "
+          f"{fmt(result['throughput'], '9.1f')} /s  p50 {fmt(result['p50_ms'], '8.1f')}  "
+          f"p95 {fmt(result['p95_ms'], '8.1f')}  p99 {fmt(result['p99_ms'], '8.1f')} ms  "
+          f"rss {fmt(result['rss_mb'], '6.0f')} MB (+{fmt(result['rss_growth_mb'], '.0f')})", flush=True)
+
+def load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES) as f:
+        return json.load(f)
+
+def save_baselines(backend, results):
+    baselines = load_baselines()
+    stored = baselines.setdefault(backend, {})
+    for name, result in results.items():
+        stored[name] = {key: result[key] for key in ("throughput", "p50_ms", "p95_ms", "p99_ms", "rss_growth_mb")}
+    stored["_recorded_at"] = datetime.utcnow().isoformat()
+    with open(BASELINES, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def regressions(backend, results, tolerance):
+    baseline = load_baselines().get(backend, {})
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and result["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {result['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        if base["throughput"] and result["throughput"] < base["throughput"] * (1 - tolerance):
+            found.append(f"{name}: throughput {result['throughput']:.1f}/s vs baseline {base['throughput']:.1f}/s")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a real mongod")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's data and request counts")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rpc-url", help="JSON-RPC endpoint of a local Anvil node for bid_anchoring (default: eth-tester)")
+    parser.add_argument("--outbox-batch", type=int, default=16, help="OUTBOX_BATCH_SIZE used by bid_anchoring")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results in {os.path.basename(BASELINES)}")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a scenario regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    names = args.scenarios.split(",")
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.save_baseline and args.scale != 1.0:
+        parser.error("baselines are recorded at --scale 1")
+
+    backend = "mongomock" if args.mongomock else "mongod"
+    database.DATABASE_NAME = "e_tendering_bench"
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        database._client = AsyncMongoMockClient()
+
+    from main import app
+
+    print(f"backend={backend} scale={args.scale} concurrency={args.concurrency} "
+          f"chain={args.rpc_url or 'eth-tester'}")
+    try:
+        results = asyncio.run(run_scenarios(args, app, names))
+    finally:
+        database.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": backend, "scale": args.scale, "results": results}, f, indent=2)
+    if args.save_baseline:
+        save_baselines(backend, results)
+        print(f"Saved baseline for {backend} to {BASELINES}")
+    if args.check:
+        found = regressions(backend, results, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -2,48 +2,133 @@
 Blockchain integration module for E-Tendering System
 """
 
+import asyncio
+import contextvars
+import functools
 import json
+import logging
 import os
-from web3 import Web3
-from web3.contract import Contract
-from typing import Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from nonce_manager import NonceManager, is_nonce_error
+import metrics
+import tracing
+from typing import TYPE_CHECKING, Optional, Dict, Any
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
+# web3 (with eth_account and ens) takes about a second to import, so it is only
+# imported when the first manager is built, not when the API starts
+if TYPE_CHECKING:
+    from web3.contract import Contract
+
+logger = logging.getLogger(__name__)
+
 def config(key, default=None):
     return os.getenv(key, default)
 
+DEFAULT_DEPLOYMENT_FILE = os.path.join(os.path.dirname(__file__), "../contracts/deployment_info.json")
+TX_GAS = 2000000
+NONCE_RETRIES = 3
+
+@functools.lru_cache(maxsize=None)
+def load_deployment(path: str) -> Optional[Dict[str, Any]]:
+    """Parsed deployment_info.json (address and ABI), read once per process; None if missing"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+class ReceiptTimeout(Exception):
+    """Raised when a transaction is not mined within the receipt timeout"""
+
+    def __init__(self, tx_hash: str, timeout: float):
+        super().__init__(f"Transaction {tx_hash} not mined after {timeout}s")
+        self.tx_hash = tx_hash
+        self.timeout = timeout
+
 class BlockchainManager:
-    def __init__(self):
-        self.w3 = Web3(Web3.HTTPProvider(config("GANACHE_URI", default="http://127.0.0.1:7545")))
-        self.contract: Optional[Contract] = None
+    """
+    Async gateway to the TenderContract.
+
+    web3.py's HTTP provider is synchronous, so every JSON-RPC call is run on a
+    dedicated thread pool and the number of in-flight calls is bounded by a
+    semaphore. Receipts are polled with asyncio.sleep between attempts, so a
+    pending transaction never holds a worker thread while it waits to be mined.
+    """
+
+    def __init__(self, provider=None, deployment_file: Optional[str] = DEFAULT_DEPLOYMENT_FILE,
+                 max_concurrency: Optional[int] = None):
+        from web3 import Web3
+        self.w3 = Web3(tracing.instrument_web3_provider(metrics.instrument_web3_provider(provider or Web3.HTTPProvider(
+            config("GANACHE_URI", default="http://127.0.0.1:7545"),
+            request_kwargs={"timeout": float(config("BLOCKCHAIN_RPC_TIMEOUT", default="10"))}
+        ))))
+        self.contract: Optional["Contract"] = None
         self.contract_address: Optional[str] = None
         self.abi: Optional[list] = None
+        self.deployment_file = deployment_file
+
+        self.receipt_timeout = float(config("BLOCKCHAIN_RECEIPT_TIMEOUT", default="120"))
+        self.poll_interval = float(config("BLOCKCHAIN_POLL_INTERVAL", default="0.5"))
+        # In-process test chains such as eth-tester are not thread-safe: use max_concurrency=1
+        if max_concurrency is None:
+            max_concurrency = int(config("BLOCKCHAIN_MAX_CONCURRENCY", default="8"))
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="web3")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Assign nonces locally so transactions from one wallet can be pipelined
+        self.nonces: Optional[NonceManager] = None
+        if config("BLOCKCHAIN_LOCAL_NONCES", default="true").lower() == "true":
+            self.nonces = NonceManager(self._pending_nonce)
 
         # Load contract info if available
         self._load_contract_info()
 
     def _load_contract_info(self):
         """Load deployed contract information"""
-        deployment_file = os.path.join(os.path.dirname(__file__), "../contracts/deployment_info.json")
-
-        if os.path.exists(deployment_file):
-            with open(deployment_file, "r") as f:
-                deployment_info = json.load(f)
-                self.contract_address = deployment_info["contract_address"]
-                self.abi = deployment_info["abi"]
-                self.contract = self.w3.eth.contract(
-                    address=self.contract_address,
-                    abi=self.abi
-                )
+        if self.deployment_file is None:
+            # Contract is supplied later through set_contract()
+            return
+        deployment_info = load_deployment(self.deployment_file)
+        if deployment_info is not None:
+            self.set_contract(deployment_info["contract_address"], deployment_info["abi"])
         else:
-            print("Warning: Contract not deployed yet. Run deployment script first.")
+            logger.warning("Contract not deployed yet. Run deployment script first.")
+
+    def set_contract(self, contract_address: str, abi: list):
+        """Point the manager at a deployed TenderContract (e.g. one deployed to a local test chain)"""
+        self.contract_address = contract_address
+        self.abi = abi
+        self.contract = self.w3.eth.contract(
+            address=self.contract_address,
+            abi=self.abi
+        )
+
+    async def _call(self, fn, *args, **kwargs):
+        """Run a blocking web3 call on the gateway executor"""
+        queued = time.perf_counter()
+        async with self._semaphore:
+            metrics.WEB3_EXECUTOR_WAIT_SECONDS.observe(time.perf_counter() - queued)
+            metrics.WEB3_IN_FLIGHT.inc()
+            try:
+                loop = asyncio.get_running_loop()
+                # The caller's context goes along, so JSON-RPC spans nest under the current span
+                context = contextvars.copy_context()
+                return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+            finally:
+                metrics.WEB3_IN_FLIGHT.dec()
 
     def is_connected(self) -> bool:
         """Check if connected to blockchain"""
         return self.w3.is_connected()
 
+    async def is_connected_async(self) -> bool:
+        """Check if connected to blockchain without blocking the event loop"""
+        return await self._call(self.w3.is_connected)
+
     def get_accounts(self) -> list:
         """Get available accounts"""
         return self.w3.eth.accounts
@@ -59,7 +144,96 @@ class BlockchainManager:
         bid_string = json.dumps(bid_data, sort_keys=True)
         return self.w3.keccak(text=bid_string).hex()
 
-    async def submit_tender_to_blockchain(self, tender_data: Dict[str, Any], admin_address: str) -> Optional[str]:
+    async def _pending_nonce(self, address: str) -> int:
+        return await self._call(self.w3.eth.get_transaction_count, address, "pending")
+
+    async def block_number(self) -> int:
+        return await self._call(lambda: self.w3.eth.block_number)
+
+    async def transaction_known(self, tx_hash: str) -> bool:
+        """Whether the node still knows a transaction (mined or in its mempool)"""
+        from web3.exceptions import TransactionNotFound
+        try:
+            await self._call(self.w3.eth.get_transaction, tx_hash)
+            return True
+        except TransactionNotFound:
+            return False
+
+    async def send_transaction(self, contract_call, sender: str) -> str:
+        """Send a contract transaction and return its hash without waiting for it to be mined"""
+        if not self.nonces:
+            tx_hash = await self._call(contract_call.transact, {
+                'from': sender,
+                'gas': TX_GAS
+            })
+            return tx_hash.hex()
+
+        for attempt in range(NONCE_RETRIES):
+            nonce = await self.nonces.reserve(sender)
+            try:
+                tx_hash = await self._call(contract_call.transact, {
+                    'from': sender,
+                    'gas': TX_GAS,
+                    'nonce': nonce
+                })
+                return tx_hash.hex()
+            except Exception as e:
+                if is_nonce_error(e) and attempt < NONCE_RETRIES - 1:
+                    # Someone else used this nonce (another process or a replacement): start over from the node
+                    await self.nonces.resync(sender)
+                    continue
+                if not is_nonce_error(e):
+                    await self.nonces.release(sender, nonce)
+                raise
+
+    async def wait_for_receipt(self, tx_hash: str, timeout: Optional[float] = None):
+        """Poll for a transaction receipt, raising ReceiptTimeout if it is not mined in time"""
+        from web3.exceptions import TransactionNotFound
+        timeout = self.receipt_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            try:
+                receipt = await self._call(self.w3.eth.get_transaction_receipt, tx_hash)
+                metrics.WEB3_RECEIPT_WAIT_SECONDS.observe(time.monotonic() - started, "mined")
+                return receipt
+            except TransactionNotFound:
+                pass
+            if time.monotonic() >= deadline:
+                metrics.WEB3_RECEIPT_WAIT_SECONDS.observe(time.monotonic() - started, "timeout")
+                raise ReceiptTimeout(tx_hash, timeout)
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait_for_receipts(self, tx_hashes: list, from_block: int, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for a batch of transactions sent at or after `from_block` with one polling loop.
+
+        New blocks are scanned for the batch's hashes and receipts are only
+        fetched for transactions that were mined, instead of polling every hash
+        separately. Returns {tx_hash: receipt}; hashes still pending at the
+        timeout are missing from the result.
+        """
+        timeout = self.receipt_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        pending = set(tx_hashes)
+        receipts = {}
+        next_block = from_block
+        while pending:
+            latest = await self.block_number()
+            for number in range(next_block, latest + 1):
+                block = await self._call(self.w3.eth.get_block, number)
+                for mined in {tx.hex() for tx in block["transactions"]} & pending:
+                    receipts[mined] = await self._call(self.w3.eth.get_transaction_receipt, mined)
+                    pending.discard(mined)
+            next_block = latest + 1
+            if not pending or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(self.poll_interval)
+        metrics.WEB3_RECEIPT_WAIT_SECONDS.observe(time.monotonic() - started, "timeout" if pending else "mined")
+        return receipts
+
+    async def submit_tender_to_blockchain(self, tender_data: Dict[str, Any], admin_address: str) -> Optional[Dict[str, Any]]:
         """Submit tender to blockchain"""
         if not self.contract:
             return None
@@ -68,18 +242,15 @@ class BlockchainManager:
             tender_hash = self.create_tender_hash(tender_data)
 
             # Call contract function
-            tx_hash = self.contract.functions.createTender(
+            tx_hash = await self.send_transaction(self.contract.functions.createTender(
                 tender_data["title"],
                 int(tender_data["budget"]),
                 int(tender_data["deadline_timestamp"]),  # Unix timestamp
                 tender_hash
-            ).transact({
-                'from': admin_address,
-                'gas': 2000000
-            })
+            ), admin_address)
 
-            # Wait for transaction receipt
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            # The tender ID is only known once the transaction is mined
+            receipt = await self.wait_for_receipt(tx_hash)
 
             # Process the event log to get the tenderId
             log = self.contract.events.TenderCreated().process_receipt(receipt)
@@ -91,7 +262,7 @@ class BlockchainManager:
             }
 
         except Exception as e:
-            print(f"Error submitting tender to blockchain: {e}")
+            logger.error("Error submitting tender to blockchain: %s", e)
             return None
 
     async def submit_bid_to_blockchain(self, tender_id: int, bid_amount: int, bidder_address: str) -> Optional[str]:
@@ -100,30 +271,32 @@ class BlockchainManager:
             return None
 
         try:
+            latest_block = await self._call(self.w3.eth.get_block, 'latest')
             bid_data = {
                 "tender_id": tender_id,
                 "bidder_address": bidder_address,
                 "amount": bid_amount,
-                "timestamp": self.w3.eth.get_block('latest')['timestamp']
+                "timestamp": latest_block['timestamp']
             }
             bid_hash = self.create_bid_hash(bid_data)
 
             # Call contract function
-            tx_hash = self.contract.functions.submitBid(
+            tx_hash = await self.send_transaction(self.contract.functions.submitBid(
                 tender_id,
                 bid_amount,
                 bid_hash
-            ).transact({
-                'from': bidder_address,
-                'gas': 2000000
-            })
-
-            # Wait for transaction receipt
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            ), bidder_address)
+
+            # A slow block should not fail the bid: fall back to the pending tx hash
+            try:
+                receipt = await self.wait_for_receipt(tx_hash)
+            except ReceiptTimeout as e:
+                logger.warning("Bid transaction still pending: %s", e)
+                return tx_hash
             return receipt.transactionHash.hex()
 
         except Exception as e:
-            print(f"Error submitting bid to blockchain: {e}")
+            logger.error("Error submitting bid to blockchain: %s", e)
             return None
 
     async def close_tender_on_blockchain(self, tender_id: int, admin_address: str) -> Optional[str]:
@@ -132,16 +305,17 @@ class BlockchainManager:
             return None
 
         try:
-            tx_hash = self.contract.functions.closeTender(tender_id).transact({
-                'from': admin_address,
-                'gas': 2000000
-            })
+            tx_hash = await self.send_transaction(self.contract.functions.closeTender(tender_id), admin_address)
 
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            try:
+                receipt = await self.wait_for_receipt(tx_hash)
+            except ReceiptTimeout as e:
+                logger.warning("Close transaction still pending: %s", e)
+                return tx_hash
             return receipt.transactionHash.hex()
 
         except Exception as e:
-            print(f"Error closing tender on blockchain: {e}")
+            logger.error("Error closing tender on blockchain: %s", e)
             return None
 
     async def evaluate_bids_on_blockchain(self, tender_id: int, admin_address: str) -> Optional[Dict[str, Any]]:
@@ -150,44 +324,64 @@ class BlockchainManager:
             return None
 
         try:
-            # First check if there are bids for this tender
-            bids = self.contract.functions.getTenderBids(tender_id).call()
-            if len(bids) == 0:
-                print(f"No bids found for tender {tender_id}")
+            # First check if there are bids for this tender (from the event index, not a view call)
+            import indexer
+            from database import get_database
+            if not await indexer.has_bids(get_database(), tender_id):
+                logger.info("No bids found for tender %s", tender_id)
                 return None
 
             # Evaluate the bids to determine winner
-            tx_hash = self.contract.functions.evaluateBids(tender_id).transact({
-                'from': admin_address,
-                'gas': 2000000
-            })
+            tx_hash = await self.send_transaction(self.contract.functions.evaluateBids(tender_id), admin_address)
 
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = await self.wait_for_receipt(tx_hash)
 
-            # Get winner info from contract using getWinningBid
-            winning_bid = self.contract.functions.getWinningBid(tender_id).call()
+            # Winner info comes from the WinnerDeclared event in the receipt
+            winner = self.contract.events.WinnerDeclared().process_receipt(receipt)[0]['args']
 
             return {
-                "winner_address": winning_bid[1],  # bidder address
-                "winning_amount": winning_bid[2],  # amount
+                "winner_address": winner['winner'],
+                "winning_amount": winner['winningAmount'],
                 "tx_hash": receipt.transactionHash.hex()
             }
 
         except Exception as e:
-            print(f"Error evaluating bids on blockchain: {e}")
+            logger.error("Error evaluating bids on blockchain: %s", e)
             return None
 
-    def get_tender_bids_from_blockchain(self, tender_id: int) -> list:
-        """Get bids for a tender from blockchain"""
-        if not self.contract:
-            return []
-
-        try:
-            bids = self.contract.functions.getTenderBids(tender_id).call()
-            return bids
-        except Exception as e:
-            print(f"Error getting bids from blockchain: {e}")
-            return []
-
-# Global blockchain manager instance
-blockchain_manager = BlockchainManager()
+_manager: Optional[BlockchainManager] = None
+_manager_lock = threading.Lock()
+
+def get_blockchain_manager() -> BlockchainManager:
+    """
+    The process's blockchain manager, created on first use. Each API worker
+    (forked or spawned) builds its own web3 provider and thread pool instead
+    of inheriting ones created before the fork.
+    """
+    global _manager
+    if _manager is None:
+        # warm_up() may be building it on a thread while a request asks for it
+        with _manager_lock:
+            if _manager is None:
+                _manager = BlockchainManager()
+    return _manager
+
+async def warm_up():
+    """Import web3 and build the manager on a thread, so the first request does not pay for it on the event loop"""
+    try:
+        await asyncio.to_thread(get_blockchain_manager)
+    except Exception as e:
+        logger.error("Could not initialize the blockchain manager: %s", e)
+
+def set_blockchain_manager(manager: Optional[BlockchainManager]) -> Optional[BlockchainManager]:
+    """Replace the process's manager (e.g. with one on a local test chain); returns the previous one"""
+    global _manager
+    previous, _manager = _manager, manager
+    return previous
+
+def close_blockchain_manager():
+    """Release the manager's thread pool at shutdown"""
+    global _manager
+    if _manager is not None:
+        _manager._executor.shutdown(wait=False)
+        _manager = None
@@ -0,0 +1,146 @@
+"""
+Small caches with hit/miss counters.
+
+By default every cache lives in process memory (LRU with a TTL). Setting
+CACHE_URL=redis://... switches them to a shared Redis backend, so all API
+workers see the same entries and an invalidation in one worker applies to all
+of them. Redis support needs the optional `redis` package.
+
+Values must be JSON-serialisable dicts/lists when a shared backend is used.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_registry: Dict[str, "BaseCache"] = {}
+
+class BaseCache:
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class TTLCache(BaseCache):
+    """In-process LRU cache whose entries expire `ttl` seconds after they are set"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        super().__init__(name, ttl)
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                return self._count(value)
+            del self._data[key]
+        return self._count(None)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Increment a counter; the window (TTL) starts with the first increment"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            await self.set(key, 1, ttl)
+            return 1
+        expires_at, value = entry
+        self._data[key] = (expires_at, value + 1)
+        return value + 1
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "size": len(self._data), "backend": "memory"}
+
+class RedisCache(BaseCache):
+    """Cache shared by all workers through Redis; entries expire through Redis TTLs"""
+
+    def __init__(self, name: str, url: str, ttl: float):
+        super().__init__(name, ttl)
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL is set but the 'redis' package is not installed")
+        self._redis = redis.from_url(url)
+        self._prefix = f"etender:{name}:"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self._prefix + key)
+        return self._count(json.loads(raw) if raw is not None else None)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        await self._redis.set(self._prefix + key, json.dumps(value, default=str), px=max(ttl_ms, 1))
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Increment a counter; the window (TTL) starts with the first increment"""
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self._prefix + key)
+            pipe.pexpire(self._prefix + key, max(ttl_ms, 1), nx=True)
+            value, _ = await pipe.execute()
+        return value
+
+    async def delete(self, key: str):
+        await self._redis.delete(self._prefix + key)
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=self._prefix + "*"):
+            await self._redis.delete(key)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "backend": "redis"}
+
+    async def ping(self):
+        await self._redis.ping()
+
+def shared_backend() -> bool:
+    return bool(os.getenv("CACHE_URL"))
+
+async def ping():
+    """Raise if the shared cache backend is unreachable (no-op for in-process caches)"""
+    for cache in _registry.values():
+        if isinstance(cache, RedisCache):
+            # Every cache shares the one CACHE_URL
+            await cache.ping()
+            return
+
+def make_cache(name: str, maxsize: int, ttl: float) -> BaseCache:
+    """Create (and register for stats) a cache using the configured backend"""
+    url = os.getenv("CACHE_URL")
+    cache = RedisCache(name, url, ttl) if url else TTLCache(name, maxsize, ttl)
+    _registry[name] = cache
+    return cache
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -1,10 +1,81 @@
-from pymongo import MongoClient
+from contextlib import asynccontextmanager
+from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
+import metrics
+import tracing
 
 load_dotenv()
 
+DATABASE_NAME = os.getenv("MONGODB_DATABASE", "e_tendering")
+
+_client = None
+_transactions_supported = None
+
+def _client_options():
+    """Connection pool settings, overridable through environment variables"""
+    return {
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000")),
+        "waitQueueTimeoutMS": int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+        "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000")),
+        "socketTimeoutMS": int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "30000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "readPreference": os.getenv("MONGODB_READ_PREFERENCE", "primary"),
+    }
+
+def connect():
+    """Create the process-wide async client (and its connection pool) if it does not exist yet"""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            os.getenv("MONGODB_URI"), event_listeners=[*metrics.mongo_listeners(), tracing.MongoTracingListener()], **_client_options()
+        )
+    return _client
+
+def close():
+    """Close the process-wide client and release its pooled connections"""
+    global _client, _transactions_supported
+    if _client is not None:
+        _client.close()
+        _client = None
+    _transactions_supported = None
+
 def get_database():
-    client = MongoClient(os.getenv("MONGODB_URI"))
-    return client["e_tendering"]
+    return connect()[DATABASE_NAME]
+
+def get_db():
+    """FastAPI dependency returning the shared database handle"""
+    return get_database()
+
+async def supports_transactions():
+    """Whether multi-document transactions are available (replica set or sharded cluster)"""
+    global _transactions_supported
+    mode = os.getenv("MONGODB_TRANSACTIONS", "auto").lower()
+    if mode in ("true", "1", "yes"):
+        return True
+    if mode in ("false", "0", "no"):
+        return False
+    if _transactions_supported is None:
+        try:
+            hello = await connect().admin.command("hello")
+            _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+@asynccontextmanager
+async def transaction():
+    """
+    Yield a session whose writes commit atomically.
 
+    On a standalone mongod (no transaction support) this yields None, and
+    operations passed session=None simply run one after another.
+    """
+    if not await supports_transactions():
+        yield None
+        return
+    async with await connect().start_session() as session:
+        async with session.start_transaction():
+            yield session
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for running the API on every core:
+
+    pip install gunicorn
+    gunicorn main:app -c gunicorn.conf.py
+
+Each worker imports the app and runs its lifespan on its own, so MongoDB,
+web3 and Redis clients are created per worker after the fork. Set CACHE_URL
+so caches, login throttling and notification streams are shared between
+workers.
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# Inherited by the workers, so each knows it is one of several
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Importing the app in the master would create clients that every fork then shares
+preload_app = False
+
+# Each worker fails readiness for HEALTH_DRAIN_SECONDS after SIGTERM, then finishes
+# its in-flight requests; both have to fit in the graceful timeout
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
@@ -0,0 +1,111 @@
+"""
+Liveness and readiness for orchestrators and load balancers.
+
+  GET /health/live   the worker's event loop is serving requests; no I/O, so a
+                     slow dependency never gets a healthy worker restarted
+  GET /health/ready  every dependency this worker needs answers within
+                     HEALTH_CHECK_TIMEOUT: MongoDB, the shared cache (when
+                     CACHE_URL is set) and a writable UPLOAD_DIR. 503 otherwise,
+                     and from the moment shutdown begins, so traffic drains
+                     before the worker exits.
+
+The blockchain node is reported but only fails readiness with
+HEALTH_REQUIRE_BLOCKCHAIN=true: requests queue on-chain work in the outbox,
+so the API keeps serving while the node is down.
+
+On SIGTERM (sent by Kubernetes, systemd or the Gunicorn master) the worker
+starts failing readiness at once but keeps accepting requests for
+HEALTH_DRAIN_SECONDS. Only then does the server stop listening and finish
+in-flight requests, so load balancers have time to take the worker out of
+rotation.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+import cache
+import database
+import storage
+from blockchain import get_blockchain_manager
+
+CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+REQUIRE_BLOCKCHAIN = os.getenv("HEALTH_REQUIRE_BLOCKCHAIN", "false").lower() == "true"
+DRAIN_SECONDS = float(os.getenv("HEALTH_DRAIN_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+# Set when the worker is told to shut down
+draining = False
+
+def drain_on_signal(sig: int = signal.SIGTERM) -> bool:
+    """
+    Put our handler in front of the server's handler for `sig`. Our handler sets
+    `draining` and passes the signal on DRAIN_SECONDS later; a second signal is
+    passed on at once. Call this from the lifespan, after uvicorn has installed its
+    handlers. Returns False when there is no server handler to delay, e.g. under
+    TestClient or on Windows.
+    """
+    loop = asyncio.get_running_loop()
+    # asyncio has no public way to read an installed handler
+    server_handler = getattr(loop, "_signal_handlers", {}).get(sig)
+    if server_handler is None:
+        return False
+
+    def on_signal():
+        global draining
+        if draining:
+            server_handler._run()
+            return
+        draining = True
+        logger.info("Received %s: failing readiness for %ss before shutting down", signal.Signals(sig).name, DRAIN_SECONDS)
+        loop.call_later(DRAIN_SECONDS, server_handler._run)
+
+    try:
+        loop.add_signal_handler(sig, on_signal)
+    except (NotImplementedError, RuntimeError):
+        return False
+    return True
+
+async def _mongodb():
+    await database.connect().admin.command("ping")
+
+async def _cache():
+    await cache.ping()
+
+async def _uploads():
+    if not os.access(storage.UPLOAD_DIR, os.W_OK):
+        raise RuntimeError(f"{storage.UPLOAD_DIR} is not writable")
+
+async def _blockchain():
+    # Off the loop: the first call builds the manager and imports web3
+    manager = await asyncio.to_thread(get_blockchain_manager)
+    if not await manager.is_connected_async():
+        raise RuntimeError("node unreachable")
+
+async def _run(check) -> dict:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), CHECK_TIMEOUT)
+        result = {"ok": True}
+    except asyncio.TimeoutError:
+        result = {"ok": False, "error": f"no answer within {CHECK_TIMEOUT}s"}
+    except Exception as e:
+        result = {"ok": False, "error": str(e) or type(e).__name__}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+async def readiness() -> dict:
+    """Run every check concurrently; `ready` is False if a required one failed"""
+    checks = {"mongodb": _mongodb, "uploads": _uploads, "blockchain": _blockchain}
+    if cache.shared_backend():
+        checks["cache"] = _cache
+    results = dict(zip(checks, await asyncio.gather(*(_run(check) for check in checks.values()))))
+    required = [name for name in results if name != "blockchain" or REQUIRE_BLOCKCHAIN]
+    return {
+        "ready": not draining and all(results[name]["ok"] for name in required),
+        "draining": draining,
+        "shared_state": "redis" if cache.shared_backend() else "per-process",
+        "checks": results,
+    }
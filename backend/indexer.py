@@ -0,0 +1,278 @@
+"""
+Event-log indexer mirroring TenderContract state into Mongo.
+
+The indexer walks the chain in block ranges, decodes TenderCreated,
+BidSubmitted, TenderClosed and WinnerDeclared logs and maintains a local
+projection:
+
+  chain_events       every decoded log, keyed by "<tx hash>:<log index>"
+  chain_tenders      one document per on-chain tender (_id = tender id)
+  chain_bids         one document per on-chain bid, in contract array order
+  chain_checkpoints  last indexed block and the hashes of recent blocks
+
+Lookups such as whether a tender has bids then hit indexed collections
+instead of a JSON-RPC view call per request.
+
+TenderCreated and BidSubmitted do not carry the title, budget, deadline or bid
+amount. They are read from the emitting transaction's call data when it is a
+direct call to the contract, and otherwise (a multicall, a proxy, another
+contract) from the contract's state at the log's block. An event that still
+cannot be decoded is logged and skipped, so it never stalls the range.
+
+Blocks are only indexed once INDEXER_CONFIRMATIONS blocks have been built on
+top of them. If a reorg still replaces an indexed block, the indexer finds the
+last checkpoint hash that is still canonical, deletes the events above it and
+rebuilds the affected tenders from the events that remain.
+"""
+
+import asyncio
+import logging
+import os
+from eth_utils import event_abi_to_log_topic
+from pymongo import ASCENDING, UpdateOne
+from web3.exceptions import Web3Exception
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "chain_events"
+TENDERS_COLLECTION = "chain_tenders"
+BIDS_COLLECTION = "chain_bids"
+CHECKPOINTS_COLLECTION = "chain_checkpoints"
+
+START_BLOCK = int(os.getenv("INDEXER_START_BLOCK", "0"))
+BATCH_BLOCKS = int(os.getenv("INDEXER_BATCH_BLOCKS", "500"))
+CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "0"))
+REORG_DEPTH = int(os.getenv("INDEXER_REORG_DEPTH", "64"))
+POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", "2"))
+
+INDEXED_EVENTS = ("TenderCreated", "BidSubmitted", "TenderClosed", "WinnerDeclared")
+
+async def ensure_indexes(db):
+    await db[BIDS_COLLECTION].create_index(
+        [("tender_id", ASCENDING), ("block_number", ASCENDING), ("log_index", ASCENDING)], name="tender_order"
+    )
+    await db[EVENTS_COLLECTION].create_index(
+        [("tender_id", ASCENDING), ("block_number", ASCENDING), ("log_index", ASCENDING)], name="tender_order"
+    )
+    await db[EVENTS_COLLECTION].create_index([("block_number", ASCENDING)], name="block_number")
+
+def _event_topics(contract) -> dict:
+    """topic0 -> contract event class for the events we index"""
+    topics = {}
+    for abi in contract.abi:
+        if abi.get("type") == "event" and abi["name"] in INDEXED_EVENTS:
+            topics[event_abi_to_log_topic(abi)] = contract.events[abi["name"]]
+    return topics
+
+async def _call_params(manager, log, function_name: str):
+    """Arguments of the direct contract call that emitted `log`, or None if the transaction called anything else"""
+    tx = await manager._call(manager.w3.eth.get_transaction, log["transactionHash"])
+    if (tx.get("to") or "").lower() != manager.contract_address.lower():
+        return None
+    try:
+        function, params = manager.contract.decode_function_input(tx.get("input") or tx.get("data"))
+    except Exception:
+        # Not one of this contract's functions, or malformed call data
+        return None
+    return params if function.fn_name == function_name else None
+
+async def _tender_fields(manager, log, args) -> dict:
+    params = await _call_params(manager, log, "createTender")
+    if params is not None:
+        return {"title": params["_title"], "budget": params["_budget"], "deadline": params["_deadline"]}
+    tender = await manager._call(
+        manager.contract.functions.tenders(args["tenderId"]).call, block_identifier=log["blockNumber"]
+    )
+    # (id, title, budget, deadline, admin, isActive, tenderHash)
+    return {"title": tender[1], "budget": tender[2], "deadline": tender[3]}
+
+async def _bid_fields(manager, log, args, block_timestamps: dict) -> dict:
+    params = await _call_params(manager, log, "submitBid")
+    if params is not None:
+        if log["blockNumber"] not in block_timestamps:
+            block = await manager._call(manager.w3.eth.get_block, log["blockNumber"])
+            block_timestamps[log["blockNumber"]] = block["timestamp"]
+        return {"amount": params["_amount"], "timestamp": block_timestamps[log["blockNumber"]]}
+    bids = await manager._call(
+        manager.contract.functions.getTenderBids(args["tenderId"]).call, block_identifier=log["blockNumber"]
+    )
+    # (tenderId, bidder, amount, bidHash, timestamp); the newest match is this log's bid
+    for _, bidder, amount, bid_hash, timestamp in reversed(bids):
+        if bidder == args["bidder"] and "0x" + bid_hash.hex() == args["bidHash"]:
+            return {"amount": amount, "timestamp": timestamp}
+    raise ValueError(f"bid {args['bidHash']} is not in the contract's state")
+
+async def _decode_logs(manager, logs) -> list:
+    """Decode raw logs into event documents, skipping (and logging) any that cannot be decoded"""
+    topics = _event_topics(manager.contract)
+    block_timestamps = {}
+    events = []
+    for log in logs:
+        event_class = topics.get(bytes(log["topics"][0]))
+        if event_class is None:
+            continue
+        decoded = event_class().process_log(log)
+        args = dict(decoded["args"])
+        for key, value in args.items():
+            if isinstance(value, bytes):
+                args[key] = "0x" + value.hex()
+
+        # TenderCreated and BidSubmitted do not carry every field of the contract's structs
+        try:
+            if decoded["event"] == "TenderCreated":
+                args.update(await _tender_fields(manager, log, args))
+            elif decoded["event"] == "BidSubmitted":
+                args.update(await _bid_fields(manager, log, args, block_timestamps))
+        except (ValueError, KeyError, Web3Exception) as e:
+            logger.error(
+                "Skipping %s log %s:%s that could not be decoded: %s",
+                decoded["event"], log["transactionHash"].hex(), log["logIndex"], e
+            )
+            continue
+
+        tx_hash = log["transactionHash"].hex()
+        events.append({
+            "_id": f"{tx_hash}:{log['logIndex']}",
+            "event": decoded["event"],
+            "tender_id": args["tenderId"],
+            "args": args,
+            "block_number": log["blockNumber"],
+            "block_hash": log["blockHash"].hex(),
+            "tx_hash": tx_hash,
+            "log_index": log["logIndex"]
+        })
+    return events
+
+def _projection_updates(event) -> list:
+    """(collection, UpdateOne) pairs applying one event to the projection; safe to re-apply"""
+    args = event["args"]
+    tender_id = event["tender_id"]
+    if event["event"] == "TenderCreated":
+        return [(TENDERS_COLLECTION, UpdateOne({"_id": tender_id}, {"$set": {
+            "admin": args["admin"],
+            "tender_hash": args["tenderHash"],
+            "title": args["title"],
+            "budget": args["budget"],
+            "deadline": args["deadline"],
+            "is_active": True,
+            "block_number": event["block_number"],
+            "tx_hash": event["tx_hash"]
+        }}, upsert=True))]
+    if event["event"] == "BidSubmitted":
+        return [(BIDS_COLLECTION, UpdateOne({"_id": event["_id"]}, {"$set": {
+            "tender_id": tender_id,
+            "bidder": args["bidder"],
+            "amount": args["amount"],
+            "bid_hash": args["bidHash"],
+            "timestamp": args["timestamp"],
+            "block_number": event["block_number"],
+            "log_index": event["log_index"],
+            "tx_hash": event["tx_hash"]
+        }}, upsert=True))]
+    if event["event"] == "TenderClosed":
+        return [(TENDERS_COLLECTION, UpdateOne({"_id": tender_id}, {"$set": {"is_active": False}}))]
+    if event["event"] == "WinnerDeclared":
+        return [(TENDERS_COLLECTION, UpdateOne({"_id": tender_id}, {"$set": {
+            "winner": args["winner"],
+            "winning_amount": args["winningAmount"],
+            "evaluation_tx_hash": event["tx_hash"]
+        }}))]
+    return []
+
+async def _apply_events(db, events: list):
+    if not events:
+        return
+    await db[EVENTS_COLLECTION].bulk_write(
+        [UpdateOne({"_id": event["_id"]}, {"$set": event}, upsert=True) for event in events], ordered=True
+    )
+    batches = {}
+    for event in events:
+        for collection, update in _projection_updates(event):
+            batches.setdefault(collection, []).append(update)
+    # Event order matters (a tender is created before it is closed), so write in order
+    for collection in (TENDERS_COLLECTION, BIDS_COLLECTION):
+        if collection in batches:
+            await db[collection].bulk_write(batches[collection], ordered=True)
+
+async def _rollback(db, checkpoint_id: str, ancestor: dict, recent: list):
+    """Forget everything indexed above the last block that is still canonical"""
+    block_number = ancestor["number"]
+    affected = await db[EVENTS_COLLECTION].distinct("tender_id", {"block_number": {"$gt": block_number}})
+    await db[EVENTS_COLLECTION].delete_many({"block_number": {"$gt": block_number}})
+    await db[BIDS_COLLECTION].delete_many({"block_number": {"$gt": block_number}})
+
+    for tender_id in affected:
+        await db[TENDERS_COLLECTION].delete_one({"_id": tender_id})
+        remaining = await db[EVENTS_COLLECTION].find({"tender_id": tender_id}).sort(
+            [("block_number", ASCENDING), ("log_index", ASCENDING)]
+        ).to_list(length=None)
+        await _apply_events(db, remaining)
+
+    await db[CHECKPOINTS_COLLECTION].update_one({"_id": checkpoint_id}, {"$set": {
+        "block_number": block_number,
+        "recent": [entry for entry in recent if entry["number"] <= block_number]
+    }})
+    logger.warning("Chain reorg detected: rolled back index to block %s (%s tenders affected)", block_number, len(affected))
+
+async def _find_canonical_ancestor(manager, recent: list):
+    """Newest checkpointed block whose hash still matches the chain, or None if none do"""
+    for entry in reversed(recent):
+        block = await manager._call(manager.w3.eth.get_block, entry["number"])
+        if block["hash"].hex() == entry["hash"]:
+            return entry
+    return None
+
+async def sync_once(db, manager) -> bool:
+    """Index the next block range; returns True once the index has caught up with the chain"""
+    checkpoint_id = manager.contract_address
+    checkpoint = await db[CHECKPOINTS_COLLECTION].find_one({"_id": checkpoint_id}) or {
+        "block_number": START_BLOCK - 1, "recent": []
+    }
+    recent = checkpoint["recent"]
+
+    if recent:
+        ancestor = await _find_canonical_ancestor(manager, recent)
+        if ancestor is None:
+            ancestor = {"number": START_BLOCK - 1}
+        if ancestor["number"] < checkpoint["block_number"]:
+            await _rollback(db, checkpoint_id, ancestor, recent)
+            return False
+
+    target = await manager.block_number() - CONFIRMATIONS
+    from_block = checkpoint["block_number"] + 1
+    if target < from_block:
+        return True
+    to_block = min(target, from_block + BATCH_BLOCKS - 1)
+
+    logs = await manager._call(manager.w3.eth.get_logs, {
+        "address": manager.contract_address, "fromBlock": from_block, "toBlock": to_block
+    })
+    events = await _decode_logs(manager, logs)
+    await _apply_events(db, events)
+
+    block = await manager._call(manager.w3.eth.get_block, to_block)
+    recent = (recent + [{"number": to_block, "hash": block["hash"].hex()}])[-REORG_DEPTH:]
+    await db[CHECKPOINTS_COLLECTION].update_one(
+        {"_id": checkpoint_id}, {"$set": {"block_number": to_block, "recent": recent}}, upsert=True
+    )
+    return to_block >= target
+
+async def run_indexer(db, manager, stop: asyncio.Event = None):
+    """Keep the projection in sync with the chain until `stop` is set"""
+    stop = stop or asyncio.Event()
+    await ensure_indexes(db)
+    while not stop.is_set():
+        caught_up = True
+        if manager.contract:
+            try:
+                caught_up = await sync_once(db, manager)
+            except Exception as e:
+                logger.warning("Indexer sync failed: %s", e)
+        if caught_up:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+async def has_bids(db, tender_id: int) -> bool:
+    return await db[BIDS_COLLECTION].find_one({"tender_id": tender_id}, {"_id": 1}) is not None
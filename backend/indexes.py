@@ -0,0 +1,189 @@
+"""
+Indexes required by the API's queries, and a small tool to manage them.
+
+Each entry in INDEXES is (collection, keys, options). ensure_indexes() creates
+any that are missing and is safe to run on every startup; an index whose
+definition changed is reported (or rebuilt with --rebuild) instead of failing
+the whole run.
+
+QUERY_SHAPES lists the filters/sorts the routes actually issue. explain_queries()
+runs `explain` on each of them and reports the index the planner picked, so a
+query that falls back to a collection scan or sorts in memory is caught before
+it reaches production. tests/test_indexes.py runs the same check against a
+scratch database:
+
+    python indexes.py apply [--rebuild]
+    python indexes.py explain        # exits 1 on a COLLSCAN or in-memory SORT
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from notification_retention import ARCHIVE_COLLECTION, READ_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    # Login looks users up by username or email; both must be unique
+    ("users", [("username", ASCENDING)], {"name": "username_unique", "unique": True}),
+    ("users", [("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    # GET /tenders: newest first, optionally narrowed by status or admin
+    ("tenders", [("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "created_desc"}),
+    ("tenders", [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "status_created_desc"}),
+    ("tenders", [("admin_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "admin_created_desc"}),
+    # Deadline scheduler: published tenders by deadline
+    ("tenders", [("status", ASCENDING), ("deadline", ASCENDING)], {"name": "status_deadline"}),
+    # GET /bids/all, bids of a tender, a bidder's bids
+    ("bids", [("submitted_at", DESCENDING), ("_id", DESCENDING)], {"name": "submitted_desc"}),
+    ("bids", [("tender_id", ASCENDING), ("submitted_at", DESCENDING), ("_id", DESCENDING)], {"name": "tender_submitted_desc"}),
+    ("bids", [("bidder_id", ASCENDING), ("submitted_at", DESCENDING), ("_id", DESCENDING)], {"name": "bidder_submitted_desc"}),
+    # Idempotent bid submission: one bid per bidder and Idempotency-Key
+    ("bids", [("bidder_id", ASCENDING), ("idempotency_key", ASCENDING)], {
+        "name": "bidder_idempotency_unique", "unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}
+    }),
+    # Evaluation ranks a tender's bids by amount, earliest first on ties
+    ("bids", [("tender_id", ASCENDING), ("amount", ASCENDING), ("submitted_at", ASCENDING), ("_id", ASCENDING)],
+     {"name": "tender_amount_ranked"}),
+    # A user's notifications, all or unread only, newest first (keyset pages on created_at, _id)
+    ("notifications", [("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+     {"name": "user_read_created"}),
+    ("notifications", [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+    # Archival walks the oldest notifications first
+    ("notifications", [("created_at", ASCENDING)], {"name": "created"}),
+    # Lifecycle fan-out: at most one notification per recipient and job, so a resumed job cannot duplicate
+    ("notifications", [("job_id", ASCENDING), ("user_id", ASCENDING)], {
+        "name": "job_recipient_unique", "unique": True, "partialFilterExpression": {"job_id": {"$exists": True}}
+    }),
+    ("notification_jobs", [("status", ASCENDING), ("lease_expires_at", ASCENDING)], {"name": "status_lease"}),
+    # Archived notifications are read one user and month at a time
+    (ARCHIVE_COLLECTION, [("user_id", ASCENDING), ("month", DESCENDING), ("count", ASCENDING)], {"name": "user_month"}),
+]
+
+if READ_TTL_SECONDS > 0:
+    # Read notifications expire READ_TTL_SECONDS after they were read
+    INDEXES.append(("notifications", [("read_at", ASCENDING)], {
+        "name": "read_ttl", "expireAfterSeconds": READ_TTL_SECONDS, "partialFilterExpression": {"is_read": True}
+    }))
+
+_SAMPLE = str(ObjectId())
+
+# name -> (collection, filter, sort) for the queries issued by the routes
+QUERY_SHAPES = {
+    "login": ("users", {"$or": [{"username": _SAMPLE}, {"email": _SAMPLE}]}, None),
+    "user_by_username": ("users", {"username": _SAMPLE}, None),
+    "tenders_list": ("tenders", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    "tenders_by_status": ("tenders", {"status": "published"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    "tenders_by_admin": ("tenders", {"admin_id": _SAMPLE}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    "tenders_due": ("tenders", {"status": "published", "deadline": {"$lte": datetime(2000, 1, 1)}}, [("deadline", ASCENDING)]),
+    "bids_list": ("bids", {}, [("submitted_at", DESCENDING), ("_id", DESCENDING)]),
+    "bids_for_tender": ("bids", {"tender_id": _SAMPLE}, [("submitted_at", DESCENDING), ("_id", DESCENDING)]),
+    "bids_for_tender_and_bidder": ("bids", {"tender_id": _SAMPLE, "bidder_id": _SAMPLE}, [("submitted_at", DESCENDING), ("_id", DESCENDING)]),
+    "bids_of_bidder": ("bids", {"bidder_id": _SAMPLE}, [("submitted_at", DESCENDING), ("_id", DESCENDING)]),
+    "bids_ranking": ("bids", {"tender_id": _SAMPLE, "status": {"$ne": "rejected"}, "amount": {"$gt": 0}},
+                     [("amount", ASCENDING), ("submitted_at", ASCENDING), ("_id", ASCENDING)]),
+    "notifications_list": ("notifications", {"user_id": _SAMPLE}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    "notifications_unread": ("notifications", {"user_id": _SAMPLE, "is_read": False}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    "notifications_count": ("notifications", {"user_id": _SAMPLE}, None),
+    "notifications_to_archive": ("notifications", {"created_at": {"$lt": datetime(2000, 1, 1)}}, [("created_at", ASCENDING)]),
+    "notification_archive_month": (ARCHIVE_COLLECTION, {"user_id": _SAMPLE, "month": "2000-01"}, None),
+}
+
+def _same_definition(existing: dict, keys: list, options: dict) -> bool:
+    existing_keys = [(field, int(direction)) for field, direction in existing["key"]]
+    return (
+        existing_keys == list(keys)
+        and bool(existing.get("unique")) == bool(options.get("unique"))
+        and existing.get("expireAfterSeconds") == options.get("expireAfterSeconds")
+        # A partial index with another filter serves (and constrains) different documents
+        and (existing.get("partialFilterExpression") or {}) == (options.get("partialFilterExpression") or {})
+    )
+
+async def ensure_indexes(db, rebuild: bool = False) -> list:
+    """Create missing indexes; returns (collection, name, outcome) for every declared index"""
+    report = []
+    existing_by_collection = {}
+    for collection, keys, options in INDEXES:
+        if collection not in existing_by_collection:
+            existing_by_collection[collection] = await db[collection].index_information()
+        existing = existing_by_collection[collection].get(options["name"])
+
+        if existing is not None and _same_definition(existing, keys, options):
+            report.append((collection, options["name"], "exists"))
+            continue
+        if existing is not None:
+            if not rebuild:
+                logger.warning("Index %s.%s differs from its declaration; rebuild it with `python indexes.py apply --rebuild`",
+                               collection, options["name"])
+                report.append((collection, options["name"], "changed (run with --rebuild)"))
+                continue
+            await db[collection].drop_index(options["name"])
+
+        try:
+            await db[collection].create_index(keys, **options)
+            report.append((collection, options["name"], "rebuilt" if existing is not None else "created"))
+        except OperationFailure as e:
+            # e.g. duplicate usernames in old data blocking a unique index
+            logger.error("Could not create index %s.%s: %s", collection, options["name"], e)
+            report.append((collection, options["name"], f"failed: {e}"))
+    return report
+
+def _plan_summary(plan: dict) -> tuple:
+    """(stages, index names) used by a winning plan, walking nested input stages"""
+    stages, index_names = [], []
+    stack = [plan]
+    while stack:
+        stage = stack.pop()
+        stages.append(stage.get("stage"))
+        if stage.get("indexName"):
+            index_names.append(stage["indexName"])
+        if "inputStage" in stage:
+            stack.append(stage["inputStage"])
+        stack.extend(stage.get("inputStages", []))
+    return stages, index_names
+
+async def explain_query(db, collection: str, query: dict, sort: list = None) -> tuple:
+    """(stages, index names) of the winning plan for one query shape"""
+    command = {"find": collection, "filter": query}
+    if sort:
+        command["sort"] = dict(sort)
+    explained = await db.command("explain", command, verbosity="queryPlanner")
+    plan = explained["queryPlanner"]["winningPlan"]
+    # Servers using the slot-based engine nest the classic plan under queryPlan
+    return _plan_summary(plan.get("queryPlan", plan))
+
+async def explain_queries(db) -> list:
+    """(shape name, collection, index names, uses_collscan, sorts_in_memory) for every entry in QUERY_SHAPES"""
+    results = []
+    for name, (collection, query, sort) in QUERY_SHAPES.items():
+        stages, index_names = await explain_query(db, collection, query, sort)
+        results.append((name, collection, index_names, "COLLSCAN" in stages, "SORT" in stages))
+    return results
+
+async def _main(args) -> int:
+    import database
+    db = database.connect()[database.DATABASE_NAME]
+    try:
+        if args.command == "apply":
+            report = await ensure_indexes(db, rebuild=args.rebuild)
+            for collection, name, outcome in report:
+                print(f"{collection:15s} {name:25s} {outcome}")
+            return 1 if any(outcome.startswith(("failed", "changed")) for _, _, outcome in report) else 0
+
+        results = await explain_queries(db)
+        for name, collection, index_names, collscan, in_memory_sort in results:
+            used = "COLLSCAN" if collscan else ", ".join(index_names) or "-"
+            print(f"{name:28s} {collection:15s} {used}{' + SORT' if in_memory_sort else ''}")
+        return 1 if any(collscan or in_memory_sort for *_, collscan, in_memory_sort in results) else 0
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check that route queries use them")
+    parser.add_argument("command", choices=["apply", "explain"])
+    parser.add_argument("--rebuild", action="store_true", help="drop and recreate indexes whose definition changed")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -1,21 +1,72 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from database import get_database
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import cache
+import database
+import health
+import indexes
+import metrics
+import notification_hub
+import notifier
+import outbox
+import response_cache
+import scheduler
+import storage
+import tracing
+from cache import cache_stats
 from routes.auth import router as auth_router
 from routes.tenders import router as tenders_router
 from routes.bids import router as bids_router
 from routes.notifications import router as notifications_router
-from blockchain import blockchain_manager
+from routes.documents import router as documents_router
+from blockchain import close_blockchain_manager, warm_up as warm_up_blockchain
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="E-Tendering System API", version="1.0.0")
-@app.api_route("/health", methods=["GET", "HEAD"])
-def health():
-    return {"status": "ok"}
+logger = logging.getLogger(__name__)
+
+# API worker processes; each runs the lifespan below and builds its own clients
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    storage.ensure_upload_dir()
+    # Fail /health/ready on SIGTERM before the server stops accepting connections
+    health.drain_on_signal()
+    if WORKERS > 1 and not cache.shared_backend():
+        logger.warning("Running %s workers without CACHE_URL: caches and login throttling are per worker", WORKERS)
+    # One pooled MongoDB client per process, shared by every request
+    database.connect()
+    # web3 is imported in the background, so the worker serves requests meanwhile
+    blockchain_ready = asyncio.create_task(warm_up_blockchain())
+    loop_lag = asyncio.create_task(metrics.monitor_event_loop())
+    await indexes.ensure_indexes(database.get_database())
+    await outbox.ensure_indexes(database.get_database())
+    await notification_hub.broker.start()
+    # Finish notification fan-outs interrupted by a previous shutdown
+    resume = asyncio.create_task(notifier.resume_jobs(database.get_database()))
+    # Close tenders at their deadline (one worker at a time holds the lease)
+    stop_scheduler = asyncio.Event()
+    deadlines = asyncio.create_task(scheduler.deadline_scheduler.run(database.get_database(), stop_scheduler))
+    yield
+    # Already set on SIGTERM; also covers other ways of stopping the server
+    health.draining = True
+    stop_scheduler.set()
+    await deadlines
+    resume.cancel()
+    loop_lag.cancel()
+    await notification_hub.broker.close()
+    database.close()
+    await blockchain_ready
+    close_blockchain_manager()
+    await asyncio.to_thread(tracing.flush)
+
+app = FastAPI(title="E-Tendering System API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -24,32 +75,89 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor of the next notifications page
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Database connection
-db = get_database()
-
-# Mount static files directory for uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# The middleware added last runs first: metrics wrap tracing, and both wrap CORS and
+# the request size limit, so request timings include CORS handling, tracing overhead
+# and 413s for oversized uploads
+app.add_middleware(storage.RequestSizeLimitMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Include routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(tenders_router, prefix="/tenders", tags=["Tenders"])
 app.include_router(bids_router, prefix="/bids", tags=["Bids"])
 app.include_router(notifications_router, prefix="/notifications", tags=["Notifications"])
+app.include_router(documents_router, prefix="/documents", tags=["Documents"])
 
 @app.get("/")
 async def root():
     return {"message": "E-Tendering API", "version": "1.0.0"}
 
-@app.get("/health")
+@app.api_route("/health", methods=["GET", "HEAD"])
 async def health_check():
+    """Status summary for the admin dashboard; probes should use /health/live and /health/ready"""
+    report = await health.readiness()
     return {
-        "status": "healthy",
-        "database": "connected",
-        "blockchain": "connected" if blockchain_manager.is_connected() else "disconnected"
+        "status": "healthy" if report["ready"] else "unhealthy",
+        "database": "connected" if report["checks"]["mongodb"]["ok"] else "disconnected",
+        "blockchain": "connected" if report["checks"]["blockchain"]["ok"] else "disconnected"
     }
 
+@app.api_route("/health/live", methods=["GET", "HEAD"])
+async def liveness():
+    """The worker is up and its event loop answers"""
+    return {"status": "alive"}
+
+@app.api_route("/health/ready", methods=["GET", "HEAD"])
+async def readiness():
+    """503 unless this worker's dependencies answer (see health.py)"""
+    report = await health.readiness()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """All metrics of this worker in the Prometheus text format"""
+    queue = await outbox.get_metrics(database.get_database())
+    for status, count in queue["depth"].items():
+        metrics.OUTBOX_DEPTH.set(count, status)
+    metrics.OUTBOX_LAG.set(queue["lag_seconds"])
+    for name, stats in cache_stats().items():
+        metrics.CACHE_HITS.set(stats["hits"], name)
+        metrics.CACHE_MISSES.set(stats["misses"], name)
+    metrics.NOTIFICATION_STREAMS.set(notification_hub.hub.stats()["connections"])
+    metrics.SCHEDULER_LEADER.set(int(scheduler.deadline_scheduler.is_leader))
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/metrics/tracing")
+async def tracing_metrics():
+    """Trace sampling and export queue on this worker"""
+    return tracing.stats()
+
+@app.get("/metrics/outbox")
+async def outbox_metrics():
+    """Depth and lag of the on-chain anchoring queue"""
+    return await outbox.get_metrics(database.get_database())
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hit/miss counters of the application caches"""
+    return {**cache_stats(), "tender_responses": response_cache.stats()}
+
+@app.get("/metrics/notifications")
+async def notification_metrics():
+    """Open notification streams on this worker"""
+    return notification_hub.hub.stats()
+
+@app.get("/metrics/scheduler")
+async def scheduler_metrics():
+    """Deadline scheduler state on this worker (only the lease holder schedules)"""
+    return scheduler.deadline_scheduler.stats()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # An import string lets uvicorn start WEB_CONCURRENCY worker processes
+    uvicorn.run("main:app", host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")), workers=WORKERS)
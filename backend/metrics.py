@@ -0,0 +1,292 @@
+"""
+In-process metrics in the Prometheus text format, served at GET /metrics.
+
+Instrumented layers record into the module-level metrics below:
+
+  HTTP     MetricsMiddleware times every request up to the start of its
+           response, labelled by route template (not raw path) and status
+  MongoDB  a pymongo command listener times each command per collection; a
+           pool listener tracks checked-out connections and checkout waits
+  web3     every JSON-RPC request is timed per method at the provider, the
+           gateway executor reports its queue wait and in-flight calls, and
+           receipt waits are timed separately
+  bcrypt   in-flight and rejected password hashes
+  loop     event-loop lag, sampled by a background task
+
+Recording is a dict lookup and a few additions under a lock (pymongo events
+arrive on driver threads), so it stays cheap enough to leave on. Queue
+depths and cache counters are read when /metrics is scraped.
+"""
+
+import asyncio
+import bisect
+import os
+import threading
+import time
+from typing import Dict, Tuple
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+_lock = threading.Lock()
+_registry = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple, object] = {}
+        _registry.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with _lock:
+            series = list(self._series.items())
+        for labels, value in series:
+            lines.extend(self._render_series(labels, value))
+        return lines
+
+    def _render_series(self, labels: tuple, value) -> list:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}"]
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with _lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        with _lock:
+            self._series[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with _lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _render_series(self, labels: tuple, value) -> list:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response starts, per route template", ("method", "route", "status")
+)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled")
+
+# MongoDB
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips", ("command", "collection")
+)
+MONGO_COMMAND_FAILURES = Counter("mongodb_command_failures_total", "Failed MongoDB commands", ("command",))
+MONGO_POOL_CHECKED_OUT = Gauge("mongodb_pool_checked_out", "Connections currently checked out of the pool")
+MONGO_POOL_OPEN = Gauge("mongodb_pool_connections", "Open pooled connections")
+MONGO_POOL_WAIT_SECONDS = Histogram("mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection")
+MONGO_POOL_CHECKOUT_FAILURES = Counter("mongodb_pool_checkout_failures_total", "Failed connection checkouts", ("reason",))
+
+# web3
+WEB3_RPC_SECONDS = Histogram("web3_rpc_duration_seconds", "JSON-RPC request round trips", ("method",))
+WEB3_RPC_FAILURES = Counter("web3_rpc_failures_total", "JSON-RPC requests that raised", ("method",))
+WEB3_EXECUTOR_WAIT_SECONDS = Histogram("web3_executor_wait_seconds", "Time a web3 call waited for a gateway slot")
+WEB3_IN_FLIGHT = Gauge("web3_calls_in_flight", "web3 calls running on the gateway executor")
+WEB3_RECEIPT_WAIT_SECONDS = Histogram(
+    "web3_receipt_wait_seconds", "Time from starting to wait for receipts until they arrived", ("outcome",)
+)
+
+# bcrypt
+PASSWORD_HASH_IN_FLIGHT = Gauge("password_hash_in_flight", "Password hashes running or queued")
+PASSWORD_HASH_REJECTED = Counter("password_hash_rejected_total", "Password hashes refused with 503 (pool full)")
+
+# Event loop
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds", "How late a periodic timer fired",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+# Read at scrape time
+OUTBOX_DEPTH = Gauge("outbox_jobs", "On-chain outbox jobs by status", ("status",))
+OUTBOX_LAG = Gauge("outbox_lag_seconds", "Age of the oldest outbox job still waiting")
+CACHE_HITS = Gauge("cache_hits", "Cache hits since start", ("cache",))
+CACHE_MISSES = Gauge("cache_misses", "Cache misses since start", ("cache",))
+NOTIFICATION_STREAMS = Gauge("notification_streams", "Open notification streams on this worker")
+SCHEDULER_LEADER = Gauge("scheduler_leader", "1 if this worker holds the deadline scheduler lease")
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request until its response starts"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status):
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"], getattr(route, "path", "unmatched"), str(status)
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not recorded:
+                record(message["status"])
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not recorded:
+                record(500)
+            raise
+        finally:
+            HTTP_IN_PROGRESS.dec()
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name, collection)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name, collection)
+        MONGO_COMMAND_FAILURES.inc(event.command_name)
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        # Checkouts start and finish on the same driver thread
+        self._checkout = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_POOL_OPEN.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_OPEN.dec()
+
+    def connection_check_out_started(self, event):
+        self._checkout.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.inc(str(event.reason))
+        self._observe_wait()
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CHECKED_OUT.inc()
+        self._observe_wait()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.dec()
+
+    def _observe_wait(self):
+        started = getattr(self._checkout, "started", None)
+        if started is not None:
+            MONGO_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+            self._checkout.started = None
+
+def mongo_listeners() -> list:
+    return [MongoCommandListener(), MongoPoolListener()]
+
+def instrument_web3_provider(provider):
+    """Time every JSON-RPC request the provider makes, per method"""
+    make_request = provider.make_request
+
+    def timed_make_request(method, params):
+        start = time.perf_counter()
+        try:
+            return make_request(method, params)
+        except Exception:
+            WEB3_RPC_FAILURES.inc(str(method))
+            raise
+        finally:
+            WEB3_RPC_SECONDS.observe(time.perf_counter() - start, str(method))
+
+    provider.make_request = timed_make_request
+    return provider
+
+async def monitor_event_loop(interval: float = LOOP_LAG_INTERVAL):
+    """Sample event-loop lag until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
@@ -12,7 +12,7 @@ class User(BaseModel):
     id: Optional[str] = Field(default=None, alias="_id")
     username: str
     email: str
-    password: str
+    password: Optional[str] = None  # Unset on principals resolved from a token
     role: UserRole
     wallet_address: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -45,12 +45,19 @@ class Tender(BaseModel):
     evaluation_tx_hash: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class BidDocument(BaseModel):
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size: int
+    sha256: str
+
 class Bid(BaseModel):
     id: Optional[str] = Field(default=None, alias="_id")
     tender_id: str
     bidder_id: str
     amount: float
     documents: Optional[List[str]] = []
+    document_files: Optional[List[BidDocument]] = []  # Same order as documents
     blockchain_hash: Optional[str] = None
     blockchain_tx_hash: Optional[str] = None
     is_winner: bool = False
@@ -58,7 +65,7 @@ class Bid(BaseModel):
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
 
 class TenderResult(BaseModel):
-    id: Optional[str] = Field(alias="_id")
+    id: Optional[str] = Field(default=None, alias="_id")
     tender_id: str
     winner_bid_id: str
     winner_bidder_id: str
@@ -76,7 +83,7 @@ class NotificationType(str, Enum):
     SYSTEM = "system"
 
 class Notification(BaseModel):
-    id: Optional[str] = Field(alias="_id")
+    id: Optional[str] = Field(default=None, alias="_id")
     user_id: str
     title: str
     message: str
@@ -85,3 +92,4 @@ class Notification(BaseModel):
     related_tender_id: Optional[str] = None
     related_bid_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    read_at: Optional[datetime] = None
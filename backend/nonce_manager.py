@@ -0,0 +1,74 @@
+"""
+Local nonce allocation for transactions sent from the backend's wallets.
+
+Letting the node pick the nonce on every transact() forces one in-flight
+transaction per sender: two concurrent sends read the same pending count and
+one of them is rejected or replaced. NonceManager hands out nonces from a
+per-address counter instead, so many transactions from the same wallet can be
+pipelined into the mempool.
+"""
+
+import asyncio
+import heapq
+from typing import Awaitable, Callable, Dict, List
+
+# Substrings of JSON-RPC errors (geth, Ganache, Anvil, eth-tester) meaning the
+# nonce we used is already taken or stale
+NONCE_ERRORS = (
+    "nonce too low",
+    "already known",
+    "known transaction",
+    "replacement transaction underpriced",
+    "correct nonce",
+    "invalid nonce",
+    "invalid transaction nonce",
+)
+
+def is_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in NONCE_ERRORS)
+
+class NonceManager:
+    """Per-sender nonce counters seeded from (and resynced with) the node's pending count"""
+
+    def __init__(self, fetch_pending_nonce: Callable[[str], Awaitable[int]]):
+        self._fetch_pending_nonce = fetch_pending_nonce
+        self._next: Dict[str, int] = {}
+        self._gaps: Dict[str, List[int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _lock(self, address: str) -> asyncio.Lock:
+        if address not in self._locks:
+            self._locks[address] = asyncio.Lock()
+        return self._locks[address]
+
+    async def reserve(self, address: str) -> int:
+        """Allocate the next nonce for `address`, reusing released nonces first so no gap is left behind"""
+        async with self._lock(address):
+            gaps = self._gaps.get(address)
+            if gaps:
+                return heapq.heappop(gaps)
+            if address not in self._next:
+                self._next[address] = await self._fetch_pending_nonce(address)
+            nonce = self._next[address]
+            self._next[address] += 1
+            return nonce
+
+    async def release(self, address: str, nonce: int):
+        """Give back a nonce whose transaction the node definitely did not accept"""
+        async with self._lock(address):
+            if address not in self._next:
+                return
+            gaps = self._gaps.setdefault(address, [])
+            heapq.heappush(gaps, nonce)
+            # Released nonces at the top of the range just shrink the counter
+            while gaps and max(gaps) == self._next[address] - 1:
+                gaps.remove(self._next[address] - 1)
+                heapq.heapify(gaps)
+                self._next[address] -= 1
+
+    async def resync(self, address: str):
+        """Drop local state and trust the node again (after nonce errors, replacements or dropped transactions)"""
+        async with self._lock(address):
+            self._next[address] = await self._fetch_pending_nonce(address)
+            self._gaps.pop(address, None)
@@ -0,0 +1,172 @@
+"""
+Materialized per-user notification counters.
+
+`notification_counters` holds one document per user, {_id: user_id, total,
+unread}, adjusted with $inc by every code path that creates, reads or deletes
+notifications. GET /notifications/count then costs a single _id lookup no
+matter how long a user's history is. A user's first counter is created from a
+recount of their notifications, never from a bare $inc.
+
+If a process dies between writing a notification and adjusting its counter,
+the two drift apart. reconcile() recounts from the notifications themselves
+and repairs the counters, NOTIFICATION_COUNTER_RECONCILE_BATCH users at a time
+so a run never holds more than one batch in memory; worker.py runs it every
+NOTIFICATION_COUNTER_RECONCILE_INTERVAL seconds, and it can be run by hand:
+
+    python notification_counters.py reconcile
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_COLLECTION = "notification_counters"
+
+RECONCILE_INTERVAL = float(os.getenv("NOTIFICATION_COUNTER_RECONCILE_INTERVAL", "3600"))
+RECONCILE_BATCH = int(os.getenv("NOTIFICATION_COUNTER_RECONCILE_BATCH", "500"))
+
+async def _backfill(db, user_ids: list, session=None) -> set:
+    """
+    Create the counters of users who have none yet from a recount, and return
+    those users. Callers adjust counters after changing the notifications in the
+    same session, so the recount already includes the change and no $inc is
+    applied on top. A user with history must never start from an upserted $inc,
+    or their counts would start at the size of one delta.
+    """
+    counters = db[COUNTERS_COLLECTION]
+    existing = {counter["_id"] async for counter in counters.find({"_id": {"$in": user_ids}}, {"_id": 1}, session=session)}
+    created = set()
+    for user_id in user_ids:
+        if user_id in existing:
+            continue
+        counts = await _recount(db, user_id, session=session)
+        result = await counters.update_one({"_id": user_id}, {"$setOnInsert": counts}, upsert=True, session=session)
+        # Another request may have created it meanwhile; then the delta still applies
+        if result.upserted_id is not None:
+            created.add(user_id)
+    return created
+
+async def increment(db, user_id: str, total: int = 0, unread: int = 0, session=None):
+    if total or unread:
+        if await _backfill(db, [user_id], session=session):
+            return
+        await db[COUNTERS_COLLECTION].update_one(
+            {"_id": user_id}, {"$inc": {"total": total, "unread": unread}}, upsert=True, session=session
+        )
+
+async def increment_many(db, deltas: dict, session=None):
+    """Apply {user_id: (total, unread)} deltas with one bulk write"""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if any(delta)}
+    created = await _backfill(db, list(deltas), session=session) if deltas else set()
+    updates = [
+        UpdateOne({"_id": user_id}, {"$inc": {"total": total, "unread": unread}}, upsert=True)
+        for user_id, (total, unread) in deltas.items() if user_id not in created
+    ]
+    if updates:
+        await db[COUNTERS_COLLECTION].bulk_write(updates, ordered=False, session=session)
+
+async def _recount(db, user_id: str, session=None) -> dict:
+    total = await db["notifications"].count_documents({"user_id": user_id}, session=session)
+    unread = await db["notifications"].count_documents({"user_id": user_id, "is_read": False}, session=session)
+    return {"total": total, "unread": unread}
+
+async def reconcile_user(db, user_id: str, current: dict = None) -> dict:
+    """
+    Recount one user's notifications and store the result. The write is a
+    compare-and-set against the counter as read before counting, so an
+    increment that lands meanwhile is never overwritten; that user is simply
+    left for the next run.
+    """
+    counters = db[COUNTERS_COLLECTION]
+    if current is None:
+        current = await counters.find_one({"_id": user_id})
+    counts = await _recount(db, user_id)
+    if current is None:
+        await counters.update_one({"_id": user_id}, {"$setOnInsert": counts}, upsert=True)
+    elif (current.get("total"), current.get("unread")) != (counts["total"], counts["unread"]):
+        await counters.update_one(
+            {"_id": user_id, "total": current.get("total"), "unread": current.get("unread")}, {"$set": counts}
+        )
+    return counts
+
+async def get_counts(db, user_id: str) -> dict:
+    """A user's {total, unread}; users without a counter yet are counted once and backfilled"""
+    counter = await db[COUNTERS_COLLECTION].find_one({"_id": user_id})
+    if counter is None:
+        return await reconcile_user(db, user_id, current=None)
+    return {"total": counter["total"], "unread": counter["unread"]}
+
+async def _reconcile_batch(db, stored: dict) -> int:
+    """Repair the counters in `stored` ({user_id: counter}) that disagree with the notifications"""
+    actual = {}
+    async for row in db["notifications"].aggregate([
+        {"$match": {"user_id": {"$in": list(stored)}}},
+        {"$group": {
+            "_id": "$user_id",
+            "total": {"$sum": 1},
+            "unread": {"$sum": {"$cond": [{"$eq": ["$is_read", False]}, 1, 0]}}
+        }}
+    ]):
+        actual[row["_id"]] = {"total": row["total"], "unread": row["unread"]}
+
+    repaired = 0
+    for user_id, current in stored.items():
+        counts = actual.get(user_id, {"total": 0, "unread": 0})
+        if (current.get("total"), current.get("unread")) == (counts["total"], counts["unread"]):
+            continue
+        # The aggregate is only a hint: recount this user with compare-and-set
+        fixed = await reconcile_user(db, user_id, current)
+        if (current.get("total"), current.get("unread")) != (fixed["total"], fixed["unread"]):
+            repaired += 1
+    return repaired
+
+async def reconcile(db, batch_size: int = RECONCILE_BATCH) -> int:
+    """
+    Repair every counter that disagrees with the notifications; returns how
+    many were fixed. Counters are walked in _id order, one batch at a time.
+    Users without a counter have nothing to repair: their first read or write
+    creates it from a recount.
+    """
+    counters = db[COUNTERS_COLLECTION]
+    repaired = 0
+    last_id = None
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        batch = await counters.find(query).sort("_id", 1).limit(batch_size).to_list(length=None)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        repaired += await _reconcile_batch(db, {counter["_id"]: counter for counter in batch})
+    if repaired:
+        logger.warning("Repaired %s notification counters", repaired)
+    return repaired
+
+async def run_reconciler(db, stop: asyncio.Event = None, interval: float = RECONCILE_INTERVAL):
+    """Reconcile counters every `interval` seconds until `stop` is set"""
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            await reconcile(db)
+        except Exception as e:
+            logger.warning("Notification counter reconcile failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def _main():
+    import database
+    try:
+        repaired = await reconcile(database.get_database())
+        print(f"Repaired {repaired} notification counters")
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconcile"]:
+        sys.exit("usage: python notification_counters.py reconcile")
+    asyncio.run(_main())
@@ -0,0 +1,134 @@
+"""
+Push channel for notifications.
+
+Each connected client holds one bounded queue in this process's hub, keyed by
+user id. Anything that creates or reads notifications calls publish(), which
+goes through the broker:
+
+  LocalBroker  delivers straight to this process's hub (single worker)
+  RedisBroker  publishes on a Redis channel that every worker subscribes to,
+               so a user connected to worker A sees events raised on worker B
+
+Set NOTIFICATION_BROKER_URL (or CACHE_URL) to redis://... to use Redis; that
+needs the optional `redis` package.
+
+A subscriber that stops reading never blocks publishers: once its queue is
+full further events are dropped and the subscriber is flagged, so the stream
+tells the client to resync instead.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Set
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "100"))
+REDIS_CHANNEL = "etender:notifications"
+
+class Subscription:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class Hub:
+    """In-process fan-out from user id to that user's open streams"""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def dispatch(self, user_id: str, event: dict):
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.deliver(event)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+        }
+
+class LocalBroker:
+    def __init__(self, hub: Hub):
+        self.hub = hub
+
+    async def start(self):
+        pass
+
+    async def publish(self, user_id: str, event: dict):
+        self.hub.dispatch(user_id, event)
+
+    async def close(self):
+        pass
+
+class RedisBroker:
+    def __init__(self, hub: Hub, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("NOTIFICATION_BROKER_URL is set but the 'redis' package is not installed")
+        self.hub = hub
+        self._redis = redis.from_url(url)
+        self._listener = None
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(REDIS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            data = json.loads(message["data"])
+                            self.hub.dispatch(data["user_id"], data["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Notification broker connection lost, reconnecting: %s", e)
+                await asyncio.sleep(1)
+
+    async def publish(self, user_id: str, event: dict):
+        await self._redis.publish(REDIS_CHANNEL, json.dumps({"user_id": user_id, "event": event}, default=str))
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+        await self._redis.aclose()
+
+hub = Hub()
+
+def _make_broker():
+    url = os.getenv("NOTIFICATION_BROKER_URL") or os.getenv("CACHE_URL")
+    return RedisBroker(hub, url) if url else LocalBroker(hub)
+
+broker = _make_broker()
+
+async def publish(user_id: str, event: dict):
+    """Push an event to every open stream of `user_id`, on any worker"""
+    try:
+        await broker.publish(user_id, event)
+    except Exception as e:
+        # Streams are best effort; clients resync from the REST endpoints
+        logger.warning("Could not publish notification event for %s: %s", user_id, e)
@@ -0,0 +1,133 @@
+"""
+Retention for the notifications collection.
+
+Two mechanisms keep it from growing without bound:
+
+  expiry    notifications get a read_at timestamp when they are read; a TTL
+            index removes them NOTIFICATION_READ_TTL_DAYS later (0 disables it)
+  archival  anything older than NOTIFICATION_ARCHIVE_AFTER_DAYS (in practice
+            the notifications nobody read) is moved into `notification_archive`,
+            as bucket documents per user and month; a new bucket is started
+            once one holds NOTIFICATION_ARCHIVE_BUCKET_SIZE notifications
+
+Archival adjusts the notification counters as it removes documents. TTL
+expiry happens inside mongod, so the `total` counter of a user whose read
+notifications expired is corrected by the counter reconcile instead (`unread`
+is unaffected: only read notifications expire).
+
+worker.py archives every NOTIFICATION_ARCHIVE_INTERVAL seconds; to run a pass
+by hand:
+
+    python notification_retention.py archive
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+import database
+import notification_counters
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "notification_archive"
+
+READ_TTL_SECONDS = int(float(os.getenv("NOTIFICATION_READ_TTL_DAYS", "30")) * 86400)
+ARCHIVE_AFTER_DAYS = float(os.getenv("NOTIFICATION_ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH = int(os.getenv("NOTIFICATION_ARCHIVE_BATCH", "1000"))
+BUCKET_SIZE = int(os.getenv("NOTIFICATION_ARCHIVE_BUCKET_SIZE", "500"))
+ARCHIVE_INTERVAL = float(os.getenv("NOTIFICATION_ARCHIVE_INTERVAL", "3600"))
+
+# Fields kept in the archive; everything else (job ids, read_at) is dropped
+ARCHIVED_FIELDS = ("_id", "title", "message", "type", "is_read", "related_tender_id", "related_bid_id", "created_at")
+
+def _month(created_at: datetime) -> str:
+    return created_at.strftime("%Y-%m")
+
+def _bucket_updates(docs: list) -> list:
+    """Bulk upserts appending `docs` to their users' open bucket for the month"""
+    groups = {}
+    for doc in docs:
+        groups.setdefault((doc["user_id"], _month(doc["created_at"])), []).append(
+            {field: doc.get(field) for field in ARCHIVED_FIELDS}
+        )
+    updates = []
+    for (user_id, month), entries in groups.items():
+        for start in range(0, len(entries), BUCKET_SIZE):
+            piece = entries[start:start + BUCKET_SIZE]
+            # A full bucket no longer matches, so the upsert opens a new one
+            updates.append(UpdateOne(
+                {"user_id": user_id, "month": month, "count": {"$lt": BUCKET_SIZE}},
+                {"$push": {"notifications": {"$each": piece}}, "$inc": {"count": len(piece)}},
+                upsert=True
+            ))
+    return updates
+
+async def archive_batch(db, cutoff: datetime) -> int:
+    """Move up to ARCHIVE_BATCH notifications created before `cutoff`; returns how many moved"""
+    docs = await db["notifications"].find(
+        {"created_at": {"$lt": cutoff}}
+    ).sort("created_at", 1).limit(ARCHIVE_BATCH).to_list(length=ARCHIVE_BATCH)
+    if not docs:
+        return 0
+
+    deltas = {}
+    for doc in docs:
+        total, unread = deltas.get(doc["user_id"], (0, 0))
+        deltas[doc["user_id"]] = (total - 1, unread - (0 if doc.get("is_read") else 1))
+
+    # Without transaction support a crash between these steps can archive a
+    # notification twice, but never loses one
+    async with database.transaction() as session:
+        await db[ARCHIVE_COLLECTION].bulk_write(_bucket_updates(docs), ordered=False, session=session)
+        await db["notifications"].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}}, session=session)
+        await notification_counters.increment_many(db, deltas, session=session)
+    return len(docs)
+
+async def archive(db, now: datetime = None) -> int:
+    """Archive everything past the retention age; returns the number of notifications moved"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    moved = 0
+    while True:
+        count = await archive_batch(db, cutoff)
+        moved += count
+        if count < ARCHIVE_BATCH:
+            break
+    if moved:
+        logger.info("Archived %s notifications created before %s", moved, cutoff.isoformat())
+    return moved
+
+async def get_archived(db, user_id: str, month: str) -> list:
+    """A user's archived notifications for `month` (YYYY-MM), newest first"""
+    notifications = []
+    async for bucket in db[ARCHIVE_COLLECTION].find({"user_id": user_id, "month": month}, {"notifications": 1}):
+        notifications.extend(bucket["notifications"])
+    notifications.sort(key=lambda notification: notification["created_at"], reverse=True)
+    return notifications
+
+async def run_archiver(db, stop: asyncio.Event = None, interval: float = ARCHIVE_INTERVAL):
+    """Archive old notifications every `interval` seconds until `stop` is set"""
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            await archive(db)
+        except Exception as e:
+            logger.warning("Notification archival failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def _main():
+    try:
+        moved = await archive(database.get_database())
+        print(f"Archived {moved} notifications")
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["archive"]:
+        sys.exit("usage: python notification_retention.py archive")
+    asyncio.run(_main())
@@ -0,0 +1,260 @@
+"""
+Background fan-out of tender lifecycle notifications.
+
+Lifecycle handlers (publish, close, evaluate) record a job in
+`notification_jobs` describing who should be told what, schedule it as a
+background task and return straight away. The job walks its recipients in
+ascending user-id order, NOTIFICATION_FANOUT_CHUNK at a time, writing each
+chunk with one insert_many and saving the last user id reached, so progress
+is visible and an interrupted job resumes where it stopped.
+
+A unique (job_id, user_id) index makes re-running a chunk harmless. Jobs left
+unfinished by a restart are picked up again at startup once their lease has
+expired.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+from models import Notification, NotificationType
+import notification_counters
+import notification_hub
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "notification_jobs"
+
+CHUNK_SIZE = int(os.getenv("NOTIFICATION_FANOUT_CHUNK", "1000"))
+LEASE_SECONDS = float(os.getenv("NOTIFICATION_JOB_LEASE_SECONDS", "120"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+
+# Recipient sources
+ALL_BIDDERS = "all_bidders"
+TENDER_BIDDERS = "tender_bidders"
+USERS = "users"
+
+DUPLICATE_KEY = 11000
+
+async def create_job(db, type: NotificationType, title: str, message: str, recipients: dict,
+                     related_tender_id: str = None, related_bid_id: str = None) -> str:
+    now = datetime.utcnow()
+    result = await db[JOBS_COLLECTION].insert_one({
+        "type": type.value,
+        "title": title,
+        "message": message,
+        "recipients": recipients,
+        "related_tender_id": related_tender_id,
+        "related_bid_id": related_bid_id,
+        "status": PENDING,
+        "total": None,
+        "sent": 0,
+        "cursor": None,
+        "lease_expires_at": None,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now
+    })
+    return str(result.inserted_id)
+
+def _object_ids(user_ids: list) -> list:
+    return [ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)]
+
+async def _recipient_chunk(db, recipients: dict, after: str = None) -> list:
+    """Next CHUNK_SIZE recipient user ids (ascending) after `after`"""
+    exclude = recipients.get("exclude", [])
+    if recipients["source"] == ALL_BIDDERS:
+        id_filter = {"$nin": _object_ids(exclude)}
+        if after:
+            id_filter["$gt"] = ObjectId(after)
+        users = await db["users"].find(
+            {"role": "bidder", "_id": id_filter}, {"_id": 1}
+        ).sort("_id", ASCENDING).limit(CHUNK_SIZE).to_list(length=None)
+        return [str(user["_id"]) for user in users]
+
+    if recipients["source"] == TENDER_BIDDERS:
+        bidder_filter = {"$nin": exclude}
+        if after:
+            bidder_filter["$gt"] = after
+        rows = await db["bids"].aggregate([
+            {"$match": {"tender_id": recipients["tender_id"], "bidder_id": bidder_filter}},
+            {"$group": {"_id": "$bidder_id"}},
+            {"$sort": {"_id": 1}},
+            {"$limit": CHUNK_SIZE}
+        ]).to_list(length=None)
+        return [row["_id"] for row in rows]
+
+    user_ids = sorted(user_id for user_id in recipients["user_ids"] if user_id not in exclude)
+    return [user_id for user_id in user_ids if after is None or user_id > after][:CHUNK_SIZE]
+
+async def _count_recipients(db, recipients: dict) -> int:
+    exclude = recipients.get("exclude", [])
+    if recipients["source"] == ALL_BIDDERS:
+        return await db["users"].count_documents({"role": "bidder", "_id": {"$nin": _object_ids(exclude)}})
+    if recipients["source"] == TENDER_BIDDERS:
+        rows = await db["bids"].aggregate([
+            {"$match": {"tender_id": recipients["tender_id"], "bidder_id": {"$nin": exclude}}},
+            {"$group": {"_id": "$bidder_id"}},
+            {"$count": "count"}
+        ]).to_list(length=None)
+        return rows[0]["count"] if rows else 0
+    return len(set(recipients["user_ids"]) - set(exclude))
+
+async def _insert_chunk(db, job: dict, user_ids: list) -> list:
+    """Insert one notification per user; returns the documents actually inserted"""
+    docs = []
+    for user_id in user_ids:
+        notification = Notification(
+            user_id=user_id,
+            title=job["title"],
+            message=job["message"],
+            type=NotificationType(job["type"]),
+            related_tender_id=job["related_tender_id"],
+            related_bid_id=job["related_bid_id"]
+        )
+        doc = notification.dict(by_alias=True, exclude={"id"})
+        doc["_id"] = ObjectId()
+        doc["job_id"] = str(job["_id"])
+        docs.append(doc)
+
+    try:
+        await db["notifications"].insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        # Users already notified by an earlier, interrupted run of this job
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        failed = {error["index"] for error in errors}
+        return [doc for i, doc in enumerate(docs) if i not in failed]
+
+async def _claim(db, job_id: str):
+    now = datetime.utcnow()
+    return await db[JOBS_COLLECTION].find_one_and_update(
+        {
+            "_id": ObjectId(job_id),
+            "status": {"$in": [PENDING, RUNNING]},
+            "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lte": now}}]
+        },
+        {"$set": {"status": RUNNING, "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS), "updated_at": now}},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def run_job(db, job_id: str):
+    """Deliver a job's notifications chunk by chunk; safe to call for a job another worker holds"""
+    job = await _claim(db, job_id)
+    if job is None:
+        return
+    jobs = db[JOBS_COLLECTION]
+    try:
+        if job["total"] is None:
+            job["total"] = await _count_recipients(db, job["recipients"])
+            await jobs.update_one({"_id": job["_id"]}, {"$set": {"total": job["total"]}})
+
+        while True:
+            user_ids = await _recipient_chunk(db, job["recipients"], job["cursor"])
+            if not user_ids:
+                break
+            inserted = await _insert_chunk(db, job, user_ids)
+            deltas = {}
+            for doc in inserted:
+                total, unread = deltas.get(doc["user_id"], (0, 0))
+                deltas[doc["user_id"]] = (total + 1, unread + 1)
+            await notification_counters.increment_many(db, deltas)
+            for doc in inserted:
+                event_doc = {**doc, "_id": str(doc["_id"])}
+                await notification_hub.publish(doc["user_id"], {"type": "notification", "notification": event_doc, "unread_delta": 1})
+
+            job["cursor"] = user_ids[-1]
+            now = datetime.utcnow()
+            await jobs.update_one({"_id": job["_id"]}, {
+                "$set": {
+                    "cursor": job["cursor"],
+                    "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                    "updated_at": now
+                },
+                "$inc": {"sent": len(inserted)}
+            })
+
+        await jobs.update_one({"_id": job["_id"]}, {"$set": {
+            "status": DONE, "lease_expires_at": None, "updated_at": datetime.utcnow()
+        }})
+    except Exception as e:
+        logger.error("Notification job %s failed, it will resume on restart: %s", job_id, e)
+        await jobs.update_one({"_id": job["_id"]}, {"$set": {
+            "status": PENDING, "lease_expires_at": None, "last_error": str(e), "updated_at": datetime.utcnow()
+        }})
+
+async def resume_jobs(db):
+    """Run jobs left unfinished by a previous process"""
+    now = datetime.utcnow()
+    unfinished = await db[JOBS_COLLECTION].find(
+        {"status": {"$in": [PENDING, RUNNING]}, "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lte": now}}]},
+        {"_id": 1}
+    ).to_list(length=None)
+    for job in unfinished:
+        await run_job(db, str(job["_id"]))
+
+async def get_job(db, job_id: str):
+    job = await db[JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)}) if ObjectId.is_valid(job_id) else None
+    if job:
+        job["_id"] = str(job["_id"])
+    return job
+
+# Jobs started outside a request (e.g. by the deadline scheduler), kept referenced until done
+_running = set()
+
+def _schedule(background_tasks, db, job_id: str):
+    if background_tasks is not None:
+        background_tasks.add_task(run_job, db, job_id)
+        return
+    task = asyncio.create_task(run_job(db, job_id))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+async def tender_published(db, background_tasks, tender_id: str, tender: dict) -> str:
+    """Tell every bidder about a newly published tender"""
+    deadline = tender["deadline"]
+    deadline_text = deadline.strftime("%Y-%m-%d") if isinstance(deadline, datetime) else str(deadline)
+    job_id = await create_job(
+        db, NotificationType.TENDER_PUBLISHED, "New tender published",
+        f"'{tender['title']}' is open for bids until {deadline_text}.",
+        {"source": ALL_BIDDERS}, related_tender_id=tender_id
+    )
+    _schedule(background_tasks, db, job_id)
+    return job_id
+
+async def tender_closed(db, background_tasks, tender_id: str, tender: dict) -> str:
+    """Tell everyone who bid that bidding has closed"""
+    job_id = await create_job(
+        db, NotificationType.TENDER_CLOSED, "Tender closed",
+        f"Bidding on '{tender['title']}' has closed. Results will follow after evaluation.",
+        {"source": TENDER_BIDDERS, "tender_id": tender_id}, related_tender_id=tender_id
+    )
+    _schedule(background_tasks, db, job_id)
+    return job_id
+
+async def tender_evaluated(db, background_tasks, tender_id: str, tender: dict, winning_bid: dict) -> list:
+    """BID_WON to the winning bidder, BID_LOST to every other bidder"""
+    winner_id = winning_bid["bidder_id"]
+    won = await create_job(
+        db, NotificationType.BID_WON, "Your bid won",
+        f"Your bid of {winning_bid['amount']} on '{tender['title']}' was selected.",
+        {"source": USERS, "user_ids": [winner_id]},
+        related_tender_id=tender_id, related_bid_id=str(winning_bid["_id"])
+    )
+    lost = await create_job(
+        db, NotificationType.BID_LOST, "Tender evaluated",
+        f"Another bid was selected for '{tender['title']}'.",
+        {"source": TENDER_BIDDERS, "tender_id": tender_id, "exclude": [winner_id]},
+        related_tender_id=tender_id
+    )
+    _schedule(background_tasks, db, won)
+    _schedule(background_tasks, db, lost)
+    return [won, lost]
@@ -0,0 +1,380 @@
+"""
+Transactional outbox for on-chain anchoring of tenders and bids.
+
+Route handlers write a job into the `chain_outbox` collection in the same
+transaction as the tender/bid document and respond immediately. worker.py
+drains the outbox to the TenderContract, retrying with exponential backoff,
+and writes the transaction hash (and blockchain tender id) back to Mongo.
+A job that cannot run yet (its tender is not anchored, or the contract is not
+deployed) waits with its own budget, OUTBOX_MAX_WAITS, and keeps its attempts.
+
+Each job's _id is its idempotency key ("<kind>:<document id>"), so a job can
+only be queued once per document. Finished jobs are deleted by a TTL index
+OUTBOX_DONE_TTL seconds after completion; by then every route that queues a
+job has moved its document past the state that queues it. Once a transaction has been sent its hash
+is stored on the job before waiting for the receipt, so a retry after a crash
+or receipt timeout waits on the same transaction instead of sending it again.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from blockchain import get_blockchain_manager, ReceiptTimeout
+import response_cache
+import tracing
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "chain_outbox"
+
+CREATE_TENDER = "create_tender"
+SUBMIT_BID = "submit_bid"
+CLOSE_TENDER = "close_tender"
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+# Retries of a job that is waiting on something else (its tender's anchoring, the
+# contract deployment). They do not use up MAX_ATTEMPTS.
+MAX_WAITS = int(os.getenv("OUTBOX_MAX_WAITS", "1000"))
+BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+# Jobs claimed together and confirmed with a single receipt wait (1 disables batching)
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "1"))
+DONE_TTL = int(os.getenv("OUTBOX_DONE_TTL", str(7 * 24 * 3600)))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Sender of admin transactions (tender creation, closing) when the acting user has no wallet
+DEFAULT_ADMIN_ADDRESS = "0x713A6B63f783269F0AD6b31868B971FE116cC1D7"
+
+class RetryLater(Exception):
+    """The job cannot run yet (e.g. its tender is not anchored) and should be retried"""
+
+class PermanentFailure(Exception):
+    """The job can never succeed (e.g. the transaction reverted) and should not be retried"""
+
+async def ensure_indexes(db):
+    await db[OUTBOX_COLLECTION].create_index(
+        [("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"
+    )
+    # Oldest waiting job, for the lag metric
+    await db[OUTBOX_COLLECTION].create_index(
+        [("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"
+    )
+    # Only finished jobs have done_at, so nothing else expires
+    await db[OUTBOX_COLLECTION].create_index("done_at", name="done_ttl", expireAfterSeconds=DONE_TTL)
+
+async def enqueue(db, kind: str, ref_id: str, payload: dict, session=None):
+    """Queue an on-chain job for a document; queuing the same job twice is a no-op"""
+    now = datetime.utcnow()
+    await db[OUTBOX_COLLECTION].update_one(
+        {"_id": f"{kind}:{ref_id}"},
+        {"$setOnInsert": {
+            "kind": kind,
+            "ref_id": ref_id,
+            "payload": payload,
+            "status": PENDING,
+            "attempts": 0,
+            "waits": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "updated_at": now,
+            "tx_hash": None,
+            "last_error": None,
+            # Lets the worker's on-chain calls join the trace of the request that queued the job
+            "traceparent": tracing.current_span().traceparent
+        }},
+        upsert=True,
+        session=session
+    )
+
+async def claim_job(db):
+    """Lease the next due job, including jobs whose previous worker died mid-flight"""
+    now = datetime.utcnow()
+    return await db[OUTBOX_COLLECTION].find_one_and_update(
+        {"$or": [
+            {"status": PENDING, "next_attempt_at": {"$lte": now}},
+            {"status": PROCESSING, "lease_expires_at": {"$lte": now}}
+        ]},
+        {
+            "$set": {
+                "status": PROCESSING,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "worker": WORKER_ID,
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("next_attempt_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(BACKOFF_BASE ** attempts, BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+async def _mark_done(db, job, tx_hash: str):
+    now = datetime.utcnow()
+    await db[OUTBOX_COLLECTION].update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": DONE, "tx_hash": tx_hash, "updated_at": now, "done_at": now, "last_error": None}}
+    )
+
+async def _mark_failed(db, job, error: Exception, permanent: bool = False):
+    now = datetime.utcnow()
+    update = {"last_error": str(error), "updated_at": now}
+    if permanent or job["attempts"] >= MAX_ATTEMPTS:
+        update["status"] = FAILED
+        logger.error("Outbox job %s failed after %s attempts: %s", job["_id"], job["attempts"], error)
+    else:
+        update["status"] = PENDING
+        update["next_attempt_at"] = now + timedelta(seconds=backoff_seconds(job["attempts"]))
+        logger.warning("Outbox job %s attempt %s failed, retrying: %s", job["_id"], job["attempts"], error)
+    await db[OUTBOX_COLLECTION].update_one({"_id": job["_id"]}, {"$set": update})
+
+async def _mark_waiting(db, job, error: RetryLater):
+    """Reschedule a job that cannot run yet, giving back the attempt its claim used"""
+    now = datetime.utcnow()
+    waits = job.get("waits", 0) + 1
+    update = {"last_error": str(error), "updated_at": now}
+    if waits >= MAX_WAITS:
+        update["status"] = FAILED
+        logger.error("Outbox job %s still waiting after %s retries: %s", job["_id"], waits, error)
+    else:
+        update["status"] = PENDING
+        update["next_attempt_at"] = now + timedelta(seconds=backoff_seconds(waits))
+        logger.info("Outbox job %s cannot run yet, retrying: %s", job["_id"], error)
+    await db[OUTBOX_COLLECTION].update_one(
+        {"_id": job["_id"]}, {"$set": update, "$inc": {"attempts": -1, "waits": 1}}
+    )
+
+async def _blockchain_tender_id(db, tender_id: str) -> int:
+    tender = await db["tenders"].find_one({"_id": ObjectId(tender_id)}, {"blockchain_tender_id": 1})
+    if not tender:
+        raise PermanentFailure(f"Tender {tender_id} no longer exists")
+    if not tender.get("blockchain_tender_id"):
+        raise RetryLater(f"Tender {tender_id} is not anchored on chain yet")
+    return tender["blockchain_tender_id"]
+
+async def _create_tender_call(db, job):
+    payload = job["payload"]
+    call = get_blockchain_manager().contract.functions.createTender(
+        payload["title"], int(payload["budget"]), int(payload["deadline_timestamp"]), payload["tender_hash"]
+    )
+    return call, payload["admin_address"]
+
+async def _create_tender_done(db, job, receipt):
+    log = get_blockchain_manager().contract.events.TenderCreated().process_receipt(receipt)
+    await db["tenders"].update_one(
+        {"_id": ObjectId(job["ref_id"])},
+        {"$set": {"blockchain_tx_hash": receipt.transactionHash.hex(), "blockchain_tender_id": log[0]["args"]["tenderId"]}}
+    )
+    await response_cache.bump(job["ref_id"])
+
+async def _submit_bid_call(db, job):
+    payload = job["payload"]
+    blockchain_tender_id = await _blockchain_tender_id(db, payload["tender_id"])
+    call = get_blockchain_manager().contract.functions.submitBid(
+        blockchain_tender_id, int(payload["amount"]), payload["bid_hash"]
+    )
+    return call, payload["bidder_address"]
+
+async def _submit_bid_done(db, job, receipt):
+    await db["bids"].update_one(
+        {"_id": ObjectId(job["ref_id"])}, {"$set": {"blockchain_tx_hash": receipt.transactionHash.hex()}}
+    )
+
+async def _close_tender_call(db, job):
+    blockchain_tender_id = await _blockchain_tender_id(db, job["ref_id"])
+    return get_blockchain_manager().contract.functions.closeTender(blockchain_tender_id), job["payload"]["admin_address"]
+
+async def _close_tender_done(db, job, receipt):
+    await db["tenders"].update_one(
+        {"_id": ObjectId(job["ref_id"])}, {"$set": {"close_tx_hash": receipt.transactionHash.hex()}}
+    )
+    await response_cache.bump(job["ref_id"])
+
+# kind -> (build the contract call and sender, write the mined result back)
+HANDLERS = {
+    CREATE_TENDER: (_create_tender_call, _create_tender_done),
+    SUBMIT_BID: (_submit_bid_call, _submit_bid_done),
+    CLOSE_TENDER: (_close_tender_call, _close_tender_done),
+}
+
+async def _send(db, job) -> str:
+    """Send the job's transaction unless an earlier attempt already did"""
+    if job.get("tx_hash"):
+        return job["tx_hash"]
+    build_call, _ = HANDLERS[job["kind"]]
+    call, sender = await build_call(db, job)
+    tx_hash = await get_blockchain_manager().send_transaction(call, sender)
+    # The sender is kept so error handling can resync its nonces without rebuilding the call
+    await db[OUTBOX_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"tx_hash": tx_hash, "sender": sender}})
+    job["tx_hash"] = tx_hash
+    job["sender"] = sender
+    return tx_hash
+
+async def _finish(db, job, receipt):
+    if receipt["status"] != 1:
+        raise PermanentFailure(f"Transaction {job['tx_hash']} reverted")
+    _, write_back = HANDLERS[job["kind"]]
+    await write_back(db, job, receipt)
+    await _mark_done(db, job, receipt.transactionHash.hex())
+
+async def _transaction_dropped(tx_hash: str) -> bool:
+    """True only if the node answered that it no longer knows the transaction"""
+    try:
+        return not await get_blockchain_manager().transaction_known(tx_hash)
+    except Exception as e:
+        # Node unreachable: keep the hash and wait on the same transaction next time
+        logger.warning("Could not look up transaction %s: %s", tx_hash, e)
+        return False
+
+async def _handle_error(db, job, error: Exception):
+    if isinstance(error, PermanentFailure):
+        await _mark_failed(db, job, error, permanent=True)
+        return
+    if isinstance(error, RetryLater):
+        await _mark_waiting(db, job, error)
+        return
+    if isinstance(error, ReceiptTimeout) and await _transaction_dropped(error.tx_hash):
+        # The node dropped the transaction: forget it so the retry sends a fresh one,
+        # and resync nonces so its slot is refilled instead of blocking later transactions
+        await db[OUTBOX_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"tx_hash": None}})
+        manager = get_blockchain_manager()
+        if manager.nonces and job.get("sender"):
+            try:
+                await manager.nonces.resync(job["sender"])
+            except Exception as e:
+                # The next nonce error resyncs anyway
+                logger.warning("Could not resync nonces for %s: %s", job["sender"], e)
+    # ReceiptTimeout, node unavailable, ...
+    await _mark_failed(db, job, error)
+
+def _trace(job, stage: str):
+    return tracing.start_trace(
+        f"outbox.{job['kind']}.{stage}", job.get("traceparent"), job_id=job["_id"], attempt=job.get("attempts", 0)
+    )
+
+async def process_job(db, job):
+    if not get_blockchain_manager().contract:
+        await _mark_waiting(db, job, RetryLater("Contract not deployed"))
+        return
+    with _trace(job, "process"):
+        try:
+            tx_hash = await _send(db, job)
+            receipt = await get_blockchain_manager().wait_for_receipt(tx_hash)
+            await _finish(db, job, receipt)
+        except Exception as e:
+            await _handle_error(db, job, e)
+
+async def _traced_send(db, job) -> str:
+    with _trace(job, "send"):
+        return await _send(db, job)
+
+async def process_batch(db, jobs: list):
+    """
+    Send every job's transaction back to back (nonces are assigned locally, so
+    they pipeline into the same blocks) and wait for all receipts in one loop.
+    """
+    if not get_blockchain_manager().contract:
+        for job in jobs:
+            await _mark_waiting(db, job, RetryLater("Contract not deployed"))
+        return
+
+    # Jobs that already sent a transaction may have been mined before this batch started
+    fresh = [job for job in jobs if not job.get("tx_hash")]
+    await asyncio.gather(*(process_job(db, job) for job in jobs if job.get("tx_hash")))
+    if not fresh:
+        return
+
+    from_block = await get_blockchain_manager().block_number()
+    results = await asyncio.gather(*(_traced_send(db, job) for job in fresh), return_exceptions=True)
+    sent = []
+    for job, result in zip(fresh, results):
+        if isinstance(result, Exception):
+            await _handle_error(db, job, result)
+        else:
+            sent.append(job)
+
+    receipts = await get_blockchain_manager().wait_for_receipts([job["tx_hash"] for job in sent], from_block)
+    for job in sent:
+        with _trace(job, "confirm"):
+            try:
+                receipt = receipts.get(job["tx_hash"])
+                if receipt is None:
+                    raise ReceiptTimeout(job["tx_hash"], get_blockchain_manager().receipt_timeout)
+                await _finish(db, job, receipt)
+            except Exception as e:
+                await _handle_error(db, job, e)
+
+async def claim_batch(db, size: int) -> list:
+    jobs = []
+    while len(jobs) < size:
+        job = await claim_job(db)
+        if job is None:
+            break
+        jobs.append(job)
+    return jobs
+
+async def run_worker(db, stop: asyncio.Event = None, concurrency: int = CONCURRENCY, batch_size: int = BATCH_SIZE):
+    """Drain the outbox until `stop` is set"""
+    stop = stop or asyncio.Event()
+
+    async def pause(seconds: float):
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def loop():
+        errors = 0
+        while not stop.is_set():
+            try:
+                jobs = await claim_batch(db, batch_size)
+                if not jobs:
+                    errors = 0
+                    await pause(POLL_INTERVAL)
+                    continue
+                if len(jobs) == 1:
+                    await process_job(db, jobs[0])
+                else:
+                    await process_batch(db, jobs)
+                errors = 0
+            except Exception:
+                # A Mongo or node outage must not end the worker. Claimed jobs are
+                # picked up again once their lease expires.
+                errors += 1
+                delay = backoff_seconds(errors)
+                logger.exception("Outbox worker iteration failed, retrying in %.1fs", delay)
+                await pause(delay)
+
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+
+async def get_metrics(db) -> dict:
+    """
+    Queue depth per unfinished status and lag of the oldest job still waiting
+    to be anchored. Each count is served by the status index, so a scrape costs
+    the size of the backlog, not of the collection.
+    """
+    statuses = [PENDING, PROCESSING, FAILED]
+    counts = await asyncio.gather(*(db[OUTBOX_COLLECTION].count_documents({"status": status}) for status in statuses))
+    depth = dict(zip(statuses, counts))
+
+    oldest = await db[OUTBOX_COLLECTION].find_one(
+        {"status": {"$in": [PENDING, PROCESSING]}}, {"created_at": 1}, sort=[("created_at", ASCENDING)]
+    )
+    lag = (datetime.utcnow() - oldest["created_at"]).total_seconds() if oldest else 0.0
+    return {"depth": depth, "lag_seconds": lag}
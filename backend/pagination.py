@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Lists are ordered newest first on (<sort field>, _id). A page is fetched with
+a range condition on that pair instead of skip(), so every page costs the same
+index walk however deep into the archive it is. The cursor handed to clients
+is an opaque token holding the sort key of the last document returned.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import DESCENDING
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    value = doc.get(sort_field)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    raw = json.dumps({"v": value, "id": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[object, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        value = data["v"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def projection(fields: Optional[str], view: str, summary_excludes: List[str], sort_field: str) -> Optional[dict]:
+    """Mongo projection for a `fields=a,b` list or `view=summary`; None returns whole documents"""
+    if fields:
+        names = {name.strip() for name in fields.split(",") if name.strip()}
+        # The sort key is always needed to build the next cursor
+        return {name: 1 for name in names | {sort_field}}
+    if view == "summary":
+        return {name: 0 for name in summary_excludes}
+    if view != "full":
+        raise HTTPException(status_code=422, detail="view must be 'full' or 'summary'")
+    return None
+
+async def paginate(collection, query: dict, sort_field: str, limit: int, cursor: Optional[str] = None,
+                   fields: Optional[dict] = None) -> Tuple[list, Optional[str]]:
+    """One page of `query` ordered newest first, plus the cursor of the next page (None on the last page)"""
+    limit = max(1, min(limit, MAX_LIMIT))
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        after = {"$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": last_id}}
+        ]}
+        query = {"$and": [query, after]} if query else after
+
+    docs = await collection.find(query, fields).sort(
+        [(sort_field, DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(docs[limit - 1], sort_field) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,93 @@
+"""
+Rendered-response cache for the public tender endpoints.
+
+GET /tenders/ and GET /tenders/{id} responses are stored as their final JSON
+body plus a strong ETag (SHA-256 of the body), keyed by a version and the
+request's query string. Every change to a tender bumps the list version and
+that tender's version, so later reads miss and re-render; the superseded
+entries are never looked up again and age out of the LRU. Clients that send
+If-None-Match with the current ETag get a 304 without a database read.
+
+A version is a random token rather than an integer, so a version evicted from
+the cache can never come back as a value that still has entries under it.
+
+With the in-process backend each API worker (and worker.py) has its own
+cache, so a write seen by one process reaches the others after at most
+TENDER_RESPONSE_CACHE_TTL seconds; set CACHE_URL to share versions and
+entries between all of them.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from cache import make_cache
+
+tender_responses = make_cache(
+    "tender_responses",
+    maxsize=int(os.getenv("TENDER_RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("TENDER_RESPONSE_CACHE_TTL", "30"))
+)
+
+# Kept apart so the response hit rate is not diluted by version lookups
+tender_versions = make_cache(
+    "tender_versions",
+    maxsize=int(os.getenv("TENDER_RESPONSE_CACHE_SIZE", "512")),
+    ttl=24 * 3600
+)
+
+# Browsers and proxies may store the response but must revalidate it (cheap: a 304)
+CACHE_CONTROL = "no-cache"
+
+LIST_SCOPE = "list"
+
+not_modified = 0
+
+async def _version(scope: str) -> str:
+    version = await tender_versions.get(scope)
+    if version is None:
+        version = uuid.uuid4().hex
+        await tender_versions.set(scope, version)
+    return version
+
+async def bump(tender_id: Optional[str] = None):
+    """Invalidate cached tender lists and, if given, one tender's detail"""
+    await tender_versions.set(LIST_SCOPE, uuid.uuid4().hex)
+    if tender_id:
+        await tender_versions.set(f"tender:{tender_id}", uuid.uuid4().hex)
+
+def _query_key(request: Request) -> str:
+    query = sorted(request.query_params.multi_items())
+    return hashlib.sha1(json.dumps(query).encode()).hexdigest()
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == "*" or any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+async def cached_json(request: Request, scope: str, render: Callable[[], Awaitable[object]]) -> Response:
+    """
+    Serve `render()`'s result for this request from the cache when the
+    version for `scope` has not moved, with an ETag and 304 support.
+    Exceptions from `render` (e.g. a 404) propagate and are not cached.
+    """
+    global not_modified
+    key = f"{scope}:{await _version(scope)}:{_query_key(request)}"
+    entry = await tender_responses.get(key)
+    if entry is None:
+        body = json.dumps(jsonable_encoder(await render()), separators=(",", ":"))
+        entry = {"etag": f'"{hashlib.sha256(body.encode()).hexdigest()}"', "body": body}
+        await tender_responses.set(key, entry)
+
+    headers = {"ETag": entry["etag"], "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+def stats() -> dict:
+    return {**tender_responses.stats(), "not_modified": not_modified}
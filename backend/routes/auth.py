@@ -1,23 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from pymongo.errors import DuplicateKeyError
 from models import User, UserRole
-from auth import authenticate_user, create_access_token, get_password_hash, get_current_user
+from auth import authenticate_user, create_access_token, get_password_hash_async, get_current_user
 from datetime import timedelta
-from database import get_database
+from database import get_db
+from throttle import check_login_allowed, record_login_failure, record_login_success
 
 router = APIRouter()
 
 @router.post("/register")
-async def register(user_data: dict):
-    db = get_database()
+async def register(user_data: dict, db=Depends(get_db)):
     users_collection = db["users"]
 
     # Check if user already exists
-    if users_collection.find_one({"username": user_data["username"]}):
+    if await users_collection.find_one({"username": user_data["username"]}):
         raise HTTPException(status_code=400, detail="Username already registered")
 
     # Hash password and create user
-    hashed_password = get_password_hash(user_data["password"])
+    hashed_password = await get_password_hash_async(user_data["password"])
     user_data_dict = {
         "username": user_data["username"],
         "email": user_data["email"],
@@ -27,17 +28,26 @@ async def register(user_data: dict):
     }
     user = User(**user_data_dict)
 
-    result = users_collection.insert_one(user.dict(by_alias=True, exclude={"id"}))
+    try:
+        result = await users_collection.insert_one(user.dict(by_alias=True, exclude={"id"}))
+    except DuplicateKeyError:
+        # Unique indexes on username/email also catch concurrent registrations
+        raise HTTPException(status_code=400, detail="Username or email already registered")
     return {"message": "User registered successfully", "user_id": str(result.inserted_id)}
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    db = get_database()
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
     users_collection = db["users"]
 
-    user = authenticate_user(users_collection, form_data.username, form_data.password)
+    # Throttle before hashing so brute-force bursts never reach the bcrypt pool
+    client_ip = request.client.host if request.client else "unknown"
+    await check_login_allowed(form_data.username, client_ip)
+
+    user = await authenticate_user(users_collection, form_data.username, form_data.password)
     if not user:
+        await record_login_failure(form_data.username)
         raise HTTPException(status_code=401, detail="Incorrect email or password")
+    await record_login_success(form_data.username)
 
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
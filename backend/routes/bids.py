@@ -1,170 +1,217 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-from models import Bid, Tender, TenderStatus, User, UserRole
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Header, Query
+from models import Bid, BidDocument, BidStatus, User, UserRole
 from auth import get_current_user
 from datetime import datetime
-from blockchain import blockchain_manager
-from database import get_database
-from typing import List
+from blockchain import get_blockchain_manager
+from database import get_db
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import database
+import outbox
+import storage
+import tender_meta
+import tracing
+from pagination import DEFAULT_LIMIT, MAX_LIMIT, paginate, projection
+from typing import List, Optional
 import json
-import os
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Longest accepted Idempotency-Key header
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+def _submission_response(bid: dict, anchoring: bool) -> dict:
+    return {
+        "message": "Bid submitted successfully",
+        "bid_id": str(bid["_id"]),
+        "blockchain_hash": bid.get("blockchain_hash"),
+        "blockchain_tx": None,
+        "blockchain_status": outbox.PENDING if anchoring else None
+    }
 
 @router.post("/{tender_id}")
 async def submit_bid(
     tender_id: str,
     bid_data: str = Form(...),
     documents: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user)
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
 ):
+    """
+    Submit a bid. A client that may retry (e.g. on a timeout near the
+    deadline) should send an Idempotency-Key header: repeating a request with
+    the same key returns the original bid instead of creating another.
+    """
     if current_user.role != UserRole.BIDDER:
         raise HTTPException(status_code=403, detail="Only bidders can submit bids")
 
-    db = get_database()
-    tenders_collection = db["tenders"]
     bids_collection = db["bids"]
 
-    # Check if tender exists and is published
-    from bson import ObjectId
-    try:
-        tender = tenders_collection.find_one({"_id": ObjectId(tender_id)})
-    except:
-        tender = None
-    if not tender or tender["status"] != TenderStatus.PUBLISHED.value:
+    # Check if tender exists and is published (cached briefly; see tender_meta)
+    with tracing.span("tender.fetch", tender_id=tender_id):
+        tender = await tender_meta.get_open_tender(db, tender_id)
+    if tender is None:
         raise HTTPException(status_code=400, detail="Tender not found or not accepting bids")
 
     # Check deadline
-    deadline = tender["deadline"]
-    if isinstance(deadline, str):
-        deadline_dt = datetime.fromisoformat(deadline)
-    else:
-        deadline_dt = deadline
-    if datetime.utcnow() > deadline_dt:
+    if tender_meta.is_past_deadline(tender):
         raise HTTPException(status_code=400, detail="Tender deadline has passed")
 
-    # Save documents
-    document_paths = []
-    if documents:
-        for doc in documents:
-            file_path = os.path.join(UPLOAD_DIR, f"{current_user.id}_{tender_id}_{doc.filename}")
-            with open(file_path, "wb") as f:
-                f.write(await doc.read())
-            document_paths.append(file_path)
-
     # Parse bid_data from JSON string
     try:
         bid_data_parsed = json.loads(bid_data)
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail="Invalid bid data format")
 
-    bid = Bid(
-        tender_id=tender_id,
-        bidder_id=str(current_user.id),
-        amount=bid_data_parsed["amount"],
-        documents=document_paths
-    )
+    # Stream documents into content-addressed storage (413 over the size caps)
+    with tracing.span("bid.documents", count=len(documents or [])):
+        stored_documents = await storage.store_bid_documents(documents or [])
 
-    # Store in MongoDB
-    bid_dict = bid.dict(by_alias=True)
-    # Remove _id if it's None to let MongoDB generate it
-    if bid_dict.get('_id') is None:
-        del bid_dict['_id']
-    result = bids_collection.insert_one(bid_dict)
-    bid_id = str(result.inserted_id)
-
-    # Create blockchain hash and submit to blockchain
+    # Create blockchain hash
     bid_hash_data = {
         "tender_id": tender_id,
         "bidder_id": str(current_user.id),
         "amount": bid_data_parsed["amount"],
+        # Anchors each document's content on chain along with the bid
+        "document_digests": [document["sha256"] for document in stored_documents],
         "timestamp": datetime.utcnow().isoformat()
     }
-    bid_hash = blockchain_manager.create_bid_hash(bid_hash_data)
+    with tracing.span("bid.hash"):
+        bid_hash = get_blockchain_manager().create_bid_hash(bid_hash_data)
 
-    # Submit to blockchain if connected
-    blockchain_tx = None
-    if blockchain_manager.is_connected() and current_user.wallet_address:
-        blockchain_tender_id = tender.get("blockchain_tender_id")
-        if not blockchain_tender_id:
-            raise HTTPException(status_code=400, detail="Tender has no blockchain counterpart.")
-
-        blockchain_tx = await blockchain_manager.submit_bid_to_blockchain(
-            blockchain_tender_id, int(bid_data_parsed["amount"]), current_user.wallet_address
-        )
+    bid = Bid(
+        tender_id=tender_id,
+        bidder_id=str(current_user.id),
+        amount=bid_data_parsed["amount"],
+        documents=[storage.document_path(document["sha256"]) for document in stored_documents],
+        document_files=[BidDocument(**document) for document in stored_documents],
+        blockchain_hash=bid_hash
+    )
 
-    # Update MongoDB with blockchain info
-    update_data = {"blockchain_hash": bid_hash}
-    if blockchain_tx:
-        update_data["blockchain_tx_hash"] = blockchain_tx
+    # The complete bid goes to MongoDB in a single insert
+    bid_dict = bid.dict(by_alias=True)
+    bid_dict["_id"] = ObjectId()
+    bid_id = str(bid_dict["_id"])
+    if idempotency_key:
+        bid_dict["idempotency_key"] = idempotency_key
 
-    bids_collection.update_one({"_id": result.inserted_id}, {"$set": update_data})
+    try:
+        with tracing.span("bid.insert", bid_id=bid_id, anchoring=bool(current_user.wallet_address)):
+            if not current_user.wallet_address:
+                await bids_collection.insert_one(bid_dict)
+            else:
+                # Anchor on chain from the bidder's wallet; worker.py sets blockchain_tx_hash
+                async with database.transaction() as session:
+                    await bids_collection.insert_one(bid_dict, session=session)
+                    await outbox.enqueue(db, outbox.SUBMIT_BID, bid_id, {
+                        "tender_id": tender_id,
+                        "amount": bid_data_parsed["amount"],
+                        "bid_hash": bid_hash,
+                        "bidder_address": current_user.wallet_address
+                    }, session=session)
+    except DuplicateKeyError:
+        if not idempotency_key:
+            raise
+        # A retry of a request that already created its bid
+        existing = await bids_collection.find_one(
+            {"bidder_id": str(current_user.id), "idempotency_key": idempotency_key},
+            {"tender_id": 1, "amount": 1, "blockchain_hash": 1}
+        )
+        if existing is None:
+            raise
+        if existing["tender_id"] != tender_id or existing["amount"] != bid.amount:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different bid")
+        job = await db[outbox.OUTBOX_COLLECTION].find_one({"_id": f"{outbox.SUBMIT_BID}:{existing['_id']}"}, {"_id": 1})
+        return _submission_response(existing, anchoring=job is not None)
 
-    return {
-        "message": "Bid submitted successfully",
-        "bid_id": bid_id,
-        "blockchain_hash": bid_hash,
-        "blockchain_tx": blockchain_tx
-    }
+    return _submission_response(bid_dict, anchoring=bool(current_user.wallet_address))
 
 @router.get("/tender/{tender_id}")
-async def get_bids_for_tender(tender_id: str, current_user: User = Depends(get_current_user)):
-    db = get_database()
+async def get_bids_for_tender(
+    tender_id: str,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     bids_collection = db["bids"]
 
     if current_user.role == UserRole.ADMIN:
         # Admin can see all bids
-        bids = list(bids_collection.find({"tender_id": tender_id}))
+        query = {"tender_id": tender_id}
     else:
         # Bidders can only see their own bids
-        bids = list(bids_collection.find({"tender_id": tender_id, "bidder_id": str(current_user.id)}))
+        query = {"tender_id": tender_id, "bidder_id": str(current_user.id)}
+    bids, next_cursor = await paginate(bids_collection, query, "submitted_at", limit, cursor)
 
     # Convert ObjectId to string for JSON serialization
     for bid in bids:
         bid["_id"] = str(bid["_id"])
 
-    return {"bids": bids}
+    return {"bids": bids, "next_cursor": next_cursor}
 
 @router.get("/my-bids")
-async def get_my_bids(current_user: User = Depends(get_current_user)):
-    db = get_database()
+async def get_my_bids(
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     bids_collection = db["bids"]
-    bids = list(bids_collection.find({"bidder_id": str(current_user.id)}))
+    bids, next_cursor = await paginate(
+        bids_collection, {"bidder_id": str(current_user.id)}, "submitted_at", limit, cursor
+    )
 
     # Convert ObjectId to string for JSON serialization
     for bid in bids:
         bid["_id"] = str(bid["_id"])
 
-    return {"bids": bids}
+    return {"bids": bids, "next_cursor": next_cursor}
 
 @router.get("/all")
-async def get_all_bids(current_user: User = Depends(get_current_user)):
+async def get_all_bids(
+    tender_id: Optional[str] = None,
+    bidder_id: Optional[str] = None,
+    status: Optional[BidStatus] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can view all bids")
 
-    db = get_database()
     bids_collection = db["bids"]
-    bids = list(bids_collection.find())
+    query = {}
+    if tender_id:
+        query["tender_id"] = tender_id
+    if bidder_id:
+        query["bidder_id"] = bidder_id
+    if status:
+        query["status"] = status.value
+    bids, next_cursor = await paginate(
+        bids_collection, query, "submitted_at", limit, cursor,
+        projection(fields, "full", [], "submitted_at")
+    )
 
     # Convert ObjectId to string for JSON serialization
     for bid in bids:
         bid["_id"] = str(bid["_id"])
 
-    return {"bids": bids}
+    return {"bids": bids, "next_cursor": next_cursor}
 
 @router.put("/{bid_id}/reject")
-async def reject_bid(bid_id: str, current_user: User = Depends(get_current_user)):
+async def reject_bid(bid_id: str, current_user: User = Depends(get_current_user), db=Depends(get_db)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can reject bids")
 
-    db = get_database()
     bids_collection = db["bids"]
     from bson import ObjectId
 
     # Update bid status to rejected
-    result = bids_collection.update_one(
+    result = await bids_collection.update_one(
         {"_id": ObjectId(bid_id)},
         {"$set": {"status": "rejected"}}
     )
@@ -0,0 +1,218 @@
+import hashlib
+import hmac
+import os
+import re
+import time
+from typing import Optional
+from urllib.parse import quote
+import anyio
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response
+from models import User, UserRole
+from auth import SECRET_KEY, get_current_user, get_optional_user
+from database import get_db
+import storage
+
+router = APIRouter()
+
+CHUNK_SIZE = 256 * 1024
+# Documents are content-addressed, so a cached copy never goes stale
+CACHE_CONTROL = "private, max-age=86400, immutable"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Lifetime of a signed download link; links are handed out one document at a time
+LINK_TTL = int(os.getenv("DOCUMENT_LINK_TTL", "300"))
+
+# Uploaded files are served from the API origin, so only types a browser cannot run
+# as script are shown inline; everything else downloads as application/octet-stream
+INLINE_TYPES = {"application/pdf", "image/png", "image/jpeg", "image/gif", "image/webp", "text/plain"}
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "sandbox",
+}
+
+class DocumentResponse(Response):
+    """
+    Streams `count` bytes of a file starting at `offset`. Uses the ASGI
+    zero-copy extension (sendfile) when the server offers it, otherwise reads
+    the file in chunks on a worker thread.
+    """
+
+    def __init__(self, path: str, offset: int, count: int, status_code: int, headers: dict, send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            file = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                await send({"type": "http.response.zerocopy", "file": file, "offset": self.offset, "count": self.count})
+            finally:
+                file.close()
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """(start, end) inclusive for a single `bytes=` range; None to ignore the header; raises 416 if unsatisfiable"""
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise _unsatisfiable(size)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise _unsatisfiable(size)
+    return start, end
+
+def _unsatisfiable(size: int):
+    return HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+def _link_signature(bid_id: str, index: int, expires: int) -> str:
+    message = f"{bid_id}/{index}/{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def _valid_link(bid_id: str, index: int, expires: Optional[int], signature: Optional[str]) -> bool:
+    if expires is None or signature is None or expires < time.time():
+        return False
+    return hmac.compare_digest(_link_signature(bid_id, index, expires), signature)
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+async def _find_document(db, bid_id: str, index: int, current_user: Optional[User]) -> tuple:
+    """(path, metadata) of a bid's document; `current_user` None skips authorization (signed links)"""
+    try:
+        bid = await db["bids"].find_one(
+            {"_id": ObjectId(bid_id)}, {"bidder_id": 1, "documents": 1, "document_files": 1}
+        )
+    except Exception:
+        bid = None
+    if not bid:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if current_user and current_user.role != UserRole.ADMIN and bid["bidder_id"] != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to access this document")
+
+    documents = bid.get("documents") or []
+    if not 0 <= index < len(documents):
+        raise HTTPException(status_code=404, detail="Document not found")
+    files = bid.get("document_files") or []
+    return documents[index], files[index] if index < len(files) else None
+
+@router.post("/{bid_id}/{index}/link")
+async def create_document_link(
+    bid_id: str,
+    index: int,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """A short-lived URL for one document, for plain links that cannot send the Authorization header"""
+    await _find_document(db, bid_id, index, current_user)
+    expires = int(time.time()) + LINK_TTL
+    return {
+        "url": f"/documents/{bid_id}/{index}?expires={expires}&signature={_link_signature(bid_id, index, expires)}",
+        "expires": expires
+    }
+
+@router.api_route("/{bid_id}/{index}", methods=["GET", "HEAD"])
+async def get_document(
+    bid_id: str,
+    index: int,
+    request: Request,
+    download: bool = False,
+    expires: Optional[int] = None,
+    signature: Optional[str] = None,
+    current_user: Optional[User] = Depends(get_optional_user),
+    db=Depends(get_db)
+):
+    """
+    Serve a bid document to its bidder or an admin (Authorization header or a
+    signed link from POST /{bid_id}/{index}/link), with Range and conditional GET support
+    """
+    if current_user is None:
+        if signature is None:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        if not _valid_link(bid_id, index, expires, signature):
+            raise HTTPException(status_code=403, detail="Link is invalid or has expired")
+    # A valid signature was issued to a user allowed to read this document
+    path, meta = await _find_document(db, bid_id, index, current_user)
+    if meta:
+        path = storage.document_path(meta["sha256"])
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    size = stat_result.st_size
+
+    if meta:
+        etag = f'"{meta["sha256"]}"'
+        filename = meta.get("filename") or meta["sha256"]
+        media_type = meta.get("content_type") or "application/octet-stream"
+        if media_type not in INLINE_TYPES:
+            media_type = "application/octet-stream"
+    else:
+        # Documents uploaded before content addressing have no digest: fall back to a weak validator
+        etag = f'W/"{int(stat_result.st_mtime)}-{size}"'
+        filename = os.path.basename(path)
+        media_type = "application/octet-stream"
+
+    inline = not download and media_type in INLINE_TYPES
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"{'inline' if inline else 'attachment'}; filename*=UTF-8''{quote(filename)}",
+        **SECURITY_HEADERS,
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag.removeprefix("W/")):
+        return Response(status_code=304, headers=headers)
+
+    send_body = request.method != "HEAD"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # With If-Range, the range only applies while the strong validator still matches
+    if range_header and (if_range is None or (if_range.strip() == etag and not etag.startswith("W/"))):
+        byte_range = _parse_range(range_header, size)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            headers["Content-Type"] = media_type
+            return DocumentResponse(path, start, end - start + 1, 206, headers, send_body)
+
+    headers["Content-Length"] = str(size)
+    headers["Content-Type"] = media_type
+    return DocumentResponse(path, 0, size, 200, headers, send_body)
@@ -1,43 +1,123 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from bson import ObjectId
 from models import Notification, NotificationType, User
-from auth import get_current_user
-from database import get_database
+from auth import SECRET_KEY, get_current_user, get_optional_user
+from database import get_db
 from datetime import datetime
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import time
+import database
+import notification_counters
+import notification_hub
+import notification_retention
+import notifier
+from pagination import DEFAULT_LIMIT, MAX_LIMIT, paginate
 
 router = APIRouter()
 
-@router.get("/")
-async def get_notifications(current_user: User = Depends(get_current_user)) -> List[Notification]:
-    """Get all notifications for the current user"""
-    db = get_database()
-    notifications_collection = db["notifications"]
-    notifications = list(notifications_collection.find({"user_id": str(current_user.id)}).sort("created_at", -1))
+# Seconds between keep-alive comments on idle streams (keeps proxies from closing them)
+HEARTBEAT_INTERVAL = float(os.getenv("NOTIFICATION_HEARTBEAT_INTERVAL", "15"))
+# Lifetime of a stream ticket; it is only checked when the stream connects
+TICKET_TTL = int(os.getenv("NOTIFICATION_STREAM_TICKET_TTL", "60"))
+# The list endpoints return a bare list, as they always have; the next page's cursor
+# travels in this header (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Times the initial count is re-read while events keep arriving during the read
+SNAPSHOT_RETRIES = 3
+
+def _id_filter(notification_id: str) -> dict:
+    """Notifications are stored with ObjectId keys; accept both forms of the id"""
+    return {"_id": ObjectId(notification_id) if ObjectId.is_valid(notification_id) else notification_id}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _ticket_signature(user_id: str, expires: int) -> str:
+    message = f"notification-stream:{user_id}:{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def _valid_ticket(user_id: Optional[str], expires: Optional[int], signature: Optional[str]) -> bool:
+    if user_id is None or expires is None or signature is None or expires < time.time():
+        return False
+    return hmac.compare_digest(_ticket_signature(user_id, expires), signature)
+
+def _drain(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+def _without_delta(event: dict) -> Optional[dict]:
+    """An event already reflected in the initial count: unread deltas are dropped, notifications kept"""
+    if event["type"] == "unread":
+        return None
+    return {**event, "unread_delta": 0} if "unread_delta" in event else event
+
+def _page(response: Response, notifications: list, next_cursor: Optional[str]) -> list:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    for notification in notifications:
+        notification["_id"] = str(notification["_id"])
     return [Notification(**notification) for notification in notifications]
 
+@router.get("/")
+async def get_notifications(
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """Get the current user's notifications, newest first, one page at a time (next page: X-Next-Cursor)"""
+    notifications, next_cursor = await paginate(
+        db["notifications"], {"user_id": str(current_user.id)}, "created_at", limit, cursor
+    )
+    return _page(response, notifications, next_cursor)
+
 @router.get("/unread")
-async def get_unread_notifications(current_user: User = Depends(get_current_user)) -> List[Notification]:
-    """Get unread notifications for the current user"""
-    db = get_database()
-    notifications_collection = db["notifications"]
-    notifications = list(notifications_collection.find({
-        "user_id": str(current_user.id),
-        "is_read": False
-    }).sort("created_at", -1))
-    return [Notification(**notification) for notification in notifications]
+async def get_unread_notifications(
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """Get unread notifications for the current user, newest first, one page at a time (next page: X-Next-Cursor)"""
+    notifications, next_cursor = await paginate(
+        db["notifications"], {"user_id": str(current_user.id), "is_read": False}, "created_at", limit, cursor
+    )
+    return _page(response, notifications, next_cursor)
+
+@router.get("/archive")
+async def get_archived_notifications(
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$"),
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """Archived notifications of the current user for one month (YYYY-MM)"""
+    notifications = await notification_retention.get_archived(db, str(current_user.id), month)
+    for notification in notifications:
+        notification["_id"] = str(notification["_id"])
+    return {"month": month, "notifications": notifications}
 
 @router.put("/{notification_id}/read")
 async def mark_notification_as_read(
     notification_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
 ):
     """Mark a notification as read"""
-    db = get_database()
     notifications_collection = db["notifications"]
 
     # Check if notification exists and belongs to user
-    notification = notifications_collection.find_one({
-        "_id": notification_id,
+    notification = await notifications_collection.find_one({
+        **_id_filter(notification_id),
         "user_id": str(current_user.id)
     })
 
@@ -45,56 +125,76 @@ async def mark_notification_as_read(
         raise HTTPException(status_code=404, detail="Notification not found")
 
     # Mark as read
-    notifications_collection.update_one(
-        {"_id": notification_id},
-        {"$set": {"is_read": True}}
-    )
+    async with database.transaction() as session:
+        result = await notifications_collection.update_one(
+            {**_id_filter(notification_id), "is_read": False},
+            {"$set": {"is_read": True, "read_at": datetime.utcnow()}},
+            session=session
+        )
+        if result.modified_count:
+            await notification_counters.increment(db, str(current_user.id), unread=-1, session=session)
+    if result.modified_count:
+        await notification_hub.publish(str(current_user.id), {"type": "unread", "delta": -1})
 
     return {"message": "Notification marked as read"}
 
 @router.put("/read-all")
-async def mark_all_notifications_as_read(current_user: User = Depends(get_current_user)):
+async def mark_all_notifications_as_read(current_user: User = Depends(get_current_user), db=Depends(get_db)):
     """Mark all notifications as read for the current user"""
-    db = get_database()
     notifications_collection = db["notifications"]
 
-    notifications_collection.update_many(
-        {"user_id": str(current_user.id), "is_read": False},
-        {"$set": {"is_read": True}}
-    )
+    async with database.transaction() as session:
+        result = await notifications_collection.update_many(
+            {"user_id": str(current_user.id), "is_read": False},
+            {"$set": {"is_read": True, "read_at": datetime.utcnow()}},
+            session=session
+        )
+        if result.modified_count:
+            await notification_counters.increment(
+                db, str(current_user.id), unread=-result.modified_count, session=session
+            )
+    if result.modified_count:
+        await notification_hub.publish(str(current_user.id), {"type": "unread", "delta": -result.modified_count})
 
     return {"message": "All notifications marked as read"}
 
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
 ):
     """Delete a notification"""
-    db = get_database()
     notifications_collection = db["notifications"]
 
     # Check if notification exists and belongs to user
-    result = notifications_collection.delete_one({
-        "_id": notification_id,
-        "user_id": str(current_user.id)
-    })
+    async with database.transaction() as session:
+        deleted = await notifications_collection.find_one_and_delete({
+            **_id_filter(notification_id),
+            "user_id": str(current_user.id)
+        }, projection={"is_read": 1}, session=session)
+        if deleted is not None:
+            await notification_counters.increment(
+                db, str(current_user.id), total=-1, unread=0 if deleted.get("is_read") else -1, session=session
+            )
 
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Notification not found")
+    if not deleted.get("is_read"):
+        await notification_hub.publish(str(current_user.id), {"type": "unread", "delta": -1})
 
     return {"message": "Notification deleted"}
 
 @router.post("/create")
 async def create_notification(
     notification_data: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
 ):
     """Create a new notification (admin/system use)"""
     if current_user.role not in ["admin", "organizer"]:
         raise HTTPException(status_code=403, detail="Only admins and organizers can create notifications")
 
-    db = get_database()
     notifications_collection = db["notifications"]
 
     notification = Notification(
@@ -106,25 +206,110 @@ async def create_notification(
         related_bid_id=notification_data.get("related_bid_id")
     )
 
-    result = notifications_collection.insert_one(notification.dict(by_alias=True, exclude={"id"}))
+    notification_doc = notification.dict(by_alias=True, exclude={"id"})
+    async with database.transaction() as session:
+        result = await notifications_collection.insert_one(notification_doc, session=session)
+        await notification_counters.increment(
+            db, notification.user_id, total=1, unread=0 if notification.is_read else 1, session=session
+        )
+    notification_doc["_id"] = str(result.inserted_id)
+    await notification_hub.publish(notification.user_id, {
+        "type": "notification", "notification": notification_doc, "unread_delta": 1
+    })
     return {
         "message": "Notification created successfully",
         "notification_id": str(result.inserted_id)
     }
 
+@router.get("/jobs/{job_id}")
+async def get_notification_job(job_id: str, current_user: User = Depends(get_current_user), db=Depends(get_db)):
+    """Progress of a lifecycle fan-out job (admin/organizer)"""
+    if current_user.role not in ["admin", "organizer"]:
+        raise HTTPException(status_code=403, detail="Only admins and organizers can view notification jobs")
+    job = await notifier.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Notification job not found")
+    return job
+
 @router.get("/count")
-async def get_notification_count(current_user: User = Depends(get_current_user)):
+async def get_notification_count(current_user: User = Depends(get_current_user), db=Depends(get_db)):
     """Get notification counts for the current user"""
-    db = get_database()
-    notifications_collection = db["notifications"]
-
-    total = notifications_collection.count_documents({"user_id": str(current_user.id)})
-    unread = notifications_collection.count_documents({
-        "user_id": str(current_user.id),
-        "is_read": False
-    })
+    return await notification_counters.get_counts(db, str(current_user.id))
 
+@router.post("/stream/ticket")
+async def create_stream_ticket(current_user: User = Depends(get_current_user)):
+    """A short-lived URL for /stream, for EventSource clients that cannot send the Authorization header"""
+    user_id = str(current_user.id)
+    expires = int(time.time()) + TICKET_TTL
     return {
-        "total": total,
-        "unread": unread
+        "url": f"/notifications/stream?user={user_id}&expires={expires}&signature={_ticket_signature(user_id, expires)}",
+        "expires": expires
     }
+
+@router.get("/stream")
+async def stream_notifications(
+    user: Optional[str] = None,
+    expires: Optional[int] = None,
+    signature: Optional[str] = None,
+    current_user: Optional[User] = Depends(get_optional_user),
+    db=Depends(get_db)
+):
+    """
+    Server-sent events: an initial `unread` count, then `notification` events
+    for new notifications and `unread` deltas as notifications are read or
+    deleted. A `resync` event means events were dropped and the client should
+    refetch /notifications/count. Authenticated by the Authorization header or
+    a ticket URL from POST /stream/ticket.
+    """
+    if current_user is not None:
+        user_id = str(current_user.id)
+    elif signature is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    elif not _valid_ticket(user, expires, signature):
+        raise HTTPException(status_code=403, detail="Ticket is invalid or has expired")
+    else:
+        user_id = user
+
+    # Subscribe before counting so nothing created in between is missed. Events that
+    # arrive while the count is read may or may not be in it, so they are drained and
+    # the count read again; events drained before a read are always in that read.
+    subscription = notification_hub.hub.subscribe(user_id)
+    pending = []
+    try:
+        unread = (await notification_counters.get_counts(db, user_id))["unread"]
+        for _ in range(SNAPSHOT_RETRIES):
+            if subscription.queue.empty():
+                break
+            pending.extend(_drain(subscription))
+            unread = (await notification_counters.get_counts(db, user_id))["unread"]
+        settled = subscription.queue.empty()
+    except BaseException:
+        notification_hub.hub.unsubscribe(subscription)
+        raise
+
+    async def events():
+        try:
+            yield _sse("unread", {"count": unread})
+            for event in filter(None, map(_without_delta, pending)):
+                yield _sse(event["type"], event)
+            if not settled:
+                # Still busy after every re-read: let the client fetch the count itself
+                _drain(subscription)
+                yield _sse("resync", {})
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event["type"], event)
+                if subscription.overflowed and subscription.queue.empty():
+                    subscription.overflowed = False
+                    yield _sse("resync", {})
+        finally:
+            notification_hub.hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
@@ -1,17 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models import Tender, TenderStatus, User, UserRole
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request
+from typing import Optional
+from models import BidStatus, Tender, TenderStatus, User, UserRole
 from auth import get_current_user
-from datetime import datetime
-from blockchain import blockchain_manager
-from database import get_database
+from datetime import datetime, timezone
+from blockchain import get_blockchain_manager
+from database import get_db
 from bson import ObjectId
-import json
+from pagination import DEFAULT_LIMIT, MAX_LIMIT, paginate, projection
+import database
+import notifier
+import outbox
+import response_cache
+import scheduler
+import tender_meta
+import tracing
+import os
 
 router = APIRouter()
 
+# Ranked bids returned by an evaluation
+SHORTLIST_SIZE = int(os.getenv("EVALUATION_SHORTLIST_SIZE", "5"))
+
 @router.post("/")
-async def create_tender(tender_data: dict, current_user: User = Depends(get_current_user)):
+async def create_tender(
+    tender_data: dict,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     # Validate required fields
     required_fields = ["title", "description", "budget", "deadline", "requirements"]
     for field in required_fields:
@@ -20,11 +36,14 @@ async def create_tender(tender_data: dict, current_user: User = Depends(get_curr
     if current_user.role not in [UserRole.ADMIN, UserRole.ORGANIZER]:
         raise HTTPException(status_code=403, detail="Only admins and organizers can create tenders")
 
-    db = get_database()
     tenders_collection = db["tenders"]
 
-    deadline_dt = datetime.fromisoformat(tender_data["deadline"])
-    deadline_timestamp = int(deadline_dt.timestamp())
+    # Stored as naive UTC whatever offset the client sent, like every other timestamp
+    try:
+        deadline_dt = tender_meta.normalize_deadline(tender_data["deadline"])
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Field 'deadline' must be an ISO 8601 date and time")
+    deadline_timestamp = int(deadline_dt.replace(tzinfo=timezone.utc).timestamp())
 
     tender = Tender(
         title=tender_data["title"],
@@ -36,11 +55,7 @@ async def create_tender(tender_data: dict, current_user: User = Depends(get_curr
         status=TenderStatus.PUBLISHED
     )
 
-    # Store in MongoDB
-    result = tenders_collection.insert_one(tender.dict(by_alias=True))
-    tender_id = str(result.inserted_id)
-
-    # Create blockchain hash and submit to blockchain
+    # Create blockchain hash
     blockchain_data = {
         "title": tender_data["title"],
         "description": tender_data["description"],
@@ -51,58 +66,109 @@ async def create_tender(tender_data: dict, current_user: User = Depends(get_curr
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    tender_hash = blockchain_manager.create_tender_hash(blockchain_data)
+    tender_hash = get_blockchain_manager().create_tender_hash(blockchain_data)
+    tender.blockchain_hash = tender_hash
 
-    # Submit to blockchain if connected
-    blockchain_tx = None
-    blockchain_tender_id = None
-    if blockchain_manager.is_connected():
-        admin_address = current_user.wallet_address or "0x713A6B63f783269F0AD6b31868B971FE116cC1D7"
-        blockchain_tx = await blockchain_manager.submit_tender_to_blockchain(
-            {
-                **blockchain_data,
-                "deadline_timestamp": deadline_timestamp
-            }, admin_address
-        )
-        # Get the blockchain tender ID (sequential)
-        if blockchain_tx:
-            # The blockchain tender ID is the return value from createTender
-            # We need to get it from the contract
-            blockchain_tender_id = blockchain_manager.contract.functions.tenderCount().call()
+    # Store in MongoDB together with the outbox job that anchors it on chain;
+    # worker.py fills in blockchain_tx_hash and blockchain_tender_id later
+    async with database.transaction() as session:
+        result = await tenders_collection.insert_one(tender.dict(by_alias=True), session=session)
+        tender_id = str(result.inserted_id)
+        await outbox.enqueue(db, outbox.CREATE_TENDER, tender_id, {
+            "title": tender_data["title"],
+            "budget": tender_data["budget"],
+            "deadline_timestamp": deadline_timestamp,
+            "tender_hash": tender_hash,
+            "admin_address": current_user.wallet_address or outbox.DEFAULT_ADMIN_ADDRESS
+        }, session=session)
 
-    # Update MongoDB with blockchain info
-    update_data = {"blockchain_hash": tender_hash}
-    if blockchain_tx:
-        update_data["blockchain_tx_hash"] = blockchain_tx
-    if blockchain_tender_id:
-        update_data["blockchain_tender_id"] = blockchain_tender_id
+    await response_cache.bump(tender_id)
+    scheduler.deadline_scheduler.schedule(tender_id, deadline_dt)
 
-    tenders_collection.update_one({"_id": result.inserted_id}, {"$set": update_data})
+    # Tenders are created already published, so bidders hear about them now
+    await notifier.tender_published(db, background_tasks, tender_id, tender.dict())
 
     return {
         "message": "Tender created successfully",
         "tender_id": tender_id,
         "blockchain_hash": tender_hash,
-        "blockchain_tx": blockchain_tx,
-        "blockchain_tender_id": blockchain_tender_id
+        "blockchain_tx": None,
+        "blockchain_tender_id": None,
+        "blockchain_status": outbox.PENDING
     }
 
+# Fields left out of list responses with view=summary
+SUMMARY_EXCLUDES = ["description", "requirements"]
+
 @router.get("/")
-async def get_tenders():
-    db = get_database()
+async def get_tenders(
+    request: Request,
+    status: Optional[TenderStatus] = None,
+    admin_id: Optional[str] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None,
+    budget_min: Optional[float] = None,
+    budget_max: Optional[float] = None,
+    fields: Optional[str] = None,
+    view: str = "full",
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db=Depends(get_db)
+):
+    return await response_cache.cached_json(request, response_cache.LIST_SCOPE, lambda: _list_tenders(
+        db, status, admin_id, deadline_from, deadline_to, budget_min, budget_max, fields, view, limit, cursor
+    ))
+
+async def _list_tenders(db, status, admin_id, deadline_from, deadline_to, budget_min, budget_max, fields, view, limit, cursor):
     tenders_collection = db["tenders"]
-    tenders = list(tenders_collection.find({}))
+
+    query = {}
+    if status:
+        query["status"] = status.value
+    if admin_id:
+        query["admin_id"] = admin_id
+    if deadline_from or deadline_to:
+        query["deadline"] = {}
+        if deadline_from:
+            query["deadline"]["$gte"] = deadline_from
+        if deadline_to:
+            query["deadline"]["$lte"] = deadline_to
+    if budget_min is not None or budget_max is not None:
+        query["budget"] = {}
+        if budget_min is not None:
+            query["budget"]["$gte"] = budget_min
+        if budget_max is not None:
+            query["budget"]["$lte"] = budget_max
+
+    tenders, next_cursor = await paginate(
+        tenders_collection, query, "created_at", limit, cursor,
+        projection(fields, view, SUMMARY_EXCLUDES, "created_at")
+    )
     # Convert ObjectId to string for JSON serialization
     for tender in tenders:
         tender["_id"] = str(tender["_id"])
-    return {"tenders": tenders}
+    return {"tenders": tenders, "next_cursor": next_cursor}
+
+@router.get("/stats")
+async def get_tender_stats(current_user: User = Depends(get_current_user), db=Depends(get_db)):
+    """Dashboard totals without paging through the lists (admin)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can view tender statistics")
+    return {
+        "tenders": await db["tenders"].estimated_document_count(),
+        # Served by the status_deadline index
+        "published": await db["tenders"].count_documents({"status": TenderStatus.PUBLISHED.value}),
+        "bids": await db["bids"].estimated_document_count(),
+    }
 
 @router.get("/{tender_id}")
-async def get_tender(tender_id: str):
-    db = get_database()
+async def get_tender(tender_id: str, request: Request, db=Depends(get_db)):
+    return await response_cache.cached_json(request, f"tender:{tender_id}", lambda: _load_tender(db, tender_id))
+
+async def _load_tender(db, tender_id: str):
     tenders_collection = db["tenders"]
     try:
-        tender = tenders_collection.find_one({"_id": ObjectId(tender_id)})
+        tender = await tenders_collection.find_one({"_id": ObjectId(tender_id)})
     except:
         tender = None
     if not tender:
@@ -112,119 +178,179 @@ async def get_tender(tender_id: str):
     return tender
 
 @router.put("/{tender_id}/publish")
-async def publish_tender(tender_id: str, current_user: User = Depends(get_current_user)):
+async def publish_tender(
+    tender_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     if current_user.role not in [UserRole.ADMIN, UserRole.ORGANIZER]:
         raise HTTPException(status_code=403, detail="Only admins and organizers can publish tenders")
 
-    db = get_database()
     tenders_collection = db["tenders"]
-    result = tenders_collection.update_one(
-        {"_id": ObjectId(tender_id), "admin_id": str(current_user.id)},
-        {"$set": {"status": TenderStatus.PUBLISHED}}
+    tender = await tenders_collection.find_one_and_update(
+        {"_id": ObjectId(tender_id), "admin_id": str(current_user.id), "status": {"$ne": TenderStatus.PUBLISHED.value}},
+        # published_at lets the scheduler leader in another worker pick the tender up
+        {"$set": {"status": TenderStatus.PUBLISHED, "published_at": datetime.utcnow()}},
+        projection={"title": 1, "deadline": 1}
     )
-    if result.modified_count == 0:
+    if tender is None:
         raise HTTPException(status_code=404, detail="Tender not found or not authorized")
-    return {"message": "Tender published successfully"}
+    if isinstance(tender["deadline"], str):
+        await scheduler.migrate_string_deadlines(db, {"_id": ObjectId(tender_id)})
+    await tender_meta.invalidate(tender_id)
+    await response_cache.bump(tender_id)
+    scheduler.deadline_scheduler.schedule(tender_id, tender["deadline"])
+
+    job_id = await notifier.tender_published(db, background_tasks, tender_id, tender)
+    return {"message": "Tender published successfully", "notification_job_id": job_id}
 
 @router.put("/{tender_id}/close")
-async def close_tender(tender_id: str, current_user: User = Depends(get_current_user)):
+async def close_tender(
+    tender_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can close tenders")
 
-    db = get_database()
     tenders_collection = db["tenders"]
 
-    # Close tender in database
-    result = tenders_collection.update_one(
-        {"_id": ObjectId(tender_id)},
-        {"$set": {"status": TenderStatus.CLOSED}}
-    )
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="Tender not found")
+    # Close tender in database and queue the on-chain close through the outbox
+    async with database.transaction() as session:
+        tender = await tenders_collection.find_one_and_update(
+            {"_id": ObjectId(tender_id), "status": {"$ne": TenderStatus.CLOSED.value}},
+            {"$set": {"status": TenderStatus.CLOSED}},
+            projection={"title": 1},
+            session=session
+        )
+        if tender is None:
+            raise HTTPException(status_code=404, detail="Tender not found")
 
-    # Close tender on blockchain
-    blockchain_tx = None
-    if blockchain_manager.is_connected():
-        admin_address = current_user.wallet_address or "0x713A6B63f783269F0AD6b31868B971FE116cC1D7"
-        tender = tenders_collection.find_one({"_id": ObjectId(tender_id)})
-        if tender and tender.get("blockchain_tender_id"):
-            blockchain_tx = await blockchain_manager.close_tender_on_blockchain(
-                tender["blockchain_tender_id"], admin_address
-            )
+        admin_address = current_user.wallet_address or outbox.DEFAULT_ADMIN_ADDRESS
+        await outbox.enqueue(db, outbox.CLOSE_TENDER, tender_id, {"admin_address": admin_address}, session=session)
+
+    await tender_meta.invalidate(tender_id)
+    await response_cache.bump(tender_id)
+    job_id = await notifier.tender_closed(db, background_tasks, tender_id, tender)
 
     return {
         "message": "Tender closed successfully",
-        "blockchain_tx": blockchain_tx
+        "blockchain_tx": None,
+        "blockchain_status": outbox.PENDING,
+        "notification_job_id": job_id
     }
 
 @router.put("/{tender_id}/evaluate")
-async def evaluate_tender(tender_id: str, evaluation_data: dict, current_user: User = Depends(get_current_user)):
+async def evaluate_tender(
+    tender_id: str,
+    evaluation_data: dict,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can evaluate tenders")
 
-    db = get_database()
     tenders_collection = db["tenders"]
     bids_collection = db["bids"]
 
     # Check if tender exists and is closed
-    tender = tenders_collection.find_one({"_id": ObjectId(tender_id)})
+    with tracing.span("tender.fetch", tender_id=tender_id):
+        tender = await tenders_collection.find_one({"_id": ObjectId(tender_id)}, {"title": 1, "status": 1})
     if not tender:
         raise HTTPException(status_code=404, detail="Tender not found")
     if tender.get("status") != TenderStatus.CLOSED:
         raise HTTPException(status_code=400, detail="Tender must be closed before evaluation")
 
-    # Check if there are any bids for this tender
-    bids = list(bids_collection.find({"tender_id": tender_id}))
-    if len(bids) == 0:
+    # Rank on the server: the sort is bounded by the limit, so this costs the same for 5 bids or 50,000
+    with tracing.span("bids.rank", limit=SHORTLIST_SIZE):
+        shortlist = await bids_collection.aggregate([
+            {"$match": {"tender_id": tender_id, "status": {"$ne": BidStatus.REJECTED.value}, "amount": {"$gt": 0}}},
+            {"$sort": {"amount": 1, "submitted_at": 1, "_id": 1}},
+            {"$limit": SHORTLIST_SIZE},
+            {"$project": {"bidder_id": 1, "amount": 1, "submitted_at": 1}}
+        ]).to_list(length=SHORTLIST_SIZE)
+    if not shortlist:
         raise HTTPException(status_code=400, detail="No bids submitted for this tender. Cannot evaluate.")
 
-    # Get the winning bid ID from the request
+    # The admin may pick any valid bid; without a choice the top-ranked bid wins
     winning_bid_id = evaluation_data.get("winning_bid_id")
-    if not winning_bid_id:
-        raise HTTPException(status_code=400, detail="winning_bid_id is required")
-
-    # Find the winning bid
-    winning_bid = bids_collection.find_one({"_id": ObjectId(winning_bid_id), "tender_id": tender_id})
-    if not winning_bid:
-        raise HTTPException(status_code=404, detail="Winning bid not found for this tender")
+    if winning_bid_id:
+        winning_bid = next((bid for bid in shortlist if str(bid["_id"]) == winning_bid_id), None)
+        if winning_bid is None and ObjectId.is_valid(winning_bid_id):
+            winning_bid = await bids_collection.find_one(
+                {"_id": ObjectId(winning_bid_id), "tender_id": tender_id, "status": {"$ne": BidStatus.REJECTED.value}},
+                {"bidder_id": 1, "amount": 1, "submitted_at": 1}
+            )
+        if not winning_bid:
+            raise HTTPException(status_code=404, detail="Winning bid not found for this tender")
+    else:
+        winning_bid = shortlist[0]
+        winning_bid_id = str(winning_bid["_id"])
 
     # Get bidder information
     users_collection = db["users"]
-    bidder = users_collection.find_one({"_id": ObjectId(winning_bid["bidder_id"])})
+    with tracing.span("bidder.fetch"):
+        bidder = await users_collection.find_one({"_id": ObjectId(winning_bid["bidder_id"])})
     if not bidder:
         raise HTTPException(status_code=404, detail="Bidder not found")
 
-    # Update tender with winner information and set status to evaluated
-    tenders_collection.update_one(
-        {"_id": ObjectId(tender_id)},
-        {"$set": {
-            "status": TenderStatus.EVALUATED,
-            "winner_address": bidder.get("wallet_address"),
-            "winning_amount": winning_bid["amount"],
-            "winning_bid_id": winning_bid_id,
-            "winner_bidder_id": str(bidder["_id"]),
-            "evaluation_tx_hash": None  # For now, no blockchain tx
-        }}
-    )
+    # Tender, winning bid and every other bid change together or not at all
+    with tracing.span("evaluation.commit", winning_bid_id=winning_bid_id):
+        async with database.transaction() as session:
+            # Guarded on CLOSED so two concurrent evaluations cannot both win
+            evaluated = await tenders_collection.find_one_and_update(
+                {"_id": ObjectId(tender_id), "status": TenderStatus.CLOSED.value},
+                {"$set": {
+                    "status": TenderStatus.EVALUATED,
+                    "winner_address": bidder.get("wallet_address"),
+                    "winning_amount": winning_bid["amount"],
+                    "winning_bid_id": winning_bid_id,
+                    "winner_bidder_id": str(bidder["_id"]),
+                    "evaluation_tx_hash": None  # For now, no blockchain tx
+                }},
+                projection={"_id": 1},
+                session=session
+            )
+            if evaluated is None:
+                raise HTTPException(status_code=409, detail="Tender has already been evaluated")
+
+            # Mark the winning bid
+            await bids_collection.update_one(
+                {"_id": winning_bid["_id"]},
+                {"$set": {"is_winner": True, "status": BidStatus.SELECTED}},
+                session=session
+            )
 
-    # Mark the winning bid
-    bids_collection.update_one(
-        {"_id": winning_bid["_id"]},
-        {"$set": {"is_winner": True, "status": "selected"}}
-    )
+            # Mark other bids as rejected
+            await bids_collection.update_many(
+                {"tender_id": tender_id, "_id": {"$ne": winning_bid["_id"]}},
+                {"$set": {"status": BidStatus.REJECTED}},
+                session=session
+            )
 
-    # Mark other bids as rejected
-    bids_collection.update_many(
-        {"tender_id": tender_id, "_id": {"$ne": winning_bid["_id"]}},
-        {"$set": {"status": "rejected"}}
-    )
+    await response_cache.bump(tender_id)
+    job_ids = await notifier.tender_evaluated(db, background_tasks, tender_id, tender, winning_bid)
 
     return {
         "message": "Tender evaluation completed",
+        "notification_job_ids": job_ids,
         "winner": {
             "bidder_name": bidder.get("username"),
             "bidder_email": bidder.get("email"),
             "winning_amount": winning_bid["amount"],
             "wallet_address": bidder.get("wallet_address")
-        }
+        },
+        "shortlist": [
+            {
+                "rank": rank,
+                "bid_id": str(bid["_id"]),
+                "bidder_id": bid["bidder_id"],
+                "amount": bid["amount"],
+                "submitted_at": bid.get("submitted_at")
+            }
+            for rank, bid in enumerate(shortlist, start=1)
+        ]
     }
@@ -0,0 +1,256 @@
+"""
+Closes published tenders when their deadline passes.
+
+Every API worker runs a DeadlineScheduler, but only the one holding the
+`tender_deadlines` lease in `scheduler_leases` acts; the others retry the
+lease every SCHEDULER_LEASE_SECONDS / 2 and take over if the holder dies.
+
+The leader keeps a heap of (deadline, tender id) for published tenders due
+within SCHEDULER_HORIZON seconds. It is loaded once from the status_deadline
+index and then refreshed incrementally every SCHEDULER_REFRESH_INTERVAL
+seconds: each refresh only fetches tenders whose deadline has just entered
+the horizon, plus tenders created or published since the previous refresh.
+created_at and published_at are stamped by the API before the write lands, so
+that window reaches SCHEDULER_REFRESH_OVERLAP seconds further back. Tenders
+created or published by this process are pushed in directly via schedule().
+
+Older tenders may store their deadline as an ISO string, which the date range
+queries never match. The leader converts those of published tenders before
+its full load; `python scheduler.py migrate` converts all of them.
+
+Due tenders are closed SCHEDULER_BATCH_SIZE at a time with one guarded
+update_many, in the same transaction as their CLOSE_TENDER outbox jobs. The
+outbox worker pipelines those closeTender calls into shared blocks
+(OUTBOX_BATCH_SIZE).
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models import TenderStatus
+import database
+import notifier
+import outbox
+import response_cache
+import tender_meta
+
+logger = logging.getLogger(__name__)
+
+LEASES_COLLECTION = "scheduler_leases"
+LEASE_NAME = "tender_deadlines"
+
+HORIZON = float(os.getenv("SCHEDULER_HORIZON", "3600"))
+REFRESH_INTERVAL = float(os.getenv("SCHEDULER_REFRESH_INTERVAL", "30"))
+BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "100"))
+LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+# Longest expected gap between stamping created_at/published_at and the write
+# being visible (request time, transaction, clock skew between API workers)
+REFRESH_OVERLAP = float(os.getenv("SCHEDULER_REFRESH_OVERLAP", "60"))
+
+async def acquire_lease(db, owner: str, name: str = LEASE_NAME, seconds: float = LEASE_SECONDS) -> bool:
+    """Take or renew a named lease; False while another owner holds it"""
+    now = datetime.utcnow()
+    try:
+        lease = await db[LEASES_COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The lease exists and is held by someone else, so the upsert collided
+        return False
+    return lease is not None and lease["owner"] == owner
+
+async def release_lease(db, owner: str, name: str = LEASE_NAME):
+    await db[LEASES_COLLECTION].update_one({"_id": name, "owner": owner}, {"$set": {"expires_at": datetime.utcnow()}})
+
+async def close_due_tenders(db, tender_ids: list, now: datetime = None) -> list:
+    """
+    Close the given tenders if they are still published and past their
+    deadline, and queue their on-chain close. Returns the tenders this call
+    actually closed (an admin may have closed some already).
+    """
+    now = now or datetime.utcnow()
+    run_id = uuid.uuid4().hex
+    tenders = db["tenders"]
+    async with database.transaction() as session:
+        await tenders.update_many(
+            {"_id": {"$in": tender_ids}, "status": TenderStatus.PUBLISHED.value, "deadline": {"$lte": now}},
+            {"$set": {"status": TenderStatus.CLOSED, "closed_at": now, "close_run_id": run_id}},
+            session=session
+        )
+        # The run id tells which of the tenders this update closed
+        closed = await tenders.find(
+            {"_id": {"$in": tender_ids}, "close_run_id": run_id}, {"title": 1}, session=session
+        ).to_list(length=None)
+        for tender in closed:
+            await outbox.enqueue(db, outbox.CLOSE_TENDER, str(tender["_id"]), {
+                "admin_address": outbox.DEFAULT_ADMIN_ADDRESS
+            }, session=session)
+    return closed
+
+async def migrate_string_deadlines(db, query: dict = None) -> int:
+    """Store deadlines saved as ISO strings as naive UTC dates; returns how many were converted"""
+    converted = 0
+    tenders = db["tenders"]
+    async for tender in tenders.find({**(query or {}), "deadline": {"$type": "string"}}, {"deadline": 1}):
+        try:
+            deadline = tender_meta.normalize_deadline(tender["deadline"])
+        except ValueError:
+            logger.warning("Tender %s has an unreadable deadline %r", tender["_id"], tender["deadline"])
+            continue
+        result = await tenders.update_one({"_id": tender["_id"], "deadline": tender["deadline"]}, {"$set": {"deadline": deadline}})
+        converted += result.modified_count
+    return converted
+
+class DeadlineScheduler:
+    def __init__(self, owner: str = None):
+        self.owner = owner or f"{outbox.WORKER_ID}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._heap = []
+        self._queued = set()
+        self._loaded_until: Optional[datetime] = None
+        self._last_refresh: Optional[datetime] = None
+        self._wakeup = asyncio.Event()
+        self.closed_count = 0
+
+    def schedule(self, tender_id, deadline: datetime):
+        """Register a tender created or published by this process, if the leader should see it before the next refresh"""
+        try:
+            deadline = tender_meta.normalize_deadline(deadline)
+        except ValueError:
+            logger.warning("Not scheduling tender %s: unreadable deadline %r", tender_id, deadline)
+            return
+        if self.is_leader and self._loaded_until and deadline <= self._loaded_until:
+            self._push(deadline, str(tender_id))
+            self._wakeup.set()
+
+    def _push(self, deadline: datetime, tender_id: str):
+        # Overlapping refreshes find the same tenders again
+        if tender_id not in self._queued:
+            self._queued.add(tender_id)
+            heapq.heappush(self._heap, (deadline, tender_id))
+
+    def _reset(self):
+        self._heap = []
+        self._queued = set()
+        self._loaded_until = None
+        self._last_refresh = None
+
+    async def refresh(self, db, now: datetime = None):
+        """Load deadlines that entered the horizon and tenders created since the last refresh"""
+        now = now or datetime.utcnow()
+        until = now + timedelta(seconds=HORIZON)
+        published = TenderStatus.PUBLISHED.value
+        if self._loaded_until is None:
+            converted = await migrate_string_deadlines(db, {"status": published})
+            if converted:
+                logger.info("Converted %s string deadlines to dates", converted)
+            query = {"status": published, "deadline": {"$lte": until}}
+        else:
+            since = self._last_refresh - timedelta(seconds=REFRESH_OVERLAP)
+            query = {"$or": [
+                {"status": published, "deadline": {"$gt": self._loaded_until, "$lte": until}},
+                {"status": published, "created_at": {"$gte": since}, "deadline": {"$lte": until}},
+                {"status": published, "published_at": {"$gte": since}, "deadline": {"$lte": until}},
+            ]}
+        async for tender in db["tenders"].find(query, {"deadline": 1}).sort("deadline", ASCENDING):
+            self._push(tender["deadline"], str(tender["_id"]))
+        self._loaded_until = until
+        self._last_refresh = now
+
+    def _pop_due(self, now: datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < BATCH_SIZE:
+            tender_id = heapq.heappop(self._heap)[1]
+            self._queued.discard(tender_id)
+            due.append(tender_id)
+        return due
+
+    async def tick(self, db) -> float:
+        """One scheduling step; returns how long to sleep before the next one"""
+        was_leader = self.is_leader
+        self.is_leader = await acquire_lease(db, self.owner)
+        if not self.is_leader:
+            if was_leader:
+                logger.info("Lost the deadline scheduler lease")
+            self._reset()
+            return LEASE_SECONDS / 2
+
+        now = datetime.utcnow()
+        if not was_leader or self._last_refresh is None or (now - self._last_refresh).total_seconds() >= REFRESH_INTERVAL:
+            await self.refresh(db, now)
+
+        due = self._pop_due(now)
+        if due:
+            closed = await close_due_tenders(db, [ObjectId(tender_id) for tender_id in due], now)
+            self.closed_count += len(closed)
+            for tender in closed:
+                await tender_meta.invalidate(str(tender["_id"]))
+                await response_cache.bump(str(tender["_id"]))
+                await notifier.tender_closed(db, None, str(tender["_id"]), tender)
+            if closed:
+                logger.info("Closed %s tenders past their deadline", len(closed))
+            if len(due) == BATCH_SIZE:
+                return 0
+
+        until_refresh = REFRESH_INTERVAL - (datetime.utcnow() - self._last_refresh).total_seconds()
+        sleep = min(until_refresh, LEASE_SECONDS / 2)
+        if self._heap:
+            sleep = min(sleep, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+        return max(0.0, sleep)
+
+    async def run(self, db, stop: asyncio.Event):
+        """Schedule until `stop` is set, then hand the lease over"""
+        try:
+            while not stop.is_set():
+                self._wakeup.clear()
+                try:
+                    sleep = await self.tick(db)
+                except Exception as e:
+                    logger.warning("Deadline scheduler step failed: %s", e)
+                    # Tenders popped by the failed step are picked up again by a full reload
+                    self._reset()
+                    sleep = LEASE_SECONDS / 2
+                stopped = asyncio.ensure_future(stop.wait())
+                woken = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({stopped, woken}, timeout=sleep, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    stopped.cancel()
+                    woken.cancel()
+        finally:
+            if self.is_leader:
+                self.is_leader = False
+                await release_lease(db, self.owner)
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.is_leader,
+            "scheduled": len(self._heap),
+            "next_deadline": self._heap[0][0] if self._heap else None,
+            "closed": self.closed_count,
+        }
+
+deadline_scheduler = DeadlineScheduler()
+
+async def _main():
+    try:
+        converted = await migrate_string_deadlines(database.get_database())
+        print(f"Converted {converted} string deadlines to dates")
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("usage: python scheduler.py migrate")
+    asyncio.run(_main())
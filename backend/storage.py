@@ -0,0 +1,149 @@
+"""
+Content-addressed storage for bid documents.
+
+Starlette parses a multipart request completely before the route runs, and
+spools each file part to a temporary file. RequestSizeLimitMiddleware therefore
+caps the request body (UPLOAD_MAX_REQUEST_BYTES) while it is being received:
+at once from Content-Length, and by counting the bytes of a chunked body. The
+per-document and per-bid caps are checked afterwards, when the spooled parts
+are copied into storage.
+
+Copies are made in UPLOAD_CHUNK_SIZE pieces while the SHA-256 is computed, so
+a large file is never held in memory. File I/O and hashing run in a worker
+thread, off the event loop. The finished file is named after its digest, which
+means identical documents are stored once however many bids attach them, and a
+file's name is also its integrity check.
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import List
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+import tracing
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+MAX_BID_BYTES = int(os.getenv("UPLOAD_MAX_BID_BYTES", str(200 * 1024 * 1024)))
+# Whole request body: a bid's documents plus room for its form fields and multipart framing
+MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(MAX_BID_BYTES + 1024 * 1024)))
+
+REQUEST_TOO_LARGE = "Request body exceeds the upload size limit"
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware answering 413 once a request body is larger than MAX_REQUEST_BYTES"""
+
+    def __init__(self, app, max_bytes: int = None):
+        self.app = app
+        self.max_bytes = MAX_REQUEST_BYTES if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for key, value in scope["headers"]:
+            if key == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                # Refused before any of the body is read
+                await JSONResponse({"detail": REQUEST_TOO_LARGE}, status_code=413)(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the body parser, so the route's exception handling answers 413
+                    raise HTTPException(status_code=413, detail=REQUEST_TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def ensure_upload_dir():
+    """Create UPLOAD_DIR; called at startup rather than on import"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+def document_path(digest: str) -> str:
+    return os.path.join(UPLOAD_DIR, digest)
+
+def _write_chunk(f, hasher, chunk: bytes):
+    hasher.update(chunk)
+    f.write(chunk)
+
+def _commit(tmp_path: str, final_path: str):
+    """Move a finished upload into place unless identical content is already stored"""
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, final_path)
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def store_upload(upload: UploadFile, max_bytes: int = MAX_FILE_BYTES, limit_detail: str = None) -> dict:
+    """Copy one parsed upload into storage and return its metadata"""
+    with tracing.span("storage.write", filename=upload.filename) as span:
+        document = await _store_upload(upload, max_bytes, limit_detail)
+        span.set_attribute("size", document["size"])
+        return document
+
+async def _store_upload(upload: UploadFile, max_bytes: int, limit_detail: str) -> dict:
+    tmp_path = os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4().hex}")
+    hasher = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=limit_detail or f"Document '{upload.filename}' exceeds the upload size limit"
+                )
+            await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(_remove, tmp_path)
+        raise
+    await asyncio.to_thread(f.close)
+
+    digest = hasher.hexdigest()
+    await asyncio.to_thread(_commit, tmp_path, document_path(digest))
+    return {
+        "filename": upload.filename,
+        "content_type": upload.content_type,
+        "size": size,
+        "sha256": digest
+    }
+
+async def store_bid_documents(uploads: List[UploadFile]) -> List[dict]:
+    """
+    Store every document of a bid, enforcing the per-file and per-bid caps.
+
+    Documents already stored are kept if a later one is rejected: another bid
+    may share them, and an unreferenced file is simply reused by the next
+    upload of the same content.
+    """
+    stored = []
+    total = 0
+    for upload in uploads:
+        remaining = MAX_BID_BYTES - total
+        if remaining < MAX_FILE_BYTES:
+            document = await store_upload(upload, remaining, "Bid documents exceed the total upload size limit")
+        else:
+            document = await store_upload(upload)
+        stored.append(document)
+        total += document["size"]
+    return stored
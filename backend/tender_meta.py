@@ -0,0 +1,65 @@
+"""
+Short-lived cache of what submit_bid needs to know about a tender.
+
+Only tenders that are accepting bids are cached, as {"deadline_ts": <epoch
+seconds>}, so the hot path compares two floats instead of loading and parsing
+the tender on every bid. A tender's deadline never changes; its status does,
+so close/evaluate invalidate the entry and TENDER_CACHE_TTL bounds how long
+another worker (with the in-process backend) can still see it open. The
+deadline check itself never depends on the cache being fresh.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from bson import ObjectId
+from cache import make_cache
+from models import TenderStatus
+
+tender_cache = make_cache(
+    "tender_meta",
+    maxsize=int(os.getenv("TENDER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TENDER_CACHE_TTL", "5"))
+)
+
+def normalize_deadline(deadline) -> datetime:
+    """
+    A deadline as naive UTC, the form stored in Mongo and compared with
+    datetime.utcnow(). Accepts ISO strings and datetimes with or without an
+    offset; raises ValueError for anything else.
+    """
+    if isinstance(deadline, str):
+        # Request bodies, and tenders stored before deadlines were saved as dates
+        deadline = datetime.fromisoformat(deadline)
+    if not isinstance(deadline, datetime):
+        raise ValueError(f"Invalid deadline: {deadline!r}")
+    if deadline.tzinfo is not None:
+        deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    return deadline
+
+def _timestamp(deadline) -> float:
+    return normalize_deadline(deadline).replace(tzinfo=timezone.utc).timestamp()
+
+async def get_open_tender(db, tender_id: str) -> Optional[dict]:
+    """{"deadline_ts"} for a published tender, or None if it does not exist or is not published"""
+    meta = await tender_cache.get(tender_id)
+    if meta is not None:
+        return meta
+    if not ObjectId.is_valid(tender_id):
+        return None
+    tender = await db["tenders"].find_one(
+        {"_id": ObjectId(tender_id), "status": TenderStatus.PUBLISHED.value}, {"deadline": 1}
+    )
+    if tender is None:
+        return None
+    meta = {"deadline_ts": _timestamp(tender["deadline"])}
+    await tender_cache.set(tender_id, meta)
+    return meta
+
+def is_past_deadline(meta: dict) -> bool:
+    return time.time() > meta["deadline_ts"]
+
+async def invalidate(tender_id: str):
+    """Drop a cached tender; call whenever it stops accepting bids"""
+    await tender_cache.delete(tender_id)
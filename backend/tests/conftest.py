@@ -0,0 +1,48 @@
+"""
+Shared fixtures. Tests that need MongoDB use mongomock-motor unless the test
+says otherwise, so they run without a server:
+
+    cd backend && python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mongomock_motor import AsyncMongoMockClient
+
+import cache
+import database
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database behind database.get_database()"""
+    database.close()
+    database._client = AsyncMongoMockClient()
+    for registered in cache._registry.values():
+        if isinstance(registered, cache.TTLCache):
+            registered._data.clear()
+    yield database.get_database()
+    database._client = None
+
+@pytest.fixture
+def client(db, tmp_path, monkeypatch):
+    """A TestClient for the whole app, running its lifespan against `db` (uploads go to tmp_path)"""
+    from fastapi.testclient import TestClient
+    import main
+    import storage
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+def login(client, username, role="bidder", wallet_address=None):
+    """Register `username` (password "pw") and return its Authorization header"""
+    client.post("/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": "pw",
+        "role": role, "wallet_address": wallet_address
+    })
+    token = client.post("/auth/login", data={"username": username, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
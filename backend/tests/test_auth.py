@@ -0,0 +1,25 @@
+"""Resolved-user cache"""
+
+import asyncio
+
+import auth
+from conftest import login
+
+def test_cached_principal_has_no_password_hash(client):
+    headers = login(client, "alice")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    cached = asyncio.run(auth.user_cache.get("alice"))
+    assert cached is not None
+    assert "password" not in cached
+    assert set(cached) <= set(auth.PRINCIPAL_FIELDS)
+    assert client.get("/auth/me", headers=headers).json()["password"] is None
+
+def test_update_user_drops_the_cached_principal(client, db):
+    headers = login(client, "bob")
+    client.get("/auth/me", headers=headers)
+    assert client.get("/auth/me", headers=headers).json()["wallet_address"] is None
+
+    async def set_wallet():
+        await auth.update_user(db["users"], "bob", {"$set": {"wallet_address": "0xabc"}})
+    client.portal.call(set_wallet)
+    assert client.get("/auth/me", headers=headers).json()["wallet_address"] == "0xabc"
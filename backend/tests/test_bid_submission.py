@@ -0,0 +1,58 @@
+"""Bid submission retries with an Idempotency-Key"""
+
+import json
+
+import pytest
+
+from conftest import login
+import outbox
+
+WALLET = "0x" + "ab" * 20
+
+@pytest.fixture
+def tender_id(client):
+    admin = login(client, "admin", role="admin")
+    return client.post("/tenders/", json={
+        "title": "T", "description": "d", "budget": 100, "deadline": "2099-01-01T00:00:00", "requirements": "r"
+    }, headers=admin).json()["tender_id"]
+
+def _submit(client, tender_id, headers, amount=5, key=None):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post(f"/bids/{tender_id}", data={"bid_data": json.dumps({"amount": amount})}, headers=headers)
+
+def test_replay_returns_the_original_bid(client, db, tender_id):
+    bidder = login(client, "frank")
+    first = _submit(client, tender_id, bidder, key="retry-1")
+    replay = _submit(client, tender_id, bidder, key="retry-1")
+    assert first.status_code == replay.status_code == 200
+    assert replay.json()["bid_id"] == first.json()["bid_id"]
+    assert replay.json()["blockchain_hash"] == first.json()["blockchain_hash"]
+    assert client.portal.call(db["bids"].count_documents, {}) == 1
+
+def test_replay_of_an_anchored_bid_enqueues_one_job(client, db, tender_id):
+    bidder = login(client, "frank", wallet_address=WALLET)
+    first = _submit(client, tender_id, bidder, key="retry-1").json()
+    replay = _submit(client, tender_id, bidder, key="retry-1").json()
+    assert replay["bid_id"] == first["bid_id"]
+    assert replay["blockchain_status"] == first["blockchain_status"]
+    jobs = {"kind": outbox.SUBMIT_BID}
+    assert client.portal.call(db[outbox.OUTBOX_COLLECTION].count_documents, jobs) == 1
+
+def test_key_reused_for_a_different_bid_is_rejected(client, db, tender_id):
+    bidder = login(client, "frank")
+    assert _submit(client, tender_id, bidder, amount=5, key="retry-1").status_code == 200
+    mismatch = _submit(client, tender_id, bidder, amount=6, key="retry-1")
+    assert mismatch.status_code == 422
+    assert client.portal.call(db["bids"].count_documents, {}) == 1
+
+def test_keys_are_scoped_to_the_bidder(client, db, tender_id):
+    first = _submit(client, tender_id, login(client, "frank"), key="retry-1").json()
+    second = _submit(client, tender_id, login(client, "grace"), key="retry-1").json()
+    assert first["bid_id"] != second["bid_id"]
+
+def test_requests_without_a_key_are_not_deduplicated(client, db, tender_id):
+    bidder = login(client, "frank")
+    assert _submit(client, tender_id, bidder).status_code == 200
+    assert _submit(client, tender_id, bidder).status_code == 200
+    assert client.portal.call(db["bids"].count_documents, {}) == 2
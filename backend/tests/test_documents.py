@@ -0,0 +1,97 @@
+"""Bid document downloads: authorization, signed links, ranges and conditional requests"""
+
+import json
+import time
+
+import pytest
+
+from conftest import login
+from routes import documents
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+@pytest.fixture
+def document(client):
+    """(url, bidder headers, admin headers, other bidder headers) of one uploaded PDF"""
+    admin = login(client, "admin", role="admin")
+    bidder = login(client, "frank")
+    other = login(client, "grace")
+    tender_id = client.post("/tenders/", json={
+        "title": "T", "description": "d", "budget": 100, "deadline": "2099-01-01T00:00:00", "requirements": "r"
+    }, headers=admin).json()["tender_id"]
+    bid_id = client.post(
+        f"/bids/{tender_id}", data={"bid_data": json.dumps({"amount": 5})},
+        files=[("documents", ("offer.pdf", CONTENT, "application/pdf"))], headers=bidder
+    ).json()["bid_id"]
+    return f"/documents/{bid_id}/0", bidder, admin, other
+
+def test_owner_and_admin_can_read_other_bidders_cannot(client, document):
+    url, bidder, admin, other = document
+    response = client.get(url, headers=bidder)
+    assert response.status_code == 200 and response.content == CONTENT
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert response.headers["Content-Security-Policy"] == "sandbox"
+    assert client.get(url, headers=admin).status_code == 200
+    assert client.get(url, headers=other).status_code == 403
+    assert client.post(f"{url}/link", headers=other).status_code == 403
+    assert client.get(url).status_code == 401
+
+def test_signed_link(client, document):
+    url, bidder, _, _ = document
+    link = client.post(f"{url}/link", headers=bidder).json()
+    assert client.get(link["url"]).content == CONTENT
+
+    signature = link["url"].split("signature=")[1]
+    tampered = link["url"].replace(signature, ("0" if signature[0] != "0" else "1") + signature[1:])
+    assert client.get(tampered).status_code == 403
+    # A signature is bound to one document
+    assert client.get(link["url"].replace("/0?", "/1?")).status_code == 403
+
+    expired = int(time.time()) - 1
+    bid_id = url.split("/")[2]
+    stale = f"{url}?expires={expired}&signature={documents._link_signature(bid_id, 0, expired)}"
+    assert client.get(stale).status_code == 403
+
+def test_ranges(client, document):
+    url, bidder, _, _ = document
+    partial = client.get(url, headers={**bidder, "Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == CONTENT[10:20]
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(CONTENT)}"
+
+    suffix = client.get(url, headers={**bidder, "Range": "bytes=-4"})
+    assert suffix.status_code == 206 and suffix.content == CONTENT[-4:]
+
+    # Multiple ranges are not supported: the whole document is served
+    multi = client.get(url, headers={**bidder, "Range": "bytes=0-1,5-6"})
+    assert multi.status_code == 200 and multi.content == CONTENT
+
+    out_of_bounds = client.get(url, headers={**bidder, "Range": f"bytes={len(CONTENT)}-"})
+    assert out_of_bounds.status_code == 416
+    assert out_of_bounds.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+def test_conditional_requests(client, document):
+    url, bidder, _, _ = document
+    etag = client.get(url, headers=bidder).headers["ETag"]
+    assert client.get(url, headers={**bidder, "If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={**bidder, "If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get(url, headers={**bidder, "If-None-Match": '"other"'}).status_code == 200
+
+    # If-Range: the range applies only while the validator matches
+    matching = client.get(url, headers={**bidder, "Range": "bytes=0-9", "If-Range": etag})
+    assert matching.status_code == 206
+    stale = client.get(url, headers={**bidder, "Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == CONTENT
+
+def test_active_content_is_downloaded_not_rendered(client, document):
+    url, bidder, admin, _ = document
+    tender_id = client.post("/tenders/", json={
+        "title": "U", "description": "d", "budget": 100, "deadline": "2099-01-01T00:00:00", "requirements": "r"
+    }, headers=admin).json()["tender_id"]
+    bid_id = client.post(
+        f"/bids/{tender_id}", data={"bid_data": json.dumps({"amount": 5})},
+        files=[("documents", ("page.html", b"<script>alert(1)</script>", "text/html"))], headers=bidder
+    ).json()["bid_id"]
+    response = client.get(f"/documents/{bid_id}/0", headers=bidder)
+    assert response.headers["Content-Type"] == "application/octet-stream"
+    assert response.headers["Content-Disposition"].startswith("attachment")
@@ -0,0 +1,109 @@
+"""Contract event indexer against an eth-tester chain and mongomock-motor"""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+import indexer
+from blockchain import BlockchainManager
+
+COMPILED = os.path.join(os.path.dirname(__file__), "..", "..", "contracts", "compiled_contract.json")
+
+@pytest.fixture
+def manager():
+    from web3 import EthereumTesterProvider
+    manager = BlockchainManager(provider=EthereumTesterProvider(), deployment_file=None, max_concurrency=1)
+    manager.poll_interval = 0.01
+    with open(COMPILED) as f:
+        compiled = json.load(f)["contracts"]["TenderContract.sol"]["TenderContract"]
+    contract = manager.w3.eth.contract(abi=compiled["abi"], bytecode=compiled["evm"]["bytecode"]["object"])
+    tx_hash = contract.constructor().transact({"from": manager.w3.eth.accounts[0]})
+    address = manager.w3.eth.wait_for_transaction_receipt(tx_hash).contractAddress
+    manager.set_contract(address, compiled["abi"])
+    yield manager
+    manager._executor.shutdown(wait=False)
+
+async def _sync(db, manager):
+    while not await indexer.sync_once(db, manager):
+        pass
+
+async def _tender_with_bids(manager, amounts):
+    accounts = manager.w3.eth.accounts
+    created = await manager.submit_tender_to_blockchain(
+        {"title": "Bridge", "budget": 100, "deadline_timestamp": int(time.time()) + 3600}, accounts[0]
+    )
+    tender_id = created["blockchain_tender_id"]
+    for i, amount in enumerate(amounts):
+        await manager.submit_bid_to_blockchain(tender_id, amount, accounts[1 + i])
+    return tender_id
+
+def _bids(db, tender_id):
+    return db[indexer.BIDS_COLLECTION].find({"tender_id": tender_id}).sort(
+        [("block_number", 1), ("log_index", 1)]
+    ).to_list(None)
+
+def test_projection_from_call_data(db, manager):
+    async def run():
+        tender_id = await _tender_with_bids(manager, [70, 60])
+        await _sync(db, manager)
+        return await db[indexer.TENDERS_COLLECTION].find_one({"_id": tender_id}), await _bids(db, tender_id)
+    tender, bids = asyncio.run(run())
+    assert (tender["title"], tender["budget"], tender["is_active"]) == ("Bridge", 100, True)
+    assert [bid["amount"] for bid in bids] == [70, 60]
+    assert all(bid["timestamp"] > 0 for bid in bids)
+
+def test_calls_that_do_not_decode_fall_back_to_contract_state(db, manager, monkeypatch):
+    def not_our_function(data):
+        raise ValueError("Could not find any function with matching selector")
+    monkeypatch.setattr(manager.contract, "decode_function_input", not_our_function)
+
+    async def run():
+        tender_id = await _tender_with_bids(manager, [50, 40])
+        await _sync(db, manager)
+        return await db[indexer.TENDERS_COLLECTION].find_one({"_id": tender_id}), await _bids(db, tender_id)
+    tender, bids = asyncio.run(run())
+    assert (tender["title"], tender["budget"]) == ("Bridge", 100)
+    assert [bid["amount"] for bid in bids] == [50, 40]
+
+def test_undecodable_event_is_skipped_not_retried(db, manager, monkeypatch):
+    async def undecodable(*args):
+        raise ValueError("cannot decode")
+    monkeypatch.setattr(indexer, "_bid_fields", undecodable)
+
+    async def run():
+        tender_id = await _tender_with_bids(manager, [30])
+        await _sync(db, manager)
+        checkpoint = await db[indexer.CHECKPOINTS_COLLECTION].find_one({"_id": manager.contract_address})
+        return tender_id, checkpoint, await _bids(db, tender_id)
+    tender_id, checkpoint, bids = asyncio.run(run())
+    assert checkpoint["block_number"] == manager.w3.eth.block_number
+    assert bids == []
+    assert asyncio.run(db[indexer.TENDERS_COLLECTION].find_one({"_id": tender_id})) is not None
+
+def test_reorg_rolls_back_replaced_blocks(db, manager):
+    accounts = manager.w3.eth.accounts
+
+    async def run():
+        tender_id = await _tender_with_bids(manager, [70, 60, 65])
+        await _sync(db, manager)
+        snapshot = manager.w3.testing.snapshot()
+        await manager.close_tender_on_blockchain(tender_id, accounts[0])
+        await manager.evaluate_bids_on_blockchain(tender_id, accounts[0])
+        await _sync(db, manager)
+        evaluated = await db[indexer.TENDERS_COLLECTION].find_one({"_id": tender_id})
+
+        # Replace the close/evaluate blocks with a longer branch holding another bid
+        manager.w3.testing.revert(snapshot)
+        await manager.submit_bid_to_blockchain(tender_id, 10, accounts[5])
+        manager.w3.testing.mine(3)
+        await _sync(db, manager)
+        return evaluated, await db[indexer.TENDERS_COLLECTION].find_one({"_id": tender_id}), await _bids(db, tender_id)
+
+    evaluated, tender, bids = asyncio.run(run())
+    assert evaluated["winning_amount"] == 60 and evaluated["is_active"] is False
+    assert tender["is_active"] is True
+    assert "winner" not in tender
+    assert [bid["amount"] for bid in bids] == [70, 60, 65, 10]
@@ -0,0 +1,115 @@
+"""
+Index declarations and the query plans of the routes' hot queries.
+
+ensure_indexes' report and rebuild run against mongomock-motor. Every shape in
+indexes.QUERY_SHAPES must be answered by an index scan, with no collection
+scan and no in-memory SORT stage; only a real server can explain a query, so
+the plan tests need MongoDB at MONGODB_URI (default mongodb://localhost:27017).
+They use a scratch database that is dropped afterwards. They are skipped when
+no server answers, unless MONGODB_TESTS_REQUIRED=1 (as in CI), which turns the
+missing server into a failure.
+
+    cd backend && python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+import indexes
+
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+REQUIRED = os.getenv("MONGODB_TESTS_REQUIRED", "").lower() in ("1", "true", "yes")
+
+async def _explain_all():
+    client = AsyncIOMotorClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError as e:
+        client.close()
+        return None, str(e).split(",")[0]
+    db = client[f"index_test_{uuid.uuid4().hex[:8]}"]
+    try:
+        report = await indexes.ensure_indexes(db)
+        failed = [(collection, name, outcome) for collection, name, outcome in report if outcome.startswith("failed")]
+        assert not failed, failed
+        plans = {}
+        for name, (collection, query, sort) in indexes.QUERY_SHAPES.items():
+            plans[name] = await indexes.explain_query(db, collection, query, sort)
+        return plans, None
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+@pytest.fixture(scope="module")
+def plans():
+    result, error = asyncio.run(_explain_all())
+    if result is None:
+        if REQUIRED:
+            pytest.fail(f"no MongoDB server at {MONGODB_URI}: {error}")
+        pytest.skip(f"no MongoDB server at {MONGODB_URI}: {error}")
+    return result
+
+@pytest.mark.parametrize("shape", sorted(indexes.QUERY_SHAPES))
+def test_query_uses_index_without_in_memory_sort(plans, shape):
+    stages, index_names = plans[shape]
+    assert "IXSCAN" in stages, f"{shape}: {stages}"
+    assert "COLLSCAN" not in stages, f"{shape}: {stages}"
+    assert "SORT" not in stages, f"{shape} sorts in memory: {stages}"
+    assert index_names, shape
+
+def test_partial_filter_is_part_of_the_definition():
+    keys = [("bidder_id", 1), ("idempotency_key", 1)]
+    options = {"name": "bidder_idempotency_unique", "unique": True,
+               "partialFilterExpression": {"idempotency_key": {"$exists": True}}}
+    existing = {"key": keys, "unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}}
+    assert indexes._same_definition(existing, keys, options)
+    changed = {**existing, "partialFilterExpression": {"idempotency_key": {"$type": "string"}}}
+    assert not indexes._same_definition(changed, keys, options)
+    assert not indexes._same_definition({"key": keys, "unique": True}, keys, options)
+
+def _outcomes(report) -> dict:
+    return {(collection, name): outcome for collection, name, outcome in report}
+
+def test_ensure_indexes_creates_then_finds_every_declared_index(db):
+    created = asyncio.run(indexes.ensure_indexes(db))
+    assert len(created) == len(indexes.INDEXES)
+    assert set(_outcomes(created).values()) == {"created"}
+    assert set(_outcomes(asyncio.run(indexes.ensure_indexes(db))).values()) == {"exists"}
+
+def test_changed_definition_is_reported_then_rebuilt(db, monkeypatch):
+    asyncio.run(indexes.ensure_indexes(db))
+    changed_filter = {"idempotency_key": {"$type": "string"}}
+    declared = [
+        (collection, keys, {**options, "partialFilterExpression": changed_filter})
+        if options["name"] == "bidder_idempotency_unique" else (collection, keys, options)
+        for collection, keys, options in indexes.INDEXES
+    ]
+    monkeypatch.setattr(indexes, "INDEXES", declared)
+    key = ("bids", "bidder_idempotency_unique")
+
+    report = _outcomes(asyncio.run(indexes.ensure_indexes(db)))
+    assert report.pop(key) == "changed (run with --rebuild)"
+    assert set(report.values()) == {"exists"}
+
+    report = _outcomes(asyncio.run(indexes.ensure_indexes(db, rebuild=True)))
+    assert report.pop(key) == "rebuilt"
+    assert set(report.values()) == {"exists"}
+    info = asyncio.run(db["bids"].index_information())
+    assert info["bidder_idempotency_unique"]["partialFilterExpression"] == changed_filter
+
+def test_unique_index_blocked_by_duplicates_is_reported_as_failed(db):
+    async def run():
+        await db["users"].insert_many([{"username": "same", "email": "a@x"}, {"username": "same", "email": "b@x"}])
+        return _outcomes(await indexes.ensure_indexes(db))
+    report = asyncio.run(run())
+    assert report[("users", "username_unique")].startswith("failed")
+    assert report[("users", "email_unique")] == "created"
@@ -0,0 +1,133 @@
+"""Local nonce allocation, on its own and against an eth-tester chain"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from blockchain import BlockchainManager
+from nonce_manager import NonceManager, is_nonce_error
+
+COMPILED = os.path.join(os.path.dirname(__file__), "..", "..", "contracts", "compiled_contract.json")
+
+SENDER = "0x" + "ab" * 20
+
+@pytest.fixture
+def manager():
+    from web3 import EthereumTesterProvider
+    manager = BlockchainManager(provider=EthereumTesterProvider(), deployment_file=None, max_concurrency=1)
+    with open(COMPILED) as f:
+        compiled = json.load(f)["contracts"]["TenderContract.sol"]["TenderContract"]
+    contract = manager.w3.eth.contract(abi=compiled["abi"], bytecode=compiled["evm"]["bytecode"]["object"])
+    tx_hash = contract.constructor().transact({"from": manager.w3.eth.accounts[0]})
+    address = manager.w3.eth.wait_for_transaction_receipt(tx_hash).contractAddress
+    manager.set_contract(address, compiled["abi"])
+    yield manager
+    manager._executor.shutdown(wait=False)
+
+class Unreachable:
+    """A contract call whose transaction never reaches the node"""
+
+    def transact(self, transaction):
+        raise ConnectionError("connection reset by peer")
+
+def _create_tender(manager):
+    return manager.contract.functions.createTender("Bridge", 100, 2 ** 40, bytes(32))
+
+def _nonce(manager, tx_hash):
+    return manager.w3.eth.get_transaction(tx_hash)["nonce"]
+
+@pytest.mark.parametrize("message", [
+    "nonce too low: next nonce 5, tx nonce 3",                                          # geth
+    "already known",                                                                    # geth
+    "Known transaction: 0xabc",                                                         # parity
+    "replacement transaction underpriced",                                              # geth
+    "the tx doesn't have the correct nonce. account has nonce of: 1 tx has nonce of: 0",  # Ganache
+    "Nonce too low. Expected nonce to be 2 but got 1.",                                 # Anvil
+    "Invalid transaction nonce: Expected 1, but got 0",                                 # eth-tester
+])
+def test_nonce_errors_are_recognised(message):
+    assert is_nonce_error(ValueError({"code": -32000, "message": message}))
+    assert is_nonce_error(Exception(message.upper()))
+
+@pytest.mark.parametrize("message", [
+    "insufficient funds for gas * price + value",
+    "execution reverted: Tender is not active",
+    "connection reset by peer",
+])
+def test_other_errors_are_not_nonce_errors(message):
+    assert not is_nonce_error(ValueError(message))
+
+def test_released_nonces_are_reused_lowest_first():
+    fetches = []
+    async def fetch(address):
+        fetches.append(address)
+        return 7
+
+    async def run():
+        nonces = NonceManager(fetch)
+        reserved = [await nonces.reserve(SENDER) for _ in range(4)]
+        await nonces.release(SENDER, 9)
+        await nonces.release(SENDER, 8)
+        return reserved, [await nonces.reserve(SENDER) for _ in range(3)]
+    reserved, reused = asyncio.run(run())
+    assert reserved == [7, 8, 9, 10]
+    assert reused == [8, 9, 11]
+    assert fetches == [SENDER]
+
+def test_releasing_the_top_nonces_shrinks_the_counter():
+    async def fetch(address):
+        return 0
+
+    async def run():
+        nonces = NonceManager(fetch)
+        for _ in range(3):
+            await nonces.reserve(SENDER)
+        await nonces.release(SENDER, 1)
+        await nonces.release(SENDER, 2)
+        # Nothing was reserved for this address, so there is nothing to give back
+        await nonces.release("0x" + "cd" * 20, 0)
+        return nonces._next[SENDER], nonces._gaps[SENDER], await nonces.reserve(SENDER)
+    assert asyncio.run(run()) == (1, [], 1)
+
+def test_released_gap_is_filled_on_chain(manager):
+    sender = manager.w3.eth.accounts[0]
+    start = manager.w3.eth.get_transaction_count(sender)
+
+    async def run():
+        first = await manager.nonces.reserve(sender)
+        second = await manager.nonces.reserve(sender)
+        # The transaction meant to use `first` was never sent
+        await manager.nonces.release(sender, first)
+        # eth-tester rejects a nonce gap, so both transactions are mined only if `first` is reused
+        filled = await manager.send_transaction(_create_tender(manager), sender)
+        following = await manager._call(_create_tender(manager).transact, {"from": sender, "nonce": second})
+        return first, second, filled, following.hex()
+    first, second, filled, following = asyncio.run(run())
+    assert (first, second) == (start, start + 1)
+    assert _nonce(manager, filled) == first
+    assert _nonce(manager, following) == second
+
+def test_failed_send_releases_its_nonce(manager):
+    sender = manager.w3.eth.accounts[0]
+    start = manager.w3.eth.get_transaction_count(sender)
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await manager.send_transaction(Unreachable(), sender)
+        return await manager.send_transaction(_create_tender(manager), sender)
+    assert _nonce(manager, asyncio.run(run())) == start
+
+def test_nonce_too_low_resyncs_with_the_node(manager):
+    sender = manager.w3.eth.accounts[0]
+
+    async def run():
+        first = await manager.send_transaction(_create_tender(manager), sender)
+        # Another process sends from the same wallet, so the local counter is now stale
+        manager.w3.eth.send_transaction({"from": sender, "to": manager.w3.eth.accounts[1], "value": 1})
+        second = await manager.send_transaction(_create_tender(manager), sender)
+        return first, second
+    first, second = asyncio.run(run())
+    assert _nonce(manager, second) == _nonce(manager, first) + 2
+    assert manager.nonces._next[sender] == manager.w3.eth.get_transaction_count(sender, "pending")
@@ -0,0 +1,36 @@
+"""Notification counters: first counter from a recount, batched reconcile"""
+
+import asyncio
+
+import notification_counters
+
+def _notifications(user_id, read, unread):
+    return [{"user_id": user_id, "is_read": True} for _ in range(read)] + \
+        [{"user_id": user_id, "is_read": False} for _ in range(unread)]
+
+def test_first_counter_starts_from_a_recount(db):
+    async def run():
+        await db["notifications"].insert_many(_notifications("u1", read=3, unread=2))
+        await notification_counters.increment(db, "u1", total=1, unread=1)
+        return await notification_counters.get_counts(db, "u1")
+    # The recount already includes the notification the increment was for
+    assert asyncio.run(run()) == {"total": 5, "unread": 2}
+
+def test_reconcile_repairs_drift_batch_by_batch(db):
+    async def run():
+        counters = db[notification_counters.COUNTERS_COLLECTION]
+        for i in range(5):
+            await db["notifications"].insert_many(_notifications(f"u{i}", read=i, unread=1))
+            await counters.insert_one({"_id": f"u{i}", "total": i + 1, "unread": 1})
+        # Drift on two users, in different batches; a counter for a user with no notifications left
+        await counters.update_one({"_id": "u1"}, {"$set": {"unread": 7}})
+        await counters.update_one({"_id": "u4"}, {"$set": {"total": 0}})
+        await counters.insert_one({"_id": "u9", "total": 2, "unread": 2})
+        repaired = await notification_counters.reconcile(db, batch_size=2)
+        stored = {counter["_id"]: (counter["total"], counter["unread"]) async for counter in counters.find({})}
+        return repaired, stored
+
+    repaired, stored = asyncio.run(run())
+    assert repaired == 3
+    assert stored == {"u0": (1, 1), "u1": (2, 1), "u2": (3, 1), "u3": (4, 1), "u4": (5, 1), "u9": (0, 0)}
+    assert asyncio.run(notification_counters.reconcile(db, batch_size=2)) == 0
@@ -0,0 +1,61 @@
+"""Authentication and the initial snapshot of GET /notifications/stream"""
+
+import asyncio
+import time
+
+import notification_counters
+import notification_hub
+from conftest import login
+from routes import notifications
+
+def test_stream_requires_credentials(client):
+    assert client.get("/notifications/stream").status_code == 401
+
+def test_stream_rejects_bad_tickets(client):
+    headers = login(client, "carol")
+    ticket = client.post("/notifications/stream/ticket", headers=headers).json()
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    expires = int(time.time()) + 60
+    tampered = ticket["url"].replace("signature=", "signature=0")
+    assert client.get(tampered).status_code == 403
+    other_user = f"/notifications/stream?user=someone-else&expires={ticket['expires']}&signature=" + \
+        ticket["url"].split("signature=")[1]
+    assert client.get(other_user).status_code == 403
+    expired = f"/notifications/stream?user={user_id}&expires={int(time.time()) - 1}" \
+        f"&signature={notifications._ticket_signature(user_id, int(time.time()) - 1)}"
+    assert client.get(expired).status_code == 403
+    assert notifications._valid_ticket(user_id, expires, notifications._ticket_signature(user_id, expires))
+
+def test_delta_published_during_the_snapshot_is_not_applied_twice(db, monkeypatch):
+    user_id = "u1"
+    real_get_counts = notification_counters.get_counts
+    calls = []
+
+    async def get_counts_racing_a_read(db, user_id):
+        # A mark-as-read commits and publishes while the first count is being read
+        if not calls:
+            await notification_counters.increment(db, user_id, unread=-1)
+            await notification_hub.publish(user_id, {"type": "unread", "delta": -1})
+        calls.append(user_id)
+        return await real_get_counts(db, user_id)
+    monkeypatch.setattr(notification_counters, "get_counts", get_counts_racing_a_read)
+
+    async def run():
+        await db["notifications"].insert_many([{"user_id": user_id, "is_read": False} for _ in range(2)])
+        await real_get_counts(db, user_id)
+        expires = int(time.time()) + 60
+        response = await notifications.stream_notifications(
+            user=user_id, expires=expires, signature=notifications._ticket_signature(user_id, expires),
+            current_user=None, db=db
+        )
+        body = response.body_iterator
+        first = await body.__anext__()
+        await notification_hub.publish(user_id, {"type": "notification", "notification": {}, "unread_delta": 1})
+        second = await body.__anext__()
+        await body.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == 'event: unread\ndata: {"count": 1}\n\n'
+    assert second.startswith("event: notification")
+    assert len(calls) == 2  # the snapshot, and the re-read after draining the racing event
@@ -0,0 +1,22 @@
+"""Notification list endpoints: bare list bodies, next page in X-Next-Cursor"""
+
+from conftest import login
+
+def test_pages_are_lists_with_the_cursor_in_a_header(client):
+    admin = login(client, "admin", role="admin")
+    bidder = login(client, "dave")
+    user_id = client.get("/auth/me", headers=bidder).json()["id"]
+    for i in range(3):
+        client.post("/notifications/create", json={"user_id": user_id, "title": f"n{i}", "message": "m"}, headers=admin)
+
+    first = client.get("/notifications/?limit=2", headers=bidder)
+    assert isinstance(first.json(), list)
+    assert [n["title"] for n in first.json()] == ["n2", "n1"]
+    cursor = first.headers["X-Next-Cursor"]
+
+    last = client.get(f"/notifications/?limit=2&cursor={cursor}", headers=bidder)
+    assert [n["title"] for n in last.json()] == ["n0"]
+    assert "X-Next-Cursor" not in last.headers
+
+    unread = client.get("/notifications/unread", headers=bidder)
+    assert len(unread.json()) == 3 and "X-Next-Cursor" not in unread.headers
@@ -0,0 +1,95 @@
+"""Outbox enqueueing and retry accounting, against mongomock-motor"""
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import blockchain
+import outbox
+
+class FakeManager:
+    """Enough of BlockchainManager for process_job; every send fails"""
+
+    nonces = None
+
+    def __init__(self, deployed=True):
+        functions = SimpleNamespace(submitBid=lambda *args: ("submitBid", args))
+        self.contract = SimpleNamespace(functions=functions) if deployed else None
+
+    async def send_transaction(self, call, sender):
+        raise ConnectionError("node unavailable")
+
+@pytest.fixture
+def manager():
+    previous = blockchain.set_blockchain_manager(FakeManager())
+    yield
+    blockchain.set_blockchain_manager(previous)
+
+def _run_rounds(db, rounds):
+    """Claim and process the job `rounds` times, making it due before each claim"""
+    async def run():
+        jobs = db[outbox.OUTBOX_COLLECTION]
+        for _ in range(rounds):
+            await jobs.update_many({}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+            job = await outbox.claim_job(db)
+            if job is None:
+                break
+            await outbox.process_job(db, job)
+        return await jobs.find_one({})
+    return asyncio.run(run())
+
+def _queue_bid(db, anchored):
+    async def queue():
+        tender = {"title": "T"}
+        if anchored:
+            tender["blockchain_tender_id"] = 7
+        tender_id = str((await db["tenders"].insert_one(tender)).inserted_id)
+        await outbox.enqueue(db, outbox.SUBMIT_BID, str(ObjectId()), {
+            "tender_id": tender_id, "amount": 5, "bid_hash": "0x01", "bidder_address": "0xaa"
+        })
+    asyncio.run(queue())
+
+def test_enqueue_is_idempotent_per_kind_and_ref(db):
+    async def queue():
+        await outbox.enqueue(db, outbox.CLOSE_TENDER, "t1", {"admin_address": "0x1"})
+        await outbox.enqueue(db, outbox.CLOSE_TENDER, "t1", {"admin_address": "0x2"})
+        await outbox.enqueue(db, outbox.CREATE_TENDER, "t1", {"admin_address": "0x3"})
+        return await db[outbox.OUTBOX_COLLECTION].find({}).sort("_id", 1).to_list(None)
+    jobs = asyncio.run(queue())
+    assert [job["_id"] for job in jobs] == ["close_tender:t1", "create_tender:t1"]
+    assert jobs[0]["payload"] == {"admin_address": "0x1"}
+
+def test_waiting_for_the_tender_does_not_use_attempts(db, manager):
+    _queue_bid(db, anchored=False)
+    job = _run_rounds(db, outbox.MAX_ATTEMPTS + 5)
+    assert job["status"] == outbox.PENDING
+    assert job["attempts"] == 0
+    assert job["waits"] == outbox.MAX_ATTEMPTS + 5
+    assert "not anchored" in job["last_error"]
+
+def test_waiting_has_its_own_budget(db, manager, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_WAITS", 3)
+    _queue_bid(db, anchored=False)
+    job = _run_rounds(db, 10)
+    assert job["status"] == outbox.FAILED
+    assert job["waits"] == 3
+
+def test_undeployed_contract_does_not_use_attempts(db):
+    previous = blockchain.set_blockchain_manager(FakeManager(deployed=False))
+    try:
+        _queue_bid(db, anchored=True)
+        job = _run_rounds(db, outbox.MAX_ATTEMPTS + 1)
+    finally:
+        blockchain.set_blockchain_manager(previous)
+    assert job["status"] == outbox.PENDING
+    assert job["attempts"] == 0
+
+def test_send_failures_use_attempts(db, manager):
+    _queue_bid(db, anchored=True)
+    job = _run_rounds(db, outbox.MAX_ATTEMPTS + 5)
+    assert job["status"] == outbox.FAILED
+    assert job["attempts"] == outbox.MAX_ATTEMPTS
+    assert job["waits"] == 0
@@ -0,0 +1,74 @@
+"""Keyset pagination: cursor encoding and page order"""
+
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import pagination
+from conftest import login
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def test_cursor_round_trip():
+    doc_id = ObjectId()
+    when = datetime(2026, 1, 2, 3, 4, 5, 678000)
+    assert pagination.decode_cursor(pagination.encode_cursor({"_id": doc_id, "created_at": when}, "created_at")) == (when, doc_id)
+    assert pagination.decode_cursor(pagination.encode_cursor({"_id": doc_id, "budget": 12.5}, "budget")) == (12.5, doc_id)
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    _b64(b"not json"),
+    _b64(json.dumps({"v": 1}).encode()),
+    _b64(json.dumps({"v": 1, "id": "not-an-object-id"}).encode()),
+    _b64(json.dumps({"v": {"$date": "yesterday"}, "id": str(ObjectId())}).encode()),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def test_pages_follow_the_sort_key_then_id_without_gaps_or_repeats(db):
+    start = datetime(2026, 1, 1)
+    # Several documents share each timestamp, so ties are broken by _id
+    docs = [{"_id": ObjectId(), "owner": "u", "created_at": start + timedelta(minutes=i // 3)} for i in range(11)]
+    docs.append({"_id": ObjectId(), "owner": "other", "created_at": start})
+
+    async def walk():
+        await db["items"].insert_many(docs)
+        pages, cursor = [], None
+        while True:
+            page, cursor = await pagination.paginate(db["items"], {"owner": "u"}, "created_at", 4, cursor)
+            pages.append([doc["_id"] for doc in page])
+            if cursor is None:
+                return pages
+
+    pages = asyncio.run(walk())
+    expected = [doc["_id"] for doc in sorted(docs[:11], key=lambda doc: (doc["created_at"], doc["_id"]), reverse=True)]
+    assert [len(page) for page in pages] == [4, 4, 3]
+    assert [doc_id for page in pages for doc_id in page] == expected
+
+def test_bid_lists_are_paginated(client):
+    admin = login(client, "admin", role="admin")
+    bidder = login(client, "erin")
+    tender_id = client.post("/tenders/", json={
+        "title": "T", "description": "d", "budget": 100, "deadline": "2099-01-01T00:00:00", "requirements": "r"
+    }, headers=admin).json()["tender_id"]
+    client.put(f"/tenders/{tender_id}/publish", headers=admin)
+    for amount in (10, 20, 30):
+        client.post(f"/bids/{tender_id}", data={"bid_data": json.dumps({"amount": amount})},
+                    headers={**bidder, "Idempotency-Key": f"bid-{amount}"})
+
+    first = client.get("/bids/my-bids?limit=2", headers=bidder).json()
+    rest = client.get(f"/bids/my-bids?limit=2&cursor={first['next_cursor']}", headers=bidder).json()
+    assert [bid["amount"] for bid in first["bids"] + rest["bids"]] == [30, 20, 10]
+    assert rest["next_cursor"] is None
+
+    page = client.get(f"/bids/tender/{tender_id}?limit=3", headers=admin).json()
+    assert len(page["bids"]) == 3 and page["next_cursor"] is None
+    assert client.get(f"/bids/tender/{tender_id}?cursor=garbage", headers=admin).status_code == 400
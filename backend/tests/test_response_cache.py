@@ -0,0 +1,74 @@
+"""Rendered tender responses: ETags, 304s and invalidation on writes"""
+
+from bson import ObjectId
+import pytest
+
+from conftest import login
+
+def _create(client, admin, title):
+    return client.post("/tenders/", json={
+        "title": title, "description": "d", "budget": 100, "deadline": "2099-01-01T00:00:00", "requirements": "r"
+    }, headers=admin).json()["tender_id"]
+
+@pytest.fixture
+def admin(client):
+    return login(client, "admin", role="admin")
+
+@pytest.mark.parametrize("path", ["/tenders/", "/tenders/{id}"])
+def test_if_none_match_returns_304(client, admin, path):
+    url = path.format(id=_create(client, admin, "T"))
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        revalidated = client.get(url, headers={"If-None-Match": header})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == etag
+        assert revalidated.content == b""
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_responses_are_served_from_the_cache(client, db, admin):
+    tender_id = _create(client, admin, "T")
+    before = client.get(f"/tenders/{tender_id}").json()
+    client.get("/tenders/")
+    # A write that bypasses the routes is not seen until the entry is invalidated
+    client.portal.call(db["tenders"].update_one, {"_id": ObjectId(tender_id)}, {"$set": {"title": "changed"}})
+    assert client.get(f"/tenders/{tender_id}").json() == before
+    assert client.get("/tenders/").json()["tenders"][0]["title"] == "T"
+
+def test_query_string_is_part_of_the_key(client, admin):
+    _create(client, admin, "T")
+    full = client.get("/tenders/")
+    summary = client.get("/tenders/?view=summary")
+    assert full.headers["ETag"] != summary.headers["ETag"]
+    assert "description" in full.json()["tenders"][0]
+    assert "description" not in summary.json()["tenders"][0]
+
+def test_write_invalidates_list_and_detail(client, admin):
+    tender_id = _create(client, admin, "T")
+    other_id = _create(client, admin, "U")
+    list_etag = client.get("/tenders/").headers["ETag"]
+    detail_etag = client.get(f"/tenders/{tender_id}").headers["ETag"]
+    other_etag = client.get(f"/tenders/{other_id}").headers["ETag"]
+
+    assert client.put(f"/tenders/{tender_id}/close", headers=admin).status_code == 200
+
+    tenders = client.get("/tenders/", headers={"If-None-Match": list_etag})
+    assert tenders.status_code == 200
+    assert {t["_id"]: t["status"] for t in tenders.json()["tenders"]}[tender_id] == "closed"
+    detail = client.get(f"/tenders/{tender_id}", headers={"If-None-Match": detail_etag})
+    assert detail.status_code == 200
+    assert detail.json()["status"] == "closed"
+    assert detail.headers["ETag"] != detail_etag
+    # Other tenders' detail entries are untouched
+    assert client.get(f"/tenders/{other_id}", headers={"If-None-Match": other_etag}).status_code == 304
+
+def test_missing_tender_is_not_cached(client, db, admin):
+    tender_id = str(ObjectId())
+    assert client.get(f"/tenders/{tender_id}").status_code == 404
+    client.portal.call(db["tenders"].insert_one, {
+        "_id": ObjectId(tender_id), "title": "T", "status": "draft", "created_at": None
+    })
+    assert client.get(f"/tenders/{tender_id}").status_code == 200
@@ -0,0 +1,70 @@
+"""Deadline scheduler: refresh window, closing due tenders, lease takeover"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import outbox
+import scheduler
+from models import TenderStatus
+
+def _tender(deadline, created_at=None, status=TenderStatus.PUBLISHED.value):
+    return {"title": "T", "status": status, "deadline": deadline, "created_at": created_at or datetime.utcnow()}
+
+def test_refresh_finds_tenders_stamped_before_the_previous_refresh(db):
+    leader = scheduler.DeadlineScheduler("a")
+    now = datetime.utcnow()
+
+    async def run():
+        await leader.refresh(db, now)
+        # Built (and stamped) before that refresh, inserted after it
+        tender = _tender(now + timedelta(minutes=5), created_at=now - timedelta(seconds=5))
+        await db["tenders"].insert_one(tender)
+        await leader.refresh(db, now + timedelta(seconds=scheduler.REFRESH_INTERVAL))
+        await leader.refresh(db, now + timedelta(seconds=2 * scheduler.REFRESH_INTERVAL))
+        return str(tender["_id"])
+
+    tender_id = asyncio.run(run())
+    assert [entry[1] for entry in leader._heap] == [tender_id]
+
+def test_leader_closes_due_tenders_and_queues_the_chain_close(db):
+    leader = scheduler.DeadlineScheduler("a")
+
+    async def run():
+        due = (await db["tenders"].insert_one(_tender(datetime.utcnow() - timedelta(seconds=1)))).inserted_id
+        later = (await db["tenders"].insert_one(_tender(datetime.utcnow() + timedelta(minutes=5)))).inserted_id
+        await leader.tick(db)
+        return (
+            await db["tenders"].find_one({"_id": due}),
+            await db["tenders"].find_one({"_id": later}),
+            await db[outbox.OUTBOX_COLLECTION].find({}).to_list(None),
+        )
+
+    due, later, jobs = asyncio.run(run())
+    assert leader.is_leader
+    assert due["status"] == TenderStatus.CLOSED.value
+    assert later["status"] == TenderStatus.PUBLISHED.value
+    assert [job["_id"] for job in jobs] == [f"{outbox.CLOSE_TENDER}:{due['_id']}"]
+    assert leader.closed_count == 1
+
+def test_follower_takes_over_an_expired_lease(db):
+    first = scheduler.DeadlineScheduler("a")
+    second = scheduler.DeadlineScheduler("b")
+
+    async def run():
+        await first.tick(db)
+        await second.tick(db)
+        assert (first.is_leader, second.is_leader) == (True, False)
+
+        # The leader dies: its lease runs out and a tender falls due meanwhile
+        await db[scheduler.LEASES_COLLECTION].update_one(
+            {"_id": scheduler.LEASE_NAME}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+        tender_id = (await db["tenders"].insert_one(_tender(datetime.utcnow() - timedelta(seconds=1)))).inserted_id
+        await second.tick(db)
+        await first.tick(db)
+        return await db["tenders"].find_one({"_id": tender_id})
+
+    tender = asyncio.run(run())
+    assert (first.is_leader, second.is_leader) == (False, True)
+    assert tender["status"] == TenderStatus.CLOSED.value
+    assert second.closed_count == 1
@@ -0,0 +1,66 @@
+"""Request size limit and per-bid caps on uploads"""
+
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+import storage
+
+@pytest.fixture
+def upload_app():
+    app = FastAPI()
+    app.add_middleware(storage.RequestSizeLimitMiddleware, max_bytes=1000)
+    parsed = []
+
+    @app.post("/upload")
+    async def upload(document: UploadFile = File(...)):
+        parsed.append(document.filename)
+        return {"size": len(await document.read())}
+
+    return TestClient(app), parsed
+
+def test_small_upload_passes(upload_app):
+    client, parsed = upload_app
+    response = client.post("/upload", files={"document": ("a.txt", b"x" * 100, "text/plain")})
+    assert response.status_code == 200 and response.json() == {"size": 100}
+    assert parsed == ["a.txt"]
+
+def test_declared_length_over_the_limit_is_refused_before_parsing(upload_app):
+    client, parsed = upload_app
+    response = client.post("/upload", files={"document": ("a.txt", b"x" * 5000, "text/plain")})
+    assert response.status_code == 413
+    assert response.json()["detail"] == storage.REQUEST_TOO_LARGE
+    assert parsed == []
+
+def test_chunked_body_is_cut_off_while_it_is_received(upload_app):
+    client, parsed = upload_app
+    boundary = "b0undary"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"document\"; filename=\"a.txt\"\r\n"
+        f"Content-Type: text/plain\r\n\r\n"
+    ).encode() + b"x" * 5000 + f"\r\n--{boundary}--\r\n".encode()
+
+    def chunks():
+        # No Content-Length: the body arrives as a stream
+        for start in range(0, len(body), 256):
+            yield body[start:start + 256]
+
+    response = client.post(
+        "/upload", content=chunks(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+    assert parsed == []
+
+def test_bid_cap_applies_across_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "MAX_FILE_BYTES", 60)
+    monkeypatch.setattr(storage, "MAX_BID_BYTES", 100)
+    uploads = [UploadFile(io.BytesIO(b"a" * 50), filename="a"), UploadFile(io.BytesIO(b"b" * 60), filename="b")]
+    with pytest.raises(storage.HTTPException) as error:
+        asyncio.run(storage.store_bid_documents(uploads))
+    assert error.value.status_code == 413
+    # The first document was stored; the rejected one left no temporary file behind
+    assert [path.name for path in tmp_path.iterdir()] == [storage.hashlib.sha256(b"a" * 50).hexdigest()]
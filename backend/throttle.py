@@ -0,0 +1,44 @@
+"""
+Login attempt throttling.
+
+Two fixed-window limits run before any password hashing happens, so a
+brute-force burst is rejected cheaply instead of queueing bcrypt work:
+
+  per client IP   every login attempt counts (LOGIN_MAX_ATTEMPTS_PER_IP per LOGIN_IP_WINDOW seconds)
+  per account     failed attempts count (LOGIN_MAX_FAILURES_PER_ACCOUNT per LOGIN_ACCOUNT_WINDOW seconds)
+
+Counters use the configured cache backend, so with CACHE_URL set the limits
+apply across all workers.
+"""
+
+import os
+from fastapi import HTTPException
+from cache import make_cache
+
+MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "30"))
+IP_WINDOW = float(os.getenv("LOGIN_IP_WINDOW", "60"))
+MAX_FAILURES_PER_ACCOUNT = int(os.getenv("LOGIN_MAX_FAILURES_PER_ACCOUNT", "5"))
+ACCOUNT_WINDOW = float(os.getenv("LOGIN_ACCOUNT_WINDOW", "300"))
+
+_counters = make_cache("login_throttle", maxsize=100000, ttl=max(IP_WINDOW, ACCOUNT_WINDOW))
+
+def _too_many(window: float):
+    return HTTPException(
+        status_code=429,
+        detail="Too many login attempts. Try again later.",
+        headers={"Retry-After": str(int(window))}
+    )
+
+async def check_login_allowed(username: str, client_ip: str):
+    """Count this attempt against the client IP and reject it if either limit is exhausted"""
+    if await _counters.incr(f"ip:{client_ip}", IP_WINDOW) > MAX_ATTEMPTS_PER_IP:
+        raise _too_many(IP_WINDOW)
+    failures = await _counters.get(f"account:{username.lower()}")
+    if failures is not None and failures >= MAX_FAILURES_PER_ACCOUNT:
+        raise _too_many(ACCOUNT_WINDOW)
+
+async def record_login_failure(username: str):
+    await _counters.incr(f"account:{username.lower()}", ACCOUNT_WINDOW)
+
+async def record_login_success(username: str):
+    await _counters.delete(f"account:{username.lower()}")
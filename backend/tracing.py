@@ -0,0 +1,393 @@
+"""
+Request-scoped tracing with an OTLP-compatible exporter.
+
+TracingMiddleware starts a trace per HTTP request (continuing the caller's
+W3C `traceparent` if it sends one) and `span()` nests timed child spans under
+whatever span is current, tracked in a contextvar so concurrent requests never
+mix. Motor runs pymongo in threads with a copy of the caller's context, so
+MongoTracingListener records every Mongo command as a child span; web3
+JSON-RPC requests are traced at the provider the same way. Outbox jobs carry
+the traceparent of the request that queued them, so the worker's on-chain
+calls join the request's trace.
+
+The sampling decision is made once per trace (TRACE_SAMPLE_RATE) and
+inherited by every span in it. An unsampled trace costs a contextvar lookup
+per span. Finished spans are queued and exported in batches from a background
+thread, never on the event loop; if the queue is full, spans are dropped.
+
+Exporters (TRACE_EXPORTERS, comma separated; tracing is off when empty):
+  console  one JSON line per span on stderr
+  file     one JSON line per span appended to TRACE_FILE
+  otlp     OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Optional
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = [name.strip() for name in os.getenv("TRACE_EXPORTERS", "").split(",") if name.strip()]
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "e-tendering-api")
+EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "2048"))
+EXPORT_BATCH_SIZE = 512
+
+enabled = bool(EXPORTERS)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "events", "error")
+
+    sampled = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, kind: str = "internal", **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.events = []
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append((time.time_ns(), name, attributes))
+
+    def record_exception(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        _processor.on_end(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start": self.start_ns / 1e9,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "events": [{"time": t / 1e9, "name": name, **attrs} for t, name, attrs in self.events],
+            "error": self.error,
+        }
+
+class _NoopSpan:
+    """Stands in for every span of an unsampled (or untraced) request"""
+
+    sampled = False
+    traceparent = None
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def add_event(self, name: str, **attributes):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+NOOP = _NoopSpan()
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=NOOP)
+
+def current_span():
+    return _current.get()
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+def _root(name: str, traceparent: Optional[str], kind: str, attributes: dict):
+    if not enabled:
+        return NOOP
+    match = _TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return NOOP
+        return Span(name, trace_id, parent_id, kind, **attributes)
+    if random.random() >= SAMPLE_RATE:
+        return NOOP
+    return Span(name, _new_trace_id(), None, kind, **attributes)
+
+@contextlib.contextmanager
+def _activate(span):
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        span.end()
+
+def start_trace(name: str, traceparent: Optional[str] = None, kind: str = "internal", **attributes):
+    """Start a new trace (or continue `traceparent`) and make its root span current"""
+    return _activate(_root(name, traceparent, kind, attributes))
+
+def span(name: str, **attributes):
+    """
+    Time a block as a child of the current span:
+
+        with tracing.span("tender.fetch", tender_id=tender_id) as s:
+            ...
+            s.set_attribute("cache_hit", True)
+
+    A no-op outside a sampled trace.
+    """
+    parent = _current.get()
+    if not parent.sampled:
+        return contextlib.nullcontext(NOOP)
+    return _activate(Span(name, parent.trace_id, parent.span_id, **attributes))
+
+def log_event(log: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """
+    Structured log line for sampled traces only, also recorded as an event on
+    the current span. Keeps per-request debug output to the sampled fraction.
+    """
+    current = _current.get()
+    if not current.sampled:
+        return
+    current.add_event(event, **fields)
+    if log.isEnabledFor(level):
+        log.log(level, "%s %s", event, json.dumps(
+            {"trace_id": current.trace_id, "span_id": current.span_id, **fields}, default=str
+        ))
+
+class _BatchProcessor:
+    def __init__(self, exporters: list):
+        self.exporters = exporters
+        self.dropped = 0
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def on_end(self, span: Span):
+        if len(self._queue) >= QUEUE_SIZE:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._thread is None:
+            self._start()
+        if len(self._queue) >= EXPORT_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(EXPORT_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            while self._queue:
+                self._export([self._queue.popleft() for _ in range(min(len(self._queue), EXPORT_BATCH_SIZE))])
+
+    def _export(self, batch: list):
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                logger.warning("Trace export to %s failed: %s", type(exporter).__name__, e)
+
+class ConsoleExporter:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def export(self, spans: list):
+        for span in spans:
+            self.stream.write(json.dumps(span.to_dict(), default=str) + "\n")
+        self.stream.flush()
+
+class FileExporter:
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+
+    def export(self, spans: list):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+# OTLP SpanKind
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+class OTLPExporter:
+    """OTLP/HTTP with the JSON encoding, accepted by the OpenTelemetry Collector, Jaeger and Tempo"""
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT, timeout: float = 10):
+        self.url = f"{endpoint}/v1/traces"
+        self.timeout = timeout
+
+    def _span(self, span: Span) -> dict:
+        otlp = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "events": [
+                {"timeUnixNano": str(t), "name": name, "attributes": _otlp_attributes(attrs)}
+                for t, name, attrs in span.events
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+    def export(self, spans: list):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "e-tendering"}, "spans": [self._span(span) for span in spans]}]
+        }]}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+_EXPORTER_TYPES = {"console": ConsoleExporter, "file": FileExporter, "otlp": OTLPExporter}
+
+def _make_exporters(names: list) -> list:
+    exporters = []
+    for name in names:
+        if name in _EXPORTER_TYPES:
+            exporters.append(_EXPORTER_TYPES[name]())
+        else:
+            logger.warning("Unknown trace exporter %r (expected console, file or otlp)", name)
+    return exporters
+
+_processor = _BatchProcessor(_make_exporters(EXPORTERS))
+
+def flush():
+    """Export every finished span now (e.g. at shutdown)"""
+    _processor.flush()
+
+def stats() -> dict:
+    return {"enabled": enabled, "sample_rate": SAMPLE_RATE, "queued": len(_processor._queue), "dropped": _processor.dropped}
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1").strip()
+                break
+
+        method = scope["method"]
+        with start_trace(f"{method}", traceparent, kind="server", **{"http.method": method, "http.target": scope["path"]}) as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if root.sampled and route is not None:
+                    root.name = f"{method} {route.path}"
+                    root.set_attribute("http.route", route.path)
+
+class MongoTracingListener(monitoring.CommandListener):
+    """Child spans for MongoDB commands; runs on driver threads with the caller's context"""
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        parent = _current.get()
+        if not parent.sampled:
+            return
+        collection = event.command.get(event.command_name)
+        self._spans[event.request_id] = Span(
+            f"mongo.{event.command_name}", parent.trace_id, parent.span_id, "client",
+            **{"db.system": "mongodb", "db.operation": event.command_name,
+               "db.mongodb.collection": collection if isinstance(collection, str) else None}
+        )
+
+    def succeeded(self, event):
+        span = self._spans.pop(event.request_id, None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event):
+        span = self._spans.pop(event.request_id, None)
+        if span is not None:
+            span.error = str(event.failure.get("errmsg", event.failure))
+            span.end()
+
+def instrument_web3_provider(provider):
+    """Child spans for JSON-RPC requests, named after the RPC method"""
+    make_request = provider.make_request
+
+    def traced_make_request(method, params):
+        with span(f"web3.{method}", **{"rpc.system": "jsonrpc", "rpc.method": str(method)}):
+            return make_request(method, params)
+
+    provider.make_request = traced_make_request
+    return provider
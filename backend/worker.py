@@ -0,0 +1,45 @@
+"""
+Background worker that anchors tenders and bids on chain, indexes the
+contract's events into Mongo and does periodic notification housekeeping
+(counter reconcile, archival).
+
+Run it next to the API (one or more instances):
+    python worker.py
+"""
+
+import asyncio
+import logging
+import signal
+import database
+import indexer
+import notification_counters
+import notification_retention
+import outbox
+import tracing
+from blockchain import close_blockchain_manager, get_blockchain_manager
+
+async def main():
+    database.connect()
+    db = database.get_database()
+    await outbox.ensure_indexes(db)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await asyncio.gather(
+            outbox.run_worker(db, stop),
+            indexer.run_indexer(db, get_blockchain_manager(), stop),
+            notification_counters.run_reconciler(db, stop),
+            notification_retention.run_archiver(db, stop)
+        )
+    finally:
+        database.close()
+        close_blockchain_manager()
+        await asyncio.to_thread(tracing.flush)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
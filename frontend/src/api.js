@@ -0,0 +1,11 @@
+import axios from 'axios';
+
+export const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+
+// List endpoints return one page plus `next_cursor` (null on the last page);
+// pass it back as `cursor` to load the next page when the user asks for more
+export const fetchPage = async (path, key, config = {}, cursor = null) => {
+  const params = { ...(config.params || {}), ...(cursor ? { cursor } : {}) };
+  const response = await axios.get(`${API_URL}${path}`, { ...config, params });
+  return { items: response.data[key], nextCursor: response.data.next_cursor };
+};
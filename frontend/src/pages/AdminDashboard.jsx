@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import axios from 'axios';
+import { fetchPage } from '../api';
 import { FaShieldAlt, FaHandshake, FaBolt, FaNetworkWired, FaPlus, FaList, FaChartBar, FaTrophy, FaClock, FaDollarSign } from 'react-icons/fa';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
@@ -59,27 +60,27 @@ const AdminDashboard = () => {
   const fetchDashboardData = async () => {
     try {
       const token = localStorage.getItem('token');
-      const [healthResponse, tendersResponse, bidsResponse] = await Promise.all([
+      const headers = { Authorization: `Bearer ${token}` };
+      // Totals come from the server; only the five most recent tenders and bids are loaded
+      const [healthResponse, statsResponse, tenders, bids] = await Promise.all([
         axios.get(`${API_URL}/health`),
-        axios.get(`${API_URL}/tenders`),
-        axios.get(`${API_URL}/bids/all`, {
-          headers: { Authorization: `Bearer ${token}` }
+        axios.get(`${API_URL}/tenders/stats`, { headers }),
+        fetchPage('/tenders', 'tenders', { params: { limit: 5 } }),
+        fetchPage('/bids/all', 'bids', {
+          headers,
+          params: { limit: 5, fields: 'tender_id,bidder_id,amount,status,documents,document_files' }
         })
       ]);
 
-      const tenders = tendersResponse.data.tenders;
-      const bids = bidsResponse.data.bids;
-      const activeTenders = tenders.filter(t => t.status === 'published').length;
-
       setStats({
-        totalTenders: tenders.length,
-        totalBids: bids.length,
-        activeTenders,
+        totalTenders: statsResponse.data.tenders,
+        totalBids: statsResponse.data.bids,
+        activeTenders: statsResponse.data.published,
         blockchainConnected: healthResponse.data.blockchain === 'connected'
       });
 
-      setRecentTenders(tenders.slice(0, 5));
-      setRecentBids(bids.slice(0, 5));
+      setRecentTenders(tenders.items);
+      setRecentBids(bids.items);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -128,6 +129,24 @@ const AdminDashboard = () => {
     }
   };
 
+  const handleOpenDocument = async (bidId, index) => {
+    // Opened before the request so the popup is not blocked; the link is signed for this document only
+    const tab = window.open('', '_blank');
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.post(`${API_URL}/documents/${bidId}/${index}/link`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      if (tab) {
+        tab.opener = null;
+        tab.location = `${API_URL}${response.data.url}`;
+      }
+    } catch (error) {
+      if (tab) tab.close();
+      console.error('Error opening document:', error);
+    }
+  };
+
   const handleRejectBid = async (bidId) => {
     try {
       const token = localStorage.getItem('token');
@@ -387,15 +406,14 @@ const AdminDashboard = () => {
                           <div className="mt-2">
                             <p className="text-xs text-cyan-300 font-mono mb-1">Documents:</p>
                             {bid.documents.map((doc, index) => (
-                              <a
+                              <button
                                 key={index}
-                                href={`${API_URL}/uploads/${doc.split('/').pop()}`}
-                                target="_blank"
-                                rel="noopener noreferrer"
-                                className="text-xs text-purple-300 hover:text-purple-200 font-mono underline block"
+                                type="button"
+                                onClick={() => handleOpenDocument(bid._id, index)}
+                                className="text-xs text-purple-300 hover:text-purple-200 font-mono underline block text-left"
                               >
-                                {doc.split('/').pop()}
-                              </a>
+                                {bid.document_files?.[index]?.filename || doc.split('/').pop()}
+                              </button>
                             ))}
                           </div>
                         )}
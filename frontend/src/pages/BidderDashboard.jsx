@@ -1,14 +1,14 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
-import axios from 'axios';
+import { fetchPage } from '../api';
 import { FaTrophy, FaClock, FaCoins, FaPlus, FaEye, FaNetworkWired, FaShieldAlt, FaBolt, FaSyncAlt } from 'react-icons/fa';
 
-const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
-
 const BidderDashboard = () => {
   const [myBids, setMyBids] = useState([]);
+  const [moreBids, setMoreBids] = useState(false);
   const [availableTenders, setAvailableTenders] = useState([]);
+  const [moreTenders, setMoreTenders] = useState(false);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
 
@@ -54,20 +54,25 @@ const BidderDashboard = () => {
   const fetchDashboardData = async () => {
     try {
       const token = localStorage.getItem('token');
-      const [bidsResponse, tendersResponse] = await Promise.all([
-        axios.get(`${API_URL}/bids/my-bids`, {
+      // Rounded down to the minute so every request in that minute shares one cached
+      // response (and ETag); a tender that closed seconds ago still rejects late bids
+      const now = new Date();
+      now.setSeconds(0, 0);
+      const [bidsResponse, activeTenders] = await Promise.all([
+        // Newest page of the bidder's bids
+        fetchPage('/bids/my-bids', 'bids', {
           headers: { Authorization: `Bearer ${token}` }
         }),
-        axios.get(`${API_URL}/tenders`)
+        // First page of published tenders that are not expired; the rest are on /tenders
+        fetchPage('/tenders', 'tenders', {
+          params: { status: 'published', deadline_from: now.toISOString() }
+        })
       ]);
 
-      setMyBids(bidsResponse.data.bids);
-      // Filter tenders that are published and not expired
-      const now = new Date();
-      const activeTenders = tendersResponse.data.tenders.filter(
-        t => t.status === 'published' && new Date(t.deadline) > now
-      );
-      setAvailableTenders(activeTenders);
+      setMyBids(bidsResponse.items);
+      setMoreBids(Boolean(bidsResponse.nextCursor));
+      setAvailableTenders(activeTenders.items);
+      setMoreTenders(Boolean(activeTenders.nextCursor));
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -178,7 +183,7 @@ const BidderDashboard = () => {
               <FaCoins className="text-3xl text-cyan-400 mr-3" />
               <h3 className="text-xl font-bold text-cyan-300 font-mono">My Bids</h3>
             </motion.div>
-            <p className="text-4xl font-bold text-white font-mono">{myBids.length}</p>
+            <p className="text-4xl font-bold text-white font-mono">{myBids.length}{moreBids ? '+' : ''}</p>
             <p className="text-sm text-gray-400 mt-2">Total submissions</p>
           </motion.div>
 
@@ -192,7 +197,7 @@ const BidderDashboard = () => {
               <FaTrophy className="text-3xl text-purple-400 mr-3" />
               <h3 className="text-xl font-bold text-purple-300 font-mono">Available Tenders</h3>
             </motion.div>
-            <p className="text-4xl font-bold text-white font-mono">{availableTenders.length}</p>
+            <p className="text-4xl font-bold text-white font-mono">{availableTenders.length}{moreTenders ? '+' : ''}</p>
             <p className="text-sm text-gray-400 mt-2">Active opportunities</p>
           </motion.div>
 
@@ -280,7 +285,7 @@ const BidderDashboard = () => {
             </motion.div>
           )}
 
-          {availableTenders.length > 5 && (
+          {(availableTenders.length > 5 || moreTenders) && (
             <motion.div
               className="text-center mt-8"
               variants={fadeInUp}
@@ -16,6 +16,8 @@ const SubmitBid = () => {
   });
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(false);
+  // Resubmitting the same form reuses the key, so a retried request cannot create a second bid
+  const [idempotencyKey, setIdempotencyKey] = useState(() => crypto.randomUUID());
 
   const fadeInUp = {
     initial: { opacity: 0, y: 60 },
@@ -67,6 +69,7 @@ const SubmitBid = () => {
   };
 
   const handleChange = (e) => {
+    setIdempotencyKey(crypto.randomUUID());
     if (e.target.name === 'documents') {
       setFormData({
         ...formData,
@@ -102,7 +105,8 @@ const SubmitBid = () => {
       await axios.post(`${API_URL}/bids/${tenderId}`, formDataToSend, {
         headers: {
           Authorization: `Bearer ${token}`,
-          'Content-Type': 'multipart/form-data'
+          'Content-Type': 'multipart/form-data',
+          'Idempotency-Key': idempotencyKey
         }
       });
 
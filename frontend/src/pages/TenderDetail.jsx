@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import axios from 'axios';
+import { fetchPage } from '../api';
 import { FaEye, FaClock, FaDollarSign, FaCheckCircle, FaArrowLeft, FaNetworkWired } from 'react-icons/fa';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
@@ -10,6 +11,8 @@ const TenderDetail = () => {
   const { id } = useParams();
   const [tender, setTender] = useState(null);
   const [bids, setBids] = useState([]);
+  const [bidsCursor, setBidsCursor] = useState(null);
+  const [loadingMoreBids, setLoadingMoreBids] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [user, setUser] = useState(null);
@@ -35,12 +38,12 @@ const TenderDetail = () => {
       const token = localStorage.getItem('token');
       const tenderPromise = axios.get(`${API_URL}/tenders/${id}`);
       const bidsPromise = (token && token !== 'null' && token !== null && token !== undefined && token.trim() !== '')
-        ? axios.get(`${API_URL}/bids/tender/${id}`, {
+        ? fetchPage(`/bids/tender/${id}`, 'bids', {
           headers: {
             Authorization: `Bearer ${token}`
           }
-        }).catch(() => ({ data: { bids: [] } })) // Handle case where user can't see bids
-        : Promise.resolve({ data: { bids: [] } });
+        }).catch(() => ({ items: [], nextCursor: null })) // Handle case where user can't see bids
+        : Promise.resolve({ items: [], nextCursor: null });
 
       const [tenderResponse, bidsResponse] = await Promise.all([
         tenderPromise,
@@ -48,7 +51,8 @@ const TenderDetail = () => {
       ]);
 
       setTender(tenderResponse.data);
-      setBids(bidsResponse.data.bids || []);
+      setBids(bidsResponse.items || []);
+      setBidsCursor(bidsResponse.nextCursor);
     } catch (error) {
       setError('Failed to fetch tender details');
       console.error('Error fetching tender details:', error);
@@ -57,6 +61,22 @@ const TenderDetail = () => {
     }
   };
 
+  const handleLoadMoreBids = async () => {
+    setLoadingMoreBids(true);
+    try {
+      const token = localStorage.getItem('token');
+      const page = await fetchPage(`/bids/tender/${id}`, 'bids', {
+        headers: { Authorization: `Bearer ${token}` }
+      }, bidsCursor);
+      setBids(previous => [...previous, ...page.items]);
+      setBidsCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error fetching bids:', error);
+    } finally {
+      setLoadingMoreBids(false);
+    }
+  };
+
   const handleCloseTender = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -495,7 +515,7 @@ const TenderDetail = () => {
               variants={iconAnimation}
             >
               <FaEye className="text-4xl text-cyan-300 mr-4" />
-              <h2 className="text-3xl font-bold font-mono text-cyan-300">SUBMITTED BIDS ({bids.length})</h2>
+              <h2 className="text-3xl font-bold font-mono text-cyan-300">SUBMITTED BIDS ({bids.length}{bidsCursor ? '+' : ''})</h2>
             </motion.div>
             <motion.div
               className="space-y-6"
@@ -535,6 +555,17 @@ const TenderDetail = () => {
                 </motion.div>
               ))}
             </motion.div>
+            {bidsCursor && (
+              <div className="text-center mt-8">
+                <button
+                  onClick={handleLoadMoreBids}
+                  disabled={loadingMoreBids}
+                  className="bg-gradient-to-r from-cyan-500 to-purple-600 hover:from-cyan-400 hover:to-purple-500 text-black font-bold py-3 px-8 rounded-full transition-all duration-300 shadow-lg border-2 border-cyan-400 disabled:opacity-50"
+                >
+                  {loadingMoreBids ? 'Loading...' : 'Load More Bids'}
+                </button>
+              </div>
+            )}
           </motion.div>
         )}
       </div>
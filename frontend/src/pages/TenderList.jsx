@@ -1,32 +1,40 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
-import axios from 'axios';
+import { fetchPage } from '../api';
 import { FaShieldAlt, FaEye, FaBolt, FaCalendarAlt, FaDollarSign, FaFileAlt, FaArrowRight, FaNetworkWired } from 'react-icons/fa';
 
-const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
-
 const TenderList = () => {
   const [tenders, setTenders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   useEffect(() => {
     fetchTenders();
   }, []);
 
-  const fetchTenders = async () => {
+  // One page at a time; further pages load when the user asks for them
+  const fetchTenders = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API_URL}/tenders`);
-      setTenders(response.data.tenders);
+      const page = await fetchPage('/tenders', 'tenders', {}, cursor);
+      setTenders(previous => cursor ? [...previous, ...page.items] : page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       setError('Failed to fetch tenders');
       console.error('Error fetching tenders:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const handleLoadMore = () => {
+    setLoadingMore(true);
+    fetchTenders(nextCursor);
+  };
+
   const getStatusColor = (status) => {
     switch (status) {
       case 'published': return 'bg-green-500/20 text-green-300 border-green-400/50';
@@ -237,6 +245,17 @@ const TenderList = () => {
               ))}
             </motion.div>
           )}
+          {nextCursor && (
+            <div className="text-center mt-12">
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="bg-gradient-to-r from-cyan-500 to-purple-600 hover:from-cyan-400 hover:to-purple-500 text-black font-bold py-3 px-8 rounded-full transition-all duration-300 shadow-lg border-2 border-cyan-400 disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load More Tenders'}
+              </button>
+            </div>
+          )}
         </div>
       </motion.div>
 